@@ -0,0 +1,22 @@
+from rest_framework.pagination import CursorPagination
+
+
+class InvoiceCursorPagination(CursorPagination):
+    """
+    Keyset pagination of invoice, newest first.
+    Always applied, so the response stays bounded whatever the number of invoice of the tenant.
+    """
+    ordering = ('-start_date', '-id')
+    page_size = 24
+    page_size_query_param = 'page_size'
+    max_page_size = 120
+
+
+class InvoiceComponentCursorPagination(CursorPagination):
+    """
+    Keyset pagination of invoice component, always applied because an invoice can have a lot of component
+    """
+    ordering = 'id'
+    page_size = 100
+    page_size_query_param = 'page_size'
+    max_page_size = 1000
@@ -3,14 +3,14 @@ from djmoney.settings import DECIMAL_PLACES
 from rest_framework import serializers
 
 from api import custom_validator
-from core.models import Invoice, BillingProject, Notification, Balance, BalanceTransaction
+from core.models import Invoice, BillingProject, Notification, Balance, BalanceTransaction, Job
 from core.component import component
 
 
 class InvoiceComponentSerializer(serializers.ModelSerializer):
     adjusted_end_date = serializers.DateTimeField()
-    price_charged = MoneyField(max_digits=256, decimal_places=DECIMAL_PLACES)
-    price_charged_currency = serializers.CharField(source="price_charged.currency")
+    price_charged = MoneyField(max_digits=256, decimal_places=DECIMAL_PLACES, source="annotated_price_charged")
+    price_charged_currency = serializers.CharField(source="annotated_price_charged.currency")
 
 
 def generate_invoice_component_serializer(model):
@@ -31,6 +31,11 @@ def generate_invoice_component_serializer(model):
 
 
 class InvoiceSerializer(serializers.ModelSerializer):
+    """
+    Closed invoice is represented by its frozen document, only the lifecycle fields are read from the invoice
+    """
+    LIFECYCLE_FIELDS = ['state', 'finish_date', 'updated_at']
+
     subtotal = MoneyField(max_digits=256, decimal_places=DECIMAL_PLACES)
     subtotal_currency = serializers.CharField(source="subtotal.currency")
     total = MoneyField(max_digits=256, decimal_places=DECIMAL_PLACES)
@@ -41,9 +46,22 @@ class InvoiceSerializer(serializers.ModelSerializer):
         for field, model in component.INVOICE_COMPONENT_MODEL.items():
             self.fields[field] = generate_invoice_component_serializer(model)(many=True)
 
+    def to_representation(self, instance):
+        # Invoice reopened from admin is represented from its components again
+        if instance.document is None or instance.state == Invoice.InvoiceState.IN_PROGRESS:
+            return super().to_representation(instance)
+
+        data = dict(instance.document)
+        for field_name in self.LIFECYCLE_FIELDS:
+            field = self.fields[field_name]
+            attribute = field.get_attribute(instance)
+            data[field_name] = None if attribute is None else field.to_representation(attribute)
+
+        return data
+
     class Meta:
         model = Invoice
-        fields = '__all__'
+        exclude = ['document']
 
 
 class SimpleInvoiceSerializer(serializers.ModelSerializer):
@@ -98,3 +116,7 @@ class BalanceTransactionSerializer(serializers.ModelSerializer):
         fields = ['id', 'amount', 'amount_currency', 'action', 'description', 'created_at']
 
 
+class JobSerializer(serializers.ModelSerializer):
+    class Meta:
+        model = Job
+        fields = ['id', 'type', 'state', 'progress', 'total', 'error', 'created_at', 'start_date', 'finish_date']
@@ -14,6 +14,7 @@ router.register(r'admin_overview', views.AdminOverviewViewSet, basename='admin_o
 router.register(r'project_overview', views.ProjectOverviewViewSet, basename='project_overview')
 router.register(r'notification', views.NotificationViewSet, basename='notification')
 router.register(r'balance', views.BalanceViewSet, basename='balance')
+router.register(r'jobs', views.JobViewSet, basename='jobs')
 
 urlpatterns = [
     path('', include(router.urls)),
@@ -1,18 +1,16 @@
-from typing import Dict, Iterable
+import io
 
-import dateutil.parser
-from django.http import HttpResponse
+from django.http import HttpResponse, StreamingHttpResponse
 import prometheus_client
-import pytz
 import core.metric as metric
 from django.db import transaction
-from django.utils import timezone
 from djmoney.money import Money
 from rest_framework import viewsets, serializers, status
 from rest_framework.decorators import action
 from rest_framework.generics import get_object_or_404
 from rest_framework.response import Response
 
+from api.pagination import InvoiceCursorPagination, InvoiceComponentCursorPagination
 from api.serializers import (
     InvoiceSerializer,
     SimpleInvoiceSerializer,
@@ -20,24 +18,35 @@ from api.serializers import (
     NotificationSerializer,
     BalanceSerializer,
     BalanceTransactionSerializer,
+    JobSerializer,
+    generate_invoice_component_serializer,
 )
-from core.component import component, labels
+from core.billing_init import BillingInitializer
 from core.component.component import INVOICE_COMPONENT_MODEL
 from core.exception import PriceNotFound
-from core.models import Invoice, BillingProject, Notification, Balance, InvoiceInstance
+from core.job import enqueue_job, has_pending_job
+from core.models import Invoice, BillingProject, Notification, Balance, InvoiceInstance, Job
 from core.notification import send_notification_from_template
+from core.usage_export import iter_usage, iter_export, get_date_range, EXPORT_CSV, EXPORT_NDJSON, EXPORT_FORMATS
 from core.utils.dynamic_setting import (
     get_dynamic_settings,
     get_dynamic_setting,
     set_dynamic_setting,
     BILLING_ENABLED,
-    INVOICE_TAX,
     COMPANY_NAME,
     COMPANY_ADDRESS,
 )
-from core.utils.model_utils import InvoiceComponentMixin
+from core.utils.price_aggregation import (
+    sum_price_charged_by_label,
+    annotate_invoice_components,
+    prefetch_invoice_components,
+    COMPONENT_ACTIVE_PRICE,
+)
+from core.utils.tenant_invoice import invalidate_tenant_invoice
 from yuyu import settings
 
+NDJSON_CONTENT_TYPE = "application/x-ndjson"
+
 
 def get_generic_model_view_set(model):
     name = type(model).__name__
@@ -57,111 +66,14 @@ def get_generic_model_view_set(model):
 
 
 def metrics(request):
-    # Cost Explorer
-    for k, v in INVOICE_COMPONENT_MODEL.items():
-        items = v.objects.filter(invoice__state=Invoice.InvoiceState.IN_PROGRESS).all()
-
-        total_active_resource = v.objects.filter(
-            invoice__state=Invoice.InvoiceState.IN_PROGRESS, end_date=None
-        ).count()
-
-        # Total cost this month (All Active Invoice)
-        sum_of_price = sum([q.price_charged for q in items])
-
-        sum_of_price = sum_of_price or Money(
-            amount=0, currency=settings.DEFAULT_CURRENCY
-        )
-        metric.TOTAL_COST_METRIC.labels(job="total_cost", resources=k).set(
-            sum_of_price.amount
-        )
-        metric.TOTAL_RESOURCE_METRIC.labels(job="total_resource", resources=k).set(
-            total_active_resource
-        )
+    metrics_page = prometheus_client.generate_latest()
 
-        # Details Cost
-        if k == labels.LABEL_INSTANCES:
-            for i in items:
-                metric.INSTANCE_COST_METRIC.labels(
-                    job="instance_cost",
-                    flavor=i.flavor_id,
-                    name=i.name,
-                    project_id=i.invoice.project.tenant_id,
-                ).set(i.price_charged.amount)
-                metric.INSTANCE_USAGE_METRIC.labels(
-                    job="instance_usage",
-                    flavor=i.flavor_id,
-                    name=i.name,
-                    project_id=i.invoice.project.tenant_id,
-                ).set(i.usage_time)
-
-        if k == labels.LABEL_VOLUMES:
-            for i in items:
-                metric.VOLUME_COST_METRIC.labels(
-                    job="volume_cost",
-                    type=i.volume_type_id,
-                    name=i.volume_name,
-                    project_id=i.invoice.project.tenant_id,
-                ).set(i.price_charged.amount)
-                metric.VOLUME_USAGE_METRIC.labels(
-                    job="volume_usage",
-                    type=i.volume_type_id,
-                    name=i.volume_name,
-                    project_id=i.invoice.project.tenant_id,
-                ).set(i.usage_time)
-
-        if k == labels.LABEL_FLOATING_IPS:
-            for i in items:
-                metric.FLOATINGIP_COST_METRIC.labels(
-                    job="floatingip_cost",
-                    name=i.ip,
-                    project_id=i.invoice.project.tenant_id,
-                ).set(i.price_charged.amount)
-                metric.FLOATINGIP_USAGE_METRIC.labels(
-                    job="floatingip_usage",
-                    name=i.ip,
-                    project_id=i.invoice.project.tenant_id,
-                ).set(i.usage_time)
-
-        if k == labels.LABEL_ROUTERS:
-            for i in items:
-                metric.ROUTER_COST_METRIC.labels(
-                    job="router_cost",
-                    name=i.name,
-                    project_id=i.invoice.project.tenant_id,
-                ).set(i.price_charged.amount)
-                metric.ROUTER_USAGE_METRIC.labels(
-                    job="router_usage",
-                    name=i.name,
-                    project_id=i.invoice.project.tenant_id,
-                ).set(i.usage_time)
-
-        if k == labels.LABEL_SNAPSHOTS:
-            for i in items:
-                metric.SNAPSHOT_COST_METRIC.labels(
-                    job="snapshot_cost",
-                    name=i.name,
-                    project_id=i.invoice.project.tenant_id,
-                ).set(i.price_charged.amount)
-                metric.SNAPSHOT_USAGE_METRIC.labels(
-                    job="snapshot_usage",
-                    name=i.name,
-                    project_id=i.invoice.project.tenant_id,
-                ).set(i.usage_time)
-
-        if k == labels.LABEL_IMAGES:
-            for i in items:
-                metric.IMAGE_COST_METRIC.labels(
-                    job="image_cost",
-                    name=i.name,
-                    project_id=i.invoice.project.tenant_id,
-                ).set(i.price_charged.amount)
-                metric.IMAGE_USAGE_METRIC.labels(
-                    job="image_usage",
-                    name=i.name,
-                    project_id=i.invoice.project.tenant_id,
-                ).set(i.usage_time)
+    # Cost Explorer
+    if settings.YUYU_METRICS_SNAPSHOT_FILE:
+        metrics_page += metric.read_snapshot(settings.YUYU_METRICS_SNAPSHOT_FILE)
+    else:
+        metrics_page += metric.generate_cost_metric()
 
-    metrics_page = prometheus_client.generate_latest()
     return HttpResponse(
         metrics_page, content_type=prometheus_client.CONTENT_TYPE_LATEST
     )
@@ -185,30 +97,90 @@ class DynamicSettingViewSet(viewsets.ViewSet):
 
 class InvoiceViewSet(viewsets.ModelViewSet):
     serializer_class = InvoiceSerializer
+    pagination_class = InvoiceCursorPagination
 
     def get_queryset(self):
         tenant_id = self.request.query_params.get("tenant_id", None)
-        return Invoice.objects.filter(project__tenant_id=tenant_id).order_by(
+        queryset = Invoice.objects.filter(project__tenant_id=tenant_id).order_by(
             "-start_date"
         )
 
-    def parse_time(self, time):
-        dt = dateutil.parser.isoparse(time)
-        if not dt.tzinfo:
-            return pytz.UTC.localize(dt=dt)
+        # Read components and their price in constant number of query,
+        # closed invoice is served from its frozen document so its components are not read
+        if self.action in ["list", "retrieve"]:
+            return prefetch_invoice_components(
+                queryset, INVOICE_COMPONENT_MODEL, invoice__document__isnull=True
+            )
+        if self.action == "simple_list":
+            return annotate_invoice_components(
+                queryset, INVOICE_COMPONENT_MODEL, aggregates=[COMPONENT_ACTIVE_PRICE]
+            )
 
-        return dt
+        return queryset
 
     @action(detail=False)
     def simple_list(self, request):
-        serializer = SimpleInvoiceSerializer(self.get_queryset(), many=True)
+        queryset = self.get_queryset()
+        page = self.paginate_queryset(queryset)
+        if page is not None:
+            serializer = SimpleInvoiceSerializer(page, many=True)
+            return self.get_paginated_response(serializer.data)
+
+        serializer = SimpleInvoiceSerializer(queryset, many=True)
         return Response(serializer.data)
 
+    @action(detail=False)
+    def usage_export(self, request):
+        """
+        Stream every component used within start and end date as CSV or NDJSON, optionally filtered by tenant_id.
+        The date range default to the current invoice period.
+        """
+        export_format = request.query_params.get("export_format", EXPORT_CSV)
+        if export_format not in EXPORT_FORMATS:
+            return Response({"message": f"Unknown export format {export_format}"}, status=400)
+
+        try:
+            start, end = get_date_range(request.query_params.get("start"), request.query_params.get("end"))
+        except ValueError as e:
+            return Response({"message": f"Invalid date range: {e}"}, status=400)
+
+        usages = iter_usage(start, end, tenant_id=request.query_params.get("tenant_id", None))
+        content_type = NDJSON_CONTENT_TYPE if export_format == EXPORT_NDJSON else "text/csv"
+        response = StreamingHttpResponse(iter_export(usages, export_format), content_type=content_type)
+        response["Content-Disposition"] = f'attachment; filename="usage.{export_format}"'
+        return response
+
+    @action(detail=True, url_path=r"components/(?P<label>[^/.]+)")
+    def components(self, request, pk, label):
+        if label not in INVOICE_COMPONENT_MODEL:
+            return Response(
+                {"message": f"Unknown component {label}"},
+                status=404,
+            )
+
+        invoice = self.get_object()
+        model = INVOICE_COMPONENT_MODEL[label]
+        paginator = InvoiceComponentCursorPagination()
+        page = paginator.paginate_queryset(
+            model.objects.filter(invoice=invoice), request, view=self
+        )
+        serializer = generate_invoice_component_serializer(model)(page, many=True)
+        return paginator.get_paginated_response(serializer.data)
+
     @action(detail=False, methods=["POST"])
     def enable_billing(self, request):
+        if has_pending_job():
+            return Response({"message": "Billing is being disabled or reset, please wait until the job finished"},
+                            status=400)
+
         try:
-            self.handle_init_billing(request.data)
+            if request.content_type.startswith(NDJSON_CONTENT_TYPE):
+                self.handle_init_billing_stream(request.stream)
+            else:
+                self.handle_init_billing(request.data)
             return Response({"status": "success"})
+        except (KeyError, ValueError) as e:
+            return Response({"message": f"Invalid inventory: {e}"}, status=400)
         except PriceNotFound as e:
             return Response(
                 {
@@ -221,89 +193,34 @@ class InvoiceViewSet(viewsets.ModelViewSet):
     @action(detail=False, methods=["POST"])
     def disable_billing(self, request):
         set_dynamic_setting(BILLING_ENABLED, False)
-        active_invoices = Invoice.objects.filter(
-            state=Invoice.InvoiceState.IN_PROGRESS
-        ).all()
-        for active_invoice in active_invoices:
-            self._close_active_invoice(
-                active_invoice, timezone.now(), get_dynamic_setting(INVOICE_TAX)
-            )
+        invalidate_tenant_invoice()
 
-        return Response({"status": "success"})
-
-    def _close_active_invoice(
-        self, active_invoice: Invoice, close_date, tax_percentage
-    ):
-        active_components_map: Dict[str, Iterable[InvoiceComponentMixin]] = {}
-
-        for label in labels.INVOICE_COMPONENT_LABELS:
-            active_components_map[label] = (
-                getattr(active_invoice, label).filter(end_date=None).all()
-            )
-
-            # Close Invoice Component
-            for active_component in active_components_map[label]:
-                active_component.close(close_date)
-
-        # Finish current invoice
-        active_invoice.close(close_date, tax_percentage)
+        # Closing every invoice is done by job worker
+        job = enqueue_job(Job.JobType.DISABLE_BILLING)
+        return Response({"status": "success", "job_id": job.id})
 
     @action(detail=False, methods=["POST"])
     def reset_billing(self, request):
-        self.handle_reset_billing()
-        return Response({"status": "success"})
+        set_dynamic_setting(BILLING_ENABLED, False)
+        invalidate_tenant_invoice()
+
+        job = enqueue_job(Job.JobType.RESET_BILLING)
+        return Response({"status": "success", "job_id": job.id})
 
     @transaction.atomic
     def handle_init_billing(self, data):
         set_dynamic_setting(BILLING_ENABLED, True)
+        invalidate_tenant_invoice()
 
-        projects = {}
-        invoices = {}
-
-        date_today = timezone.now()
-        month_first_day = date_today.replace(
-            day=1, hour=0, minute=0, second=0, microsecond=0
-        )
-
-        for name, handler in component.INVOICE_HANDLER.items():
-            payloads = data[name]
-
-            for payload in payloads:
-                if payload["tenant_id"] not in projects:
-                    project, created = BillingProject.objects.get_or_create(
-                        tenant_id=payload["tenant_id"]
-                    )
-                    projects[payload["tenant_id"]] = project
-
-                if payload["tenant_id"] not in invoices:
-                    invoice = Invoice.objects.create(
-                        project=projects[payload["tenant_id"]],
-                        start_date=month_first_day,
-                        state=Invoice.InvoiceState.IN_PROGRESS,
-                    )
-                    invoices[payload["tenant_id"]] = invoice
-
-                start_date = self.parse_time(payload["start_date"])
-                if start_date < month_first_day:
-                    start_date = month_first_day
-
-                payload["start_date"] = start_date
-                payload["invoice"] = invoices[payload["tenant_id"]]
-
-                # create not accepting tenant_id, delete it
-                del payload["tenant_id"]
-                handler.create(payload, fallback_price=True)
+        BillingInitializer().load(data)
 
     @transaction.atomic
-    def handle_reset_billing(self):
-        set_dynamic_setting(BILLING_ENABLED, False)
-
-        BillingProject.objects.all().delete()
-        for name, handler in component.INVOICE_HANDLER.items():
-            handler.delete()
+    def handle_init_billing_stream(self, stream):
+        set_dynamic_setting(BILLING_ENABLED, True)
+        invalidate_tenant_invoice()
 
-        for name, model in component.PRICE_MODEL.items():
-            model.objects.all().delete()
+        # Read in chunk, so the whole inventory is never loaded in memory
+        BillingInitializer().load_ndjson(stream or io.BytesIO())
 
     @action(detail=True)
     def finish(self, request, pk):
@@ -402,19 +319,10 @@ class AdminOverviewViewSet(viewsets.ViewSet):
             "label": [],
             "data": [],
         }
-        for k, v in INVOICE_COMPONENT_MODEL.items():
-            sum_of_price = sum(
-                [
-                    q.price_charged
-                    for q in v.objects.filter(
-                        invoice__state=Invoice.InvoiceState.IN_PROGRESS
-                    ).all()
-                ]
-            )
-
-            sum_of_price = sum_of_price or Money(
-                amount=0, currency=settings.DEFAULT_CURRENCY
-            )
+        price_map = sum_price_charged_by_label(
+            INVOICE_COMPONENT_MODEL, invoice__state=Invoice.InvoiceState.IN_PROGRESS
+        )
+        for k, sum_of_price in price_map.items():
             data["label"].append(k + " (" + str(sum_of_price.currency) + ")")
             data["data"].append(sum_of_price.amount)
 
@@ -426,19 +334,12 @@ class AdminOverviewViewSet(viewsets.ViewSet):
             "label": [],
             "data": [],
         }
-        for k, v in INVOICE_COMPONENT_MODEL.items():
-            sum_of_price = sum(
-                [
-                    q.price_charged
-                    for q in v.objects.filter(
-                        invoice__state=Invoice.InvoiceState.IN_PROGRESS, end_date=None
-                    ).all()
-                ]
-            )
-
-            sum_of_price = sum_of_price or Money(
-                amount=0, currency=settings.DEFAULT_CURRENCY
-            )
+        price_map = sum_price_charged_by_label(
+            INVOICE_COMPONENT_MODEL,
+            invoice__state=Invoice.InvoiceState.IN_PROGRESS,
+            end_date=None,
+        )
+        for k, sum_of_price in price_map.items():
             data["label"].append(k + " (" + str(sum_of_price.currency) + ")")
             data["data"].append(sum_of_price.amount)
 
@@ -515,20 +416,12 @@ class ProjectOverviewViewSet(viewsets.ViewSet):
             "label": [],
             "data": [],
         }
-        for k, v in INVOICE_COMPONENT_MODEL.items():
-            sum_of_price = sum(
-                [
-                    q.price_charged
-                    for q in v.objects.filter(
-                        invoice__project=project,
-                        invoice__state=Invoice.InvoiceState.IN_PROGRESS,
-                    ).all()
-                ]
-            )
-
-            sum_of_price = sum_of_price or Money(
-                amount=0, currency=settings.DEFAULT_CURRENCY
-            )
+        price_map = sum_price_charged_by_label(
+            INVOICE_COMPONENT_MODEL,
+            invoice__project=project,
+            invoice__state=Invoice.InvoiceState.IN_PROGRESS,
+        )
+        for k, sum_of_price in price_map.items():
             data["label"].append(k + " (" + str(sum_of_price.currency) + ")")
             data["data"].append(sum_of_price.amount)
 
@@ -542,21 +435,13 @@ class ProjectOverviewViewSet(viewsets.ViewSet):
             "label": [],
             "data": [],
         }
-        for k, v in INVOICE_COMPONENT_MODEL.items():
-            sum_of_price = sum(
-                [
-                    q.price_charged
-                    for q in v.objects.filter(
-                        invoice__project=project,
-                        invoice__state=Invoice.InvoiceState.IN_PROGRESS,
-                        end_date=None,
-                    ).all()
-                ]
-            )
-
-            sum_of_price = sum_of_price or Money(
-                amount=0, currency=settings.DEFAULT_CURRENCY
-            )
+        price_map = sum_price_charged_by_label(
+            INVOICE_COMPONENT_MODEL,
+            invoice__project=project,
+            invoice__state=Invoice.InvoiceState.IN_PROGRESS,
+            end_date=None,
+        )
+        for k, sum_of_price in price_map.items():
             data["label"].append(k + " (" + str(sum_of_price.currency) + ")")
             data["data"].append(sum_of_price.amount)
 
@@ -587,7 +472,7 @@ class NotificationViewSet(viewsets.ModelViewSet):
     @action(detail=True, methods=["GET"])
     def resend(self, request, pk):
         notification = Notification.objects.filter(id=pk).first()
-        notification.send()
+        notification.queue()
 
         serializer = NotificationSerializer(notification)
 
@@ -666,3 +551,8 @@ class BalanceViewSet(viewsets.ViewSet):
 
 
 # endregion
+
+
+class JobViewSet(viewsets.ReadOnlyModelViewSet):
+    serializer_class = JobSerializer
+    queryset = Job.objects.order_by('-id')
@@ -3,4 +3,4 @@
 SCRIPT_DIR=$( cd -- "$( dirname -- "${BASH_SOURCE[0]}" )" &> /dev/null && pwd )
 cd $SCRIPT_DIR || exit
 cd ..
-./env/bin/python manage.py process_invoice
+./env/bin/python manage.py process_invoice "$@"
@@ -0,0 +1,17 @@
+#!/bin/bash
+
+SCRIPT_DIR=$( cd -- "$( dirname -- "${BASH_SOURCE[0]}" )" &> /dev/null && pwd )
+cd $SCRIPT_DIR || exit
+cd ..
+
+
+echo "Installing Yuyu Job Worker Service"
+yuyu_dir=`pwd -P`
+
+echo "Yuyu dir is $yuyu_dir"
+
+yuyu_dir_sub=${yuyu_dir//\//\\\/}
+sed "s/{{yuyu_dir}}/$yuyu_dir_sub/g" "$yuyu_dir"/script/yuyu_job_worker.service > /etc/systemd/system/yuyu_job_worker.service
+
+echo "Yuyu Job Worker Service Installed on /etc/systemd/system/yuyu_job_worker.service"
+echo "Done! you can enable Yuyu Job Worker with systemctl start yuyu_job_worker"
\ No newline at end of file
@@ -0,0 +1,17 @@
+#!/bin/bash
+
+SCRIPT_DIR=$( cd -- "$( dirname -- "${BASH_SOURCE[0]}" )" &> /dev/null && pwd )
+cd $SCRIPT_DIR || exit
+cd ..
+
+
+echo "Installing Yuyu Metrics Snapshot Service"
+yuyu_dir=`pwd -P`
+
+echo "Yuyu dir is $yuyu_dir"
+
+yuyu_dir_sub=${yuyu_dir//\//\\\/}
+sed "s/{{yuyu_dir}}/$yuyu_dir_sub/g" "$yuyu_dir"/script/yuyu_metrics_snapshot.service > /etc/systemd/system/yuyu_metrics_snapshot.service
+
+echo "Yuyu Metrics Snapshot Service Installed on /etc/systemd/system/yuyu_metrics_snapshot.service"
+echo "Done! you can enable Yuyu Metrics Snapshot with systemctl start yuyu_metrics_snapshot"
\ No newline at end of file
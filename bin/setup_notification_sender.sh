@@ -0,0 +1,17 @@
+#!/bin/bash
+
+SCRIPT_DIR=$( cd -- "$( dirname -- "${BASH_SOURCE[0]}" )" &> /dev/null && pwd )
+cd $SCRIPT_DIR || exit
+cd ..
+
+
+echo "Installing Yuyu Notification Sender Service"
+yuyu_dir=`pwd -P`
+
+echo "Yuyu dir is $yuyu_dir"
+
+yuyu_dir_sub=${yuyu_dir//\//\\\/}
+sed "s/{{yuyu_dir}}/$yuyu_dir_sub/g" "$yuyu_dir"/script/yuyu_notification_sender.service > /etc/systemd/system/yuyu_notification_sender.service
+
+echo "Yuyu Notification Sender Service Installed on /etc/systemd/system/yuyu_notification_sender.service"
+echo "Done! you can enable Yuyu Notification Sender with systemctl start yuyu_notification_sender"
\ No newline at end of file
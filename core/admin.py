@@ -2,7 +2,8 @@ from django.contrib import admin
 
 from core.models import FlavorPrice, VolumePrice, FloatingIpsPrice, BillingProject, Invoice, InvoiceVolume, \
     InvoiceFloatingIp, InvoiceInstance, DynamicSetting, InvoiceImage, ImagePrice, SnapshotPrice, RouterPrice, \
-    InvoiceSnapshot, InvoiceRouter, Notification, Balance, BalanceTransaction
+    InvoiceSnapshot, InvoiceRouter, Notification, Balance, BalanceTransaction, BillingRun, BillingRunProject, Job
+from core.utils.dynamic_setting import get_dynamic_setting, INVOICE_TAX
 
 
 @admin.register(DynamicSetting)
@@ -47,42 +48,104 @@ class BillingProjectAdmin(admin.ModelAdmin):
 
 @admin.register(Invoice)
 class InvoiceAdmin(admin.ModelAdmin):
-    list_display = ('__str__', 'project', 'start_date')
+    list_display = ('__str__', 'project', 'start_date', 'state', 'document_version')
+    # Ledger, tax and total are derived from the components and tax percentage, correct them instead
+    readonly_fields = ('document', 'document_version', 'closed_subtotal', 'tax', 'total')
+    actions = ['regenerate_document']
+
+    def save_model(self, request, obj, form, change):
+        super().save_model(request, obj, form, change)
+        # Correcting closed invoice from admin recalculate its total and regenerate its frozen document
+        if change:
+            obj.correct(get_dynamic_setting(INVOICE_TAX))
+
+    @admin.action(description='Recalculate and regenerate frozen document of closed invoice')
+    def regenerate_document(self, request, queryset):
+        invoices = queryset.exclude(state=Invoice.InvoiceState.IN_PROGRESS)
+        tax_percentage = get_dynamic_setting(INVOICE_TAX)
+        for invoice in invoices:
+            invoice.correct(tax_percentage)
+
+        self.message_user(request, f"Document of {len(invoices)} closed invoice is regenerated")
+
+
+@admin.register(BillingRun)
+class BillingRunAdmin(admin.ModelAdmin):
+    list_display = ('period', 'close_date', 'state', 'finish_date')
+
+
+@admin.register(BillingRunProject)
+class BillingRunProjectAdmin(admin.ModelAdmin):
+    list_display = ('billing_run', 'project', 'closed_invoice', 'new_invoice')
+
+
+@admin.register(Job)
+class JobAdmin(admin.ModelAdmin):
+    list_display = ('type', 'state', 'progress', 'total', 'created_at', 'finish_date')
+
+
+class InvoiceComponentAdmin(admin.ModelAdmin):
+    """
+    Admin of invoice component, the invoice is recalculated after the component is changed
+    """
+
+    def save_model(self, request, obj, form, change):
+        # Component can be moved to other invoice, the previous invoice need to be rebuilt too
+        invoice_ids = {obj.invoice_id}
+        if change:
+            invoice_ids.update(type(obj).objects.filter(id=obj.id).values_list('invoice_id', flat=True))
+
+        super().save_model(request, obj, form, change)
+        self.correct_invoices(invoice_ids)
+
+    def delete_model(self, request, obj):
+        super().delete_model(request, obj)
+        self.correct_invoices({obj.invoice_id})
+
+    def delete_queryset(self, request, queryset):
+        invoice_ids = set(queryset.values_list('invoice_id', flat=True))
+        super().delete_queryset(request, queryset)
+        self.correct_invoices(invoice_ids)
+
+    def correct_invoices(self, invoice_ids):
+        tax_percentage = get_dynamic_setting(INVOICE_TAX)
+        for invoice in Invoice.objects.filter(id__in=invoice_ids):
+            invoice.correct(tax_percentage)
 
 
 @admin.register(InvoiceInstance)
-class InvoiceInstanceAdmin(admin.ModelAdmin):
+class InvoiceInstanceAdmin(InvoiceComponentAdmin):
     list_display = ('instance_id',)
 
 
 @admin.register(InvoiceFloatingIp)
-class InvoiceFloatingIpAdmin(admin.ModelAdmin):
+class InvoiceFloatingIpAdmin(InvoiceComponentAdmin):
     list_display = ('fip_id',)
 
 
 @admin.register(InvoiceVolume)
-class InvoiceVolumeAdmin(admin.ModelAdmin):
+class InvoiceVolumeAdmin(InvoiceComponentAdmin):
     list_display = ('volume_id',)
 
 
 @admin.register(InvoiceRouter)
-class InvoiceRouterAdmin(admin.ModelAdmin):
+class InvoiceRouterAdmin(InvoiceComponentAdmin):
     list_display = ('router_id', 'name')
 
 
 @admin.register(InvoiceSnapshot)
-class InvoiceSnapshotAdmin(admin.ModelAdmin):
+class InvoiceSnapshotAdmin(InvoiceComponentAdmin):
     list_display = ('snapshot_id', 'name', 'space_allocation_gb')
 
 
 @admin.register(InvoiceImage)
-class InvoiceImageAdmin(admin.ModelAdmin):
+class InvoiceImageAdmin(InvoiceComponentAdmin):
     list_display = ('image_id', 'name', 'space_allocation_gb')
 
 
 @admin.register(Notification)
 class InvoiceImageAdmin(admin.ModelAdmin):
-    list_display = ('project', 'title', 'short_description', 'sent_status')
+    list_display = ('project', 'title', 'short_description', 'sent_status', 'send_attempt')
 
 
 @admin.register(Balance)
@@ -4,3 +4,11 @@ from django.apps import AppConfig
 class CoreConfig(AppConfig):
     default_auto_field = 'django.db.models.BigAutoField'
     name = 'core'
+
+    def ready(self):
+        from core.component.component import PRICE_MODEL
+        from core.utils.dynamic_setting import connect_dynamic_setting_signals
+        from core.utils.price_catalog import connect_price_signals
+
+        connect_price_signals(PRICE_MODEL.values())
+        connect_dynamic_setting_signals()
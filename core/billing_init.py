@@ -0,0 +1,171 @@
+import json
+import logging
+
+import dateutil.parser
+import pytz
+from django.utils import timezone
+
+from core.component import component
+from core.models import BillingProject, Invoice
+from core.notification import send_notification
+from yuyu import settings
+
+LOG = logging.getLogger("yuyu")
+
+# Maximum key of missing price component listed in the summary notification for every price
+MISSING_PRICE_DETAIL_LIMIT = 100
+STREAM_CHUNK_SIZE = 64 * 1024
+
+
+def iter_lines(stream, chunk_size=STREAM_CHUNK_SIZE):
+    """
+    Read lines of stream in chunk.
+    readline() of Django request copies the whole remaining buffer for every line, it is too slow for big upload.
+    :param stream: File like object, e.g. the request stream
+    :param chunk_size: Bytes read at once
+    :return: Generator of line
+    """
+    remaining = b''
+    while True:
+        chunk = stream.read(chunk_size)
+        if not chunk:
+            break
+
+        lines = (remaining + chunk).split(b'\n')
+        remaining = lines.pop()
+        yield from lines
+
+    if remaining:
+        yield remaining
+
+
+class BillingInitializer(object):
+    """
+    Load the cloud inventory when billing is enabled.
+    Prices are loaded up front, components are inserted in chunks with bulk insert,
+    and component without price is reported in one summary notification.
+    """
+
+    def __init__(self):
+        self.month_first_day = timezone.now().replace(day=1, hour=0, minute=0, second=0, microsecond=0)
+        # Existing project is loaded at once, only new project is created one by one
+        self.projects = {project.tenant_id: project for project in BillingProject.objects.order_by('-id')}
+        self.invoices = {}
+        self.pending_components = {label: [] for label in component.INVOICE_HANDLER.keys()}
+        self.missing_prices = []
+        self.created = 0
+
+        for handler in component.INVOICE_HANDLER.values():
+            handler.preload_price()
+
+    def parse_time(self, time):
+        dt = dateutil.parser.isoparse(time)
+        if not dt.tzinfo:
+            return pytz.UTC.localize(dt=dt)
+
+        return dt
+
+    def get_invoice(self, tenant_id):
+        if tenant_id not in self.projects:
+            self.projects[tenant_id] = BillingProject.objects.create(tenant_id=tenant_id)
+
+        if tenant_id not in self.invoices:
+            invoice = Invoice.objects.create(
+                project=self.projects[tenant_id],
+                start_date=self.month_first_day,
+                state=Invoice.InvoiceState.IN_PROGRESS,
+            )
+            self.invoices[tenant_id] = invoice
+
+        return self.invoices[tenant_id]
+
+    def add(self, label, payload):
+        """
+        Add component of the inventory, it is inserted when the chunk is full
+        :param label: Invoice component label
+        :param payload: Component payload with tenant_id and start_date
+        """
+        if label not in component.INVOICE_HANDLER:
+            raise ValueError(f"Unknown component {label}")
+
+        start_date = self.parse_time(payload["start_date"])
+        if start_date < self.month_first_day:
+            start_date = self.month_first_day
+
+        payload["start_date"] = start_date
+        payload["invoice"] = self.get_invoice(payload["tenant_id"])
+
+        # create not accepting tenant_id, delete it
+        del payload["tenant_id"]
+
+        handler = component.INVOICE_HANDLER[label]
+        self.pending_components[label].append(handler.prepare_create(payload, self.missing_prices))
+        if len(self.pending_components[label]) >= handler.BULK_BATCH_SIZE:
+            self.flush(label)
+
+    def flush(self, label):
+        """
+        Insert pending components of the label
+        """
+        pending_components = self.pending_components[label]
+        if pending_components:
+            component.INVOICE_HANDLER[label].INVOICE_CLASS.objects.bulk_create(pending_components)
+            self.created += len(pending_components)
+            self.pending_components[label] = []
+
+    def finish(self):
+        """
+        Insert the remaining components and report missing price
+        """
+        for label in self.pending_components.keys():
+            self.flush(label)
+
+        LOG.info(f"Billing initialized with {self.created} components of {len(self.invoices)} projects")
+
+        if self.missing_prices:
+            self.notify_missing_prices()
+
+    def notify_missing_prices(self):
+        missing_keys = {}
+        for identifier, key in self.missing_prices:
+            missing_keys.setdefault(identifier, []).append(key)
+
+        details = []
+        for identifier, keys in missing_keys.items():
+            listed_keys = ", ".join(map(str, keys[:MISSING_PRICE_DETAIL_LIMIT]))
+            detail = f'{identifier}: {len(keys)} components, {listed_keys}'
+            if len(keys) > MISSING_PRICE_DETAIL_LIMIT:
+                detail += f' and {len(keys) - MISSING_PRICE_DETAIL_LIMIT} more'
+            details.append(detail)
+
+        send_notification(
+            project=None,
+            title=f'{settings.EMAIL_TAG} [Error] Price not found when enabling billing',
+            short_description=f'Price not found for {len(self.missing_prices)} components, fallback price 0 is used',
+            content=f'Price not found for {len(self.missing_prices)} components. Will use fallback price as 0. '
+                    f'Please check your Price configuration. \n' + ' \n'.join(details),
+        )
+
+    def load(self, data):
+        """
+        Load inventory of JSON body, dict of component label and list of payload
+        """
+        for label in component.INVOICE_HANDLER.keys():
+            for payload in data[label]:
+                self.add(label, payload)
+
+        self.finish()
+
+    def load_ndjson(self, stream):
+        """
+        Load streamed inventory, every line is a JSON payload with the component label in label field
+        :param stream: File like object, e.g. the request stream
+        """
+        for line in iter_lines(stream):
+            if not line.strip():
+                continue
+
+            payload = json.loads(line)
+            self.add(payload.pop("label"), payload)
+
+        self.finish()
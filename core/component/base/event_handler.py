@@ -3,25 +3,103 @@ import abc
 from django.db import transaction
 from django.utils import timezone
 
+from core.exception import BillingDisabled, StaleTenantInvoice
 from core.models import Invoice, BillingProject
 from core.component.base.invoice_handler import InvoiceHandler
+from core.utils.dynamic_setting import get_fresh_dynamic_setting, BILLING_ENABLED
+from core.utils.tenant_invoice import get_tenant_invoice
 
 
 class EventHandler(metaclass=abc.ABCMeta):
+    # Event types that is handled by this handler, support wildcard pattern e.g. volume.*
+    EVENT_TYPES = []
+    # Update event types that can be superseded by the next update of the same resource
+    COLLAPSIBLE_EVENT_TYPES = []
+
     def __init__(self, invoice_handler):
         self.invoice_handler: InvoiceHandler = invoice_handler
 
+    @abc.abstractmethod
+    def get_tenant_id(self, raw_payload):
+        """
+        Get tenant id of the resource inside the event
+        :param raw_payload: Raw payload from messaging queue
+        :return: Tenant id
+        """
+        raise NotImplementedError()
+
+    def get_event_key(self, event_type, raw_payload):
+        """
+        Key of the resource inside the event, events with the same key are applied in order
+        :param event_type: The event type
+        :param raw_payload: Raw payload from messaging queue
+        :return: Tuple of tenant id and resource id
+        """
+        payload = self.clean_payload(event_type, raw_payload)
+        return self.get_tenant_id(raw_payload), payload[self.invoice_handler.KEY_FIELD]
+
+    def is_superseded(self, event_type, raw_payload, next_event_type, next_raw_payload):
+        """
+        Whether the event can be skipped because the next event of the same resource override it
+        :param event_type: The event type
+        :param raw_payload: Raw payload of the event
+        :param next_event_type: The next event type of the same resource
+        :param next_raw_payload: Raw payload of the next event
+        :return:
+        """
+        return event_type in self.COLLAPSIBLE_EVENT_TYPES and next_event_type in self.COLLAPSIBLE_EVENT_TYPES
+
     def get_tenant_progress_invoice(self, tenant_id):
         """
         Get in progress invoice for specific tenant id.
         Will create new instance if active invoice not found.
         And will create new billing project if tenant id not found.
+        The invoice is cached by tenant id, other field than the id, project and state is loaded when accessed.
+        Cached invoice may be closed or deleted by other process before the cache is invalidated,
+        it is checked by check_progress_invoice() before the event is written into it.
         :param tenant_id: Tenant id to get the invoice from.
         :return:
         """
+        project_id, invoice_id = get_tenant_invoice(tenant_id, lambda: self.load_tenant_progress_invoice(tenant_id))
+        values = {"id": invoice_id, "project_id": project_id, "state": Invoice.InvoiceState.IN_PROGRESS}
+        field_names = [f.attname for f in Invoice._meta.concrete_fields if f.attname in values]
+
+        return Invoice.from_db(Invoice.objects.db, field_names, [values[name] for name in field_names])
+
+    def check_progress_invoice(self, invoice: Invoice, raw_payload, lock=True):
+        """
+        Check that the cached invoice is still in progress, before writing into it or concluding that the resource
+        has no active component. Active component is never found in a closed invoice, so it is not checked then.
+        :param invoice: Invoice from get_tenant_progress_invoice()
+        :param raw_payload: Raw payload of the event
+        :param lock: Lock the invoice until the event is applied, so it is not closed in the meantime
+        :raise StaleTenantInvoice: When the invoice is no longer in progress, the event should be applied again
+        """
+        if getattr(invoice, '_progress_locked', False):
+            return
+
+        queryset = Invoice.objects.filter(id=invoice.id, state=Invoice.InvoiceState.IN_PROGRESS)
+        if lock:
+            queryset = queryset.select_for_update()
+        if queryset.values_list('id', flat=True).first() is None:
+            raise StaleTenantInvoice(self.get_tenant_id(raw_payload))
+
+        invoice._progress_locked = lock
+
+    def load_tenant_progress_invoice(self, tenant_id):
+        """
+        Get or create in progress invoice for specific tenant id
+        :param tenant_id: Tenant id to get the invoice from.
+        :return: Tuple of project id and invoice id
+        :raise BillingDisabled: When the invoice need to be created but billing is disabled
+        """
         invoice = Invoice.objects.filter(project__tenant_id=tenant_id, state=Invoice.InvoiceState.IN_PROGRESS).first()
         if not invoice:
-            project = BillingProject.objects.get_or_create(tenant_id=tenant_id)
+            # Cached setting can still be enabled after disable or reset billing closed or deleted every invoice
+            if not get_fresh_dynamic_setting(BILLING_ENABLED):
+                raise BillingDisabled()
+
+            project, created = BillingProject.objects.get_or_create(tenant_id=tenant_id)
             date_today = timezone.now()
             month_first_day = date_today.replace(day=1, hour=0, minute=0, second=0, microsecond=0)
             invoice = Invoice.objects.create(
@@ -30,7 +108,7 @@ class EventHandler(metaclass=abc.ABCMeta):
                 state=Invoice.InvoiceState.IN_PROGRESS
             )
 
-        return invoice
+        return invoice.project_id, invoice.id
 
     @abc.abstractmethod
     def handle(self, event_type, raw_payload):
@@ -67,6 +145,7 @@ class EventHandler(metaclass=abc.ABCMeta):
         payload = self.clean_payload(event_type, raw_payload)
         instance = self.invoice_handler.get_active_instance(invoice, payload)
         if not instance:
+            self.check_progress_invoice(invoice, raw_payload)
             payload['invoice'] = invoice
             payload['start_date'] = timezone.now()
 
@@ -91,9 +170,11 @@ class EventHandler(metaclass=abc.ABCMeta):
         payload = self.clean_payload(event_type, raw_payload)
         instance = self.invoice_handler.get_active_instance(invoice, payload)
         if instance:
+            self.check_progress_invoice(invoice, raw_payload)
             self.invoice_handler.update_and_close(instance, payload)
             return True
 
+        self.check_progress_invoice(invoice, raw_payload, lock=False)
         return False
 
     @transaction.atomic
@@ -113,11 +194,15 @@ class EventHandler(metaclass=abc.ABCMeta):
 
         if instance:
             if self.invoice_handler.is_price_dependency_changed(instance, payload):
+                self.check_progress_invoice(invoice, raw_payload)
                 self.invoice_handler.roll(instance, close_date=timezone.now(), update_payload=payload, fallback_price=True)
                 return True
 
             if self.invoice_handler.is_informative_changed(instance, payload):
+                self.check_progress_invoice(invoice, raw_payload)
                 self.invoice_handler.update(instance, update_payload=payload)
                 return True
+        else:
+            self.check_progress_invoice(invoice, raw_payload, lock=False)
 
         return False
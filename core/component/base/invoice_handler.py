@@ -1,11 +1,12 @@
 import abc
 
 from django.conf import settings
+from django.db import transaction
 from django.utils import timezone
 from djmoney.money import Money
 
 from core.exception import PriceNotFound
-from core.models import InvoiceComponentMixin, PriceMixin
+from core.models import InvoiceComponentMixin, PriceMixin, Invoice
 from core.notification import send_notification
 
 
@@ -14,6 +15,7 @@ class InvoiceHandler(metaclass=abc.ABCMeta):
     KEY_FIELD = None
     INFORMATIVE_FIELDS = []
     PRICE_DEPENDENCY_FIELDS = []
+    BULK_BATCH_SIZE = 1000
 
     def create(self, payload, fallback_price=False):
         """
@@ -48,6 +50,31 @@ class InvoiceHandler(metaclass=abc.ABCMeta):
 
         self.INVOICE_CLASS.objects.create(**payload)
 
+    def prepare_create(self, payload, missing_prices):
+        """
+        Create new invoice component without saving it, use 0 price if price not found.
+        Missing price is not notified one by one, it is collected so it can be reported at once.
+        :param payload: the data that will be created
+        :param missing_prices: List to collect (price identifier, key) of component whose price is not found
+        :return: The new unsaved instance
+        """
+        try:
+            price = self.get_price(payload)
+            if price is None:
+                raise PriceNotFound()
+
+            hourly_price = price.hourly_price
+            monthly_price = price.monthly_price
+        except PriceNotFound as e:
+            missing_prices.append((e.identifier, payload[self.KEY_FIELD]))
+            hourly_price = Money(amount=0, currency=settings.DEFAULT_CURRENCY)
+            monthly_price = Money(amount=0, currency=settings.DEFAULT_CURRENCY)
+
+        payload['hourly_price'] = hourly_price
+        payload['monthly_price'] = monthly_price
+
+        return self.INVOICE_CLASS(**payload)
+
     def delete(self):
         self.INVOICE_CLASS.objects.all().delete()
 
@@ -67,6 +94,19 @@ class InvoiceHandler(metaclass=abc.ABCMeta):
         if not instance.is_closed():
             instance.close(close_date)
 
+        instance = self.prepare_roll(instance, update_payload, fallback_price)
+        instance.save()
+
+        return instance
+
+    def prepare_roll(self, instance: InvoiceComponentMixin, update_payload, fallback_price=False):
+        """
+        Clone closed instance into the next component instance without saving it
+        :param instance: The closed instance, it will be turned into the new instance
+        :param update_payload: New data to update the next component instance
+        :param fallback_price: Whether use 0 price if price not found
+        :return: The new unsaved instance
+        """
         # Set primary ke to None, this will make save() to create a new row
         instance.pk = None
 
@@ -103,10 +143,51 @@ class InvoiceHandler(metaclass=abc.ABCMeta):
                 raise
         instance.hourly_price = hourly_price
         instance.monthly_price = monthly_price
-        instance.save()
 
         return instance
 
+    def bulk_close(self, invoice, close_date):
+        """
+        Close all active component of the invoice with single update query.
+        Price of closed component is added to the invoice ledger at once.
+        :param invoice: The invoice that the components will be closed
+        :param close_date: The close date of the components
+        :return: List of closed component instance
+        """
+        with transaction.atomic():
+            active_components = list(
+                self.INVOICE_CLASS.objects.select_for_update().filter(invoice=invoice, end_date=None)
+            )
+            if not active_components:
+                return []
+
+            self.INVOICE_CLASS.objects.filter(id__in=[c.id for c in active_components]) \
+                .update(end_date=close_date, updated_at=timezone.now())
+
+            for active_component in active_components:
+                active_component.end_date = close_date
+
+            Invoice.add_closed_subtotal(invoice.id, sum(map(lambda x: x.price_charged, active_components)))
+
+        return active_components
+
+    def bulk_roll(self, instances, update_payload=None, fallback_price=False):
+        """
+        Roll closed instances with bulk insert.
+        Produce the same component as calling roll() for every instance.
+        :param instances: Closed instances that want to be rolled
+        :param update_payload: New data to update the next component instances
+        :param fallback_price: Whether use 0 price if price not found
+        :return: List of new instance
+        """
+        if update_payload is None:
+            update_payload = {}
+
+        new_instances = [self.prepare_roll(instance, update_payload, fallback_price) for instance in instances]
+        self.INVOICE_CLASS.objects.bulk_create(new_instances, batch_size=self.BULK_BATCH_SIZE)
+
+        return new_instances
+
     def update(self, instance, update_payload, save=True):
         """
         Update instance
@@ -185,3 +266,9 @@ class InvoiceHandler(metaclass=abc.ABCMeta):
         :return:
         """
         raise NotImplementedError()
+
+    def preload_price(self):
+        """
+        Load every price used by get_price() at once, before getting price of a lot of component
+        """
+        pass
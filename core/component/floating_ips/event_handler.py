@@ -3,14 +3,19 @@ from core.component.floating_ips.invoice_handler import FloatingIpInvoiceHandler
 
 
 class FloatingIpEventHandler(EventHandler):
+    EVENT_TYPES = ['floatingip.create.end', 'floatingip.delete.end']
+
+    def get_tenant_id(self, raw_payload):
+        return raw_payload['floatingip']['tenant_id']
+
     def handle(self, event_type, raw_payload):
         if event_type == 'floatingip.create.end':
-            tenant_id = raw_payload['floatingip']['tenant_id']
+            tenant_id = self.get_tenant_id(raw_payload)
             invoice = self.get_tenant_progress_invoice(tenant_id)
             self.handle_create(invoice, event_type, raw_payload)
 
         if event_type == 'floatingip.delete.end':
-            tenant_id = raw_payload['floatingip']['tenant_id']
+            tenant_id = self.get_tenant_id(raw_payload)
             invoice = self.get_tenant_progress_invoice(tenant_id)
             self.handle_delete(invoice, event_type, raw_payload)
 
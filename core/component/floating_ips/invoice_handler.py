@@ -1,6 +1,7 @@
 from core.exception import PriceNotFound
 from core.models import FloatingIpsPrice, InvoiceFloatingIp, PriceMixin
 from core.component.base.invoice_handler import InvoiceHandler
+from core.utils import price_catalog
 
 
 class FloatingIpInvoiceHandler(InvoiceHandler):
@@ -10,10 +11,13 @@ class FloatingIpInvoiceHandler(InvoiceHandler):
     INFORMATIVE_FIELDS = ["ip"]
 
     def get_price(self, payload) -> PriceMixin:
-        price = FloatingIpsPrice.objects.first()
+        price = price_catalog.get_price(FloatingIpsPrice)
 
         if price is None:
             raise PriceNotFound(identifier='floating ip')
 
         return price
 
+    def preload_price(self):
+        price_catalog.preload_prices(FloatingIpsPrice)
+
@@ -2,19 +2,25 @@ from core.component.base.event_handler import EventHandler
 
 
 class ImageEventHandler(EventHandler):
+    EVENT_TYPES = ['image.activate', 'image.delete', 'image.update']
+    COLLAPSIBLE_EVENT_TYPES = ['image.update']
+
+    def get_tenant_id(self, raw_payload):
+        return raw_payload['owner']
+
     def handle(self, event_type, raw_payload):
         if event_type == 'image.activate':
-            tenant_id = raw_payload['owner']
+            tenant_id = self.get_tenant_id(raw_payload)
             invoice = self.get_tenant_progress_invoice(tenant_id)
             self.handle_create(invoice, event_type, raw_payload)
 
         if event_type == 'image.delete':
-            tenant_id = raw_payload['owner']
+            tenant_id = self.get_tenant_id(raw_payload)
             invoice = self.get_tenant_progress_invoice(tenant_id)
             self.handle_delete(invoice, event_type, raw_payload)
 
         if event_type == 'image.update':
-            tenant_id = raw_payload['owner']
+            tenant_id = self.get_tenant_id(raw_payload)
             invoice = self.get_tenant_progress_invoice(tenant_id)
             self.handle_update(invoice, event_type, raw_payload)
 
@@ -1,6 +1,7 @@
 from core.component.base.invoice_handler import InvoiceHandler
 from core.exception import PriceNotFound
 from core.models import PriceMixin, InvoiceImage, ImagePrice
+from core.utils import price_catalog
 
 
 class ImageInvoiceHandler(InvoiceHandler):
@@ -10,8 +11,11 @@ class ImageInvoiceHandler(InvoiceHandler):
     INFORMATIVE_FIELDS = ["name"]
 
     def get_price(self, payload) -> PriceMixin:
-        price = ImagePrice.objects.first()
+        price = price_catalog.get_price(ImagePrice)
         if price is None:
             raise PriceNotFound(identifier='image')
 
         return price
+
+    def preload_price(self):
+        price_catalog.preload_prices(ImagePrice)
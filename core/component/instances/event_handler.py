@@ -2,9 +2,20 @@ from core.component.base.event_handler import EventHandler
 
 
 class InstanceEventHandler(EventHandler):
+    EVENT_TYPES = ['compute.instance.update']
+    COLLAPSIBLE_EVENT_TYPES = ['compute.instance.update']
+
+    def get_tenant_id(self, raw_payload):
+        return raw_payload['tenant_id']
+
+    def is_superseded(self, event_type, raw_payload, next_event_type, next_raw_payload):
+        # Instance state decide whether the component is created or closed, so only the same state is collapsed
+        return super().is_superseded(event_type, raw_payload, next_event_type, next_raw_payload) and \
+            raw_payload['state'] == next_raw_payload['state']
+
     def handle(self, event_type, raw_payload):
         if event_type == 'compute.instance.update':
-            tenant_id = raw_payload['tenant_id']
+            tenant_id = self.get_tenant_id(raw_payload)
             invoice = self.get_tenant_progress_invoice(tenant_id)
 
             is_updated = self.handle_update(invoice, event_type, raw_payload)
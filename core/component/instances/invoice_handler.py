@@ -1,6 +1,7 @@
 from core.exception import PriceNotFound
 from core.models import FlavorPrice, InvoiceInstance, PriceMixin
 from core.component.base.invoice_handler import InvoiceHandler
+from core.utils import price_catalog
 
 
 class InstanceInvoiceHandler(InvoiceHandler):
@@ -10,9 +11,12 @@ class InstanceInvoiceHandler(InvoiceHandler):
     INFORMATIVE_FIELDS = ['name']
 
     def get_price(self, payload) -> PriceMixin:
-        price = FlavorPrice.objects.filter(flavor_id=payload['flavor_id']).first()
+        price = price_catalog.get_price(FlavorPrice, flavor_id=payload['flavor_id'])
 
         if price is None:
             raise PriceNotFound(identifier='flavor')
 
         return price
+
+    def preload_price(self):
+        price_catalog.preload_prices(FlavorPrice, 'flavor_id')
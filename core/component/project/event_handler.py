@@ -1,14 +1,28 @@
 import logging
 
+from core.exception import BillingDisabled
 from core.models import BillingProject, Invoice
+from core.utils.dynamic_setting import get_fresh_dynamic_setting, BILLING_ENABLED
 from django.utils import timezone
 
 LOG = logging.getLogger("yuyu_notification")
 
 
 class ProjectEventHandler:
+    EVENT_TYPES = ['identity.project.created']
+
+    def get_event_key(self, event_type, raw_payload):
+        return raw_payload['target']['id'],
+
+    def is_superseded(self, event_type, raw_payload, next_event_type, next_raw_payload):
+        return False
+
     def handle(self, event_type, raw_payload):
         if event_type == 'identity.project.created':
+            # Cached setting can still be enabled right after billing is disabled
+            if not get_fresh_dynamic_setting(BILLING_ENABLED):
+                raise BillingDisabled()
+
             new_project_id = raw_payload['target']['id']
             LOG.info("Registering new project " + new_project_id)
             project = BillingProject()
@@ -3,18 +3,29 @@ from core.component.floating_ips.invoice_handler import FloatingIpInvoiceHandler
 
 
 class RouterEventHandler(EventHandler):
+    EVENT_TYPES = ['router.create.end', 'router.update.end', 'router.delete.end']
+    COLLAPSIBLE_EVENT_TYPES = ['router.update.end']
+
+    def get_tenant_id(self, raw_payload):
+        return raw_payload['router']['tenant_id']
+
     def is_external_gateway_set(self, raw_payload):
         return raw_payload['router']['external_gateway_info'] is not None
 
+    def is_superseded(self, event_type, raw_payload, next_event_type, next_raw_payload):
+        # Setting or removing gateway create or close the component, so it must not be skipped
+        return super().is_superseded(event_type, raw_payload, next_event_type, next_raw_payload) and \
+            self.is_external_gateway_set(raw_payload) == self.is_external_gateway_set(next_raw_payload)
+
     def handle(self, event_type, raw_payload):
         # Case: Creating router with external gateway
         if event_type == 'router.create.end' and self.is_external_gateway_set(raw_payload):
-            tenant_id = raw_payload['router']['tenant_id']
+            tenant_id = self.get_tenant_id(raw_payload)
             invoice = self.get_tenant_progress_invoice(tenant_id)
             self.handle_create(invoice, event_type, raw_payload)
 
         if event_type == 'router.update.end':
-            tenant_id = raw_payload['router']['tenant_id']
+            tenant_id = self.get_tenant_id(raw_payload)
             invoice = self.get_tenant_progress_invoice(tenant_id)
 
             # Handel update for existing instance
@@ -30,7 +41,7 @@ class RouterEventHandler(EventHandler):
 
         # Case: Delete router
         if event_type == 'router.delete.end':
-            tenant_id = raw_payload['router']['tenant_id']
+            tenant_id = self.get_tenant_id(raw_payload)
             invoice = self.get_tenant_progress_invoice(tenant_id)
             self.handle_delete(invoice, event_type, raw_payload)
 
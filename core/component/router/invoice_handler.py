@@ -1,6 +1,7 @@
 from core.component.base.invoice_handler import InvoiceHandler
 from core.exception import PriceNotFound
 from core.models import PriceMixin, InvoiceRouter, RouterPrice
+from core.utils import price_catalog
 
 
 class RouterInvoiceHandler(InvoiceHandler):
@@ -10,8 +11,11 @@ class RouterInvoiceHandler(InvoiceHandler):
     INFORMATIVE_FIELDS = ["name"]
 
     def get_price(self, payload) -> PriceMixin:
-        price = RouterPrice.objects.first()
+        price = price_catalog.get_price(RouterPrice)
         if price is None:
             raise PriceNotFound(identifier='router')
 
         return price
+
+    def preload_price(self):
+        price_catalog.preload_prices(RouterPrice)
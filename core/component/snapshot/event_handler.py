@@ -3,19 +3,25 @@ from core.component.floating_ips.invoice_handler import FloatingIpInvoiceHandler
 
 
 class SnapshotEventHandler(EventHandler):
+    EVENT_TYPES = ['snapshot.create.end', 'snapshot.delete.end', 'snapshot.update.end']
+    COLLAPSIBLE_EVENT_TYPES = ['snapshot.update.end']
+
+    def get_tenant_id(self, raw_payload):
+        return raw_payload['tenant_id']
+
     def handle(self, event_type, raw_payload):
         if event_type == 'snapshot.create.end':
-            tenant_id = raw_payload['tenant_id']
+            tenant_id = self.get_tenant_id(raw_payload)
             invoice = self.get_tenant_progress_invoice(tenant_id)
             self.handle_create(invoice, event_type, raw_payload)
 
         if event_type == 'snapshot.delete.end':
-            tenant_id = raw_payload['tenant_id']
+            tenant_id = self.get_tenant_id(raw_payload)
             invoice = self.get_tenant_progress_invoice(tenant_id)
             self.handle_delete(invoice, event_type, raw_payload)
 
         if event_type == 'snapshot.update.end':
-            tenant_id = raw_payload['tenant_id']
+            tenant_id = self.get_tenant_id(raw_payload)
             invoice = self.get_tenant_progress_invoice(tenant_id)
             self.handle_update(invoice, event_type, raw_payload)
 
@@ -1,6 +1,7 @@
 from core.component.base.invoice_handler import InvoiceHandler
 from core.exception import PriceNotFound
 from core.models import PriceMixin, InvoiceSnapshot, SnapshotPrice
+from core.utils import price_catalog
 
 
 class SnapshotInvoiceHandler(InvoiceHandler):
@@ -10,8 +11,11 @@ class SnapshotInvoiceHandler(InvoiceHandler):
     INFORMATIVE_FIELDS = ["name"]
 
     def get_price(self, payload) -> PriceMixin:
-        price = SnapshotPrice.objects.first()
+        price = price_catalog.get_price(SnapshotPrice)
         if price is None:
             raise PriceNotFound(identifier='snapshot')
 
         return price
+
+    def preload_price(self):
+        price_catalog.preload_prices(SnapshotPrice)
@@ -2,19 +2,25 @@ from core.component.base.event_handler import EventHandler
 
 
 class VolumeEventHandler(EventHandler):
+    EVENT_TYPES = ['volume.create.end', 'volume.delete.end', 'volume.resize.end', 'volume.update.end', 'volume.retype']
+    COLLAPSIBLE_EVENT_TYPES = ['volume.resize.end', 'volume.update.end', 'volume.retype']
+
+    def get_tenant_id(self, raw_payload):
+        return raw_payload['tenant_id']
+
     def handle(self, event_type, raw_payload):
         if event_type == 'volume.create.end':
-            tenant_id = raw_payload['tenant_id']
+            tenant_id = self.get_tenant_id(raw_payload)
             invoice = self.get_tenant_progress_invoice(tenant_id)
             self.handle_create(invoice, event_type, raw_payload)
 
         if event_type == 'volume.delete.end':
-            tenant_id = raw_payload['tenant_id']
+            tenant_id = self.get_tenant_id(raw_payload)
             invoice = self.get_tenant_progress_invoice(tenant_id)
             self.handle_delete(invoice, event_type, raw_payload)
 
         if event_type in ['volume.resize.end', 'volume.update.end', 'volume.retype']:
-            tenant_id = raw_payload['tenant_id']
+            tenant_id = self.get_tenant_id(raw_payload)
             invoice = self.get_tenant_progress_invoice(tenant_id)
             self.handle_update(invoice, event_type, raw_payload)
 
@@ -1,6 +1,7 @@
 from core.exception import PriceNotFound
 from core.models import VolumePrice, InvoiceVolume, PriceMixin
 from core.component.base.invoice_handler import InvoiceHandler
+from core.utils import price_catalog
 
 
 class VolumeInvoiceHandler(InvoiceHandler):
@@ -10,9 +11,12 @@ class VolumeInvoiceHandler(InvoiceHandler):
     INFORMATIVE_FIELDS = ['volume_name']
 
     def get_price(self, payload) -> PriceMixin:
-        price = VolumePrice.objects.filter(volume_type_id=payload['volume_type_id']).first()
+        price = price_catalog.get_price(VolumePrice, volume_type_id=payload['volume_type_id'])
 
         if price is None:
             raise PriceNotFound(identifier='volume')
 
         return price
+
+    def preload_price(self):
+        price_catalog.preload_prices(VolumePrice, 'volume_type_id')
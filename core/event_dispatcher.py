@@ -0,0 +1,72 @@
+import logging
+import queue
+import threading
+from concurrent.futures import Future
+
+from django.db import connection
+
+LOG = logging.getLogger("yuyu_notification")
+
+
+class KeyedEventDispatcher(object):
+    """
+    Run event handling on worker threads.
+    Task with the same key is always run by the same worker, so events of a resource are applied in order
+    while events of different resources are applied in parallel.
+    Every worker has a bounded queue, submit() will block when the queue is full,
+    so the listener stop receiving message from the broker until the workers catch up.
+    submit() return a future, the listener wait for it before acknowledging the message,
+    so queued event is never lost when the process is stopped.
+    """
+
+    def __init__(self, workers, queue_size):
+        self.queues = [queue.Queue(maxsize=queue_size) for _ in range(workers)]
+        self.threads = [
+            threading.Thread(target=self._run, args=(task_queue,), name=f'yuyu-event-worker-{index}', daemon=True)
+            for index, task_queue in enumerate(self.queues)
+        ]
+
+    def start(self):
+        for thread in self.threads:
+            thread.start()
+
+    def stop(self):
+        """
+        Stop the workers after all queued task is done
+        """
+        for task_queue in self.queues:
+            task_queue.put(None)
+
+        for thread in self.threads:
+            thread.join()
+
+    def submit(self, key, func, *args):
+        """
+        Queue a task to the worker of the key
+        :param key: Hashable key, task with the same key is run in order
+        :param func: Function to run
+        :param args: Argument of the function
+        :return: Future of the task, done after the task is run
+        """
+        future = Future()
+        self.queues[hash(key) % len(self.queues)].put((future, func, args))
+        return future
+
+    def _run(self, task_queue):
+        while True:
+            task = task_queue.get()
+            if task is None:
+                break
+
+            future, func, args = task
+            if not future.set_running_or_notify_cancel():
+                continue
+
+            try:
+                future.set_result(func(*args))
+            except Exception as e:
+                LOG.exception("Error running event task")
+                future.set_exception(e)
+
+        # Every worker thread has its own connection
+        connection.close()
@@ -1,19 +1,33 @@
 import logging
 import traceback
+from concurrent.futures import wait
+from fnmatch import fnmatchcase
 
+import prometheus_client
+from django.db import transaction
 from oslo_messaging import NotificationResult
 
 from core.component import component
 from core.component.project.event_handler import ProjectEventHandler
+from core.exception import BillingDisabled, StaleTenantInvoice
 from core.notification import send_notification
 from core.utils.dynamic_setting import get_dynamic_settings, BILLING_ENABLED, get_dynamic_setting
+from core.utils.tenant_invoice import drop_tenant_invoice
 from yuyu import settings
 
 LOG = logging.getLogger("yuyu_notification")
 
+DROPPED_EVENT = prometheus_client.Counter('dropped_event', 'Event that is not handled by any handler',
+                                          ['event_type'])
+
 
 class EventEndpoint(object):
-    def __init__(self):
+    def __init__(self, dispatcher=None):
+        """
+        :param dispatcher: KeyedEventDispatcher to handle the event on worker threads, handled directly if None
+        """
+        self.dispatcher = dispatcher
+
         self.event_handler = [
             cls(component.INVOICE_HANDLER[label]) for label, cls in component.EVENT_HANDLER.items()
         ]
@@ -21,7 +35,73 @@ class EventEndpoint(object):
         # Add handler for project event
         self.event_handler.append(ProjectEventHandler())
 
+        # Event type and the handlers of it, resolved once for every event type
+        self.event_routes = {}
+
+    def get_handlers(self, event_type):
+        """
+        Get handlers that handle the event type, matched against EVENT_TYPES of the handler
+        :param event_type: The event type
+        :return: List of handler, empty if the event is not handled
+        """
+        handlers = self.event_routes.get(event_type)
+        if handlers is None:
+            handlers = [
+                handler for handler in self.event_handler
+                if any(fnmatchcase(event_type, pattern) for pattern in handler.EVENT_TYPES)
+            ]
+            self.event_routes[event_type] = handlers
+
+        return handlers
+
+    def get_event_key(self, handler, event_type, payload):
+        """
+        Get key of the resource inside the event
+        :param handler: Handler of the event
+        :param event_type: The event type
+        :param payload: Raw payload
+        :return: Tuple of tenant id and resource id
+        """
+        try:
+            return handler.get_event_key(event_type, payload)
+        except Exception:
+            # Unknown payload is applied on its own, the handler will report the error
+            LOG.exception("Error getting event key")
+            return (id(payload),)
+
+    def dispatch(self, event_key, func, *args):
+        """
+        Run the function on the worker of the tenant, or directly if there is no dispatcher.
+        Events are ordered by tenant instead of resource, so billing project and invoice of a new tenant
+        is never created by two workers at once.
+        :return: Future of the dispatched function, None if it is run directly
+        """
+        if self.dispatcher:
+            return self.dispatcher.submit(event_key[0], func, *args)
+
+        func(*args)
+        return None
+
+    def wait_dispatched(self, tasks):
+        """
+        Wait until every dispatched function is run, so the notification is only acknowledged after it is handled
+        and a stopped or crashed Event Monitor does not lose queued event
+        :param tasks: Return value of dispatch()
+        """
+        futures = [task for task in tasks if task is not None]
+        if futures:
+            wait(futures)
+
+    def drop_event(self, event_type):
+        LOG.debug("Dropping unhandled event " + str(event_type))
+        DROPPED_EVENT.labels(event_type).inc()
+
     def info(self, ctxt, publisher_id, event_type, payload, metadata):
+        handlers = self.get_handlers(event_type)
+        if not handlers:
+            self.drop_event(event_type)
+            return NotificationResult.HANDLED
+
         LOG.info("=== Event Received ===")
         LOG.info("Event Type: " + str(event_type))
         LOG.info("Payload: " + str(payload))
@@ -29,14 +109,129 @@ class EventEndpoint(object):
         if not get_dynamic_setting(BILLING_ENABLED):
             return NotificationResult.HANDLED
 
+        tasks = [
+            self.dispatch(self.get_event_key(handler, event_type, payload),
+                          self.handle_event, handler, event_type, payload)
+            for handler in handlers
+        ]
+        self.wait_dispatched(tasks)
+        return NotificationResult.HANDLED
+
+    def apply_events(self, handler, events):
+        """
+        Apply events in one transaction, the in progress invoice is locked until they are applied.
+        When the cached invoice is found closed by other process, it is dropped and the events are applied again.
+        :param handler: Handler of the events
+        :param events: List of (event_type, payload)
+        """
         try:
-            for handler in self.event_handler:
-                handler.handle(event_type, payload)
+            with transaction.atomic():
+                for event_type, payload in events:
+                    handler.handle(event_type, payload)
+        except StaleTenantInvoice as e:
+            drop_tenant_invoice(e.tenant_id)
+            with transaction.atomic():
+                for event_type, payload in events:
+                    handler.handle(event_type, payload)
+
+    def handle_event(self, handler, event_type, payload):
+        try:
+            self.apply_events(handler, [(event_type, payload)])
+        except BillingDisabled:
+            LOG.info("Billing is disabled, dropping event " + str(event_type))
         except Exception:
-            send_notification(
-                project=None,
-                title=f'{settings.EMAIL_TAG} [Error] Error when handling OpenStack Notification',
-                short_description=f'There is an error when handling OpenStack Notification',
-                content=f'There is an error when handling OpenStack Notification \n {traceback.format_exc()}',
-            )
+            self.notify_error()
+
+    def notify_error(self):
+        send_notification(
+            project=None,
+            title=f'{settings.EMAIL_TAG} [Error] Error when handling OpenStack Notification',
+            short_description=f'There is an error when handling OpenStack Notification',
+            content=f'There is an error when handling OpenStack Notification \n {traceback.format_exc()}',
+        )
+
+
+class BatchEventEndpoint(EventEndpoint):
+    """
+    Endpoint for batch notification listener.
+    Events are grouped by tenant and resource, superseded update is skipped,
+    and every group is applied in one transaction.
+    """
+
+    def group_events(self, messages):
+        """
+        Group events of the same resource, keeping the order of the events
+        :param messages: Messages from batch notification listener
+        :return: Dict of (handler, event key) and list of (event_type, payload)
+        """
+        groups = {}
+        for message in messages:
+            event_type = message['event_type']
+            payload = message['payload']
+            for handler in self.get_handlers(event_type):
+                event_key = self.get_event_key(handler, event_type, payload)
+                groups.setdefault((handler, event_key), []).append((event_type, payload))
+
+        return groups
+
+    def collapse_events(self, handler, events):
+        """
+        Skip event that is superseded by the next event of the same resource
+        :param handler: Event handler of the events
+        :param events: List of (event_type, payload) of the same resource
+        :return: Collapsed list of (event_type, payload)
+        """
+        collapsed = []
+        for index, (event_type, payload) in enumerate(events):
+            if index + 1 < len(events):
+                next_event_type, next_payload = events[index + 1]
+                if handler.is_superseded(event_type, payload, next_event_type, next_payload):
+                    continue
+
+            collapsed.append((event_type, payload))
+
+        return collapsed
+
+    def info(self, messages):
+        handled_messages = []
+        for message in messages:
+            if self.get_handlers(message['event_type']):
+                handled_messages.append(message)
+            else:
+                self.drop_event(message['event_type'])
+
+        if not handled_messages:
+            return NotificationResult.HANDLED
+
+        LOG.info(f"=== {len(handled_messages)} Event Received ===")
+        for message in handled_messages:
+            LOG.debug("Event Type: " + str(message['event_type']))
+            LOG.debug("Payload: " + str(message['payload']))
+
+        if not get_dynamic_setting(BILLING_ENABLED):
+            return NotificationResult.HANDLED
+
+        tasks = [
+            self.dispatch(event_key, self.handle_events, handler, event_key, self.collapse_events(handler, events))
+            for (handler, event_key), events in self.group_events(handled_messages).items()
+        ]
+        self.wait_dispatched(tasks)
         return NotificationResult.HANDLED
+
+    def handle_events(self, handler, event_key, events):
+        """
+        Apply events of the same resource in one transaction
+        :param handler: Handler of the events
+        :param event_key: Key of the resource
+        :param events: List of (event_type, payload)
+        """
+        try:
+            self.apply_events(handler, events)
+        except BillingDisabled:
+            LOG.info(f"Billing is disabled, dropping events of {event_key}")
+        except Exception:
+            LOG.exception(f"Error handling events of {event_key}, retrying one by one")
+
+            # Apply the events separately, so one broken event will not discard the others
+            for event_type, payload in events:
+                self.handle_event(handler, event_type, payload)
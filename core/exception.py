@@ -1,3 +1,12 @@
 class PriceNotFound(Exception):
     def __init__(self, identifier=None):
         self.identifier = identifier
+
+
+class BillingDisabled(Exception):
+    pass
+
+
+class StaleTenantInvoice(Exception):
+    def __init__(self, tenant_id=None):
+        self.tenant_id = tenant_id
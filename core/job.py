@@ -0,0 +1,177 @@
+import logging
+import traceback
+from datetime import timedelta
+
+from django.db import transaction
+from django.db.models import F, Q
+from django.utils import timezone
+
+from core.component import component, labels
+from core.component.component import INVOICE_COMPONENT_MODEL
+from core.models import Job, Invoice, BillingProject, BillingRunProject, Balance, BalanceTransaction, Notification
+from core.utils.dynamic_setting import get_dynamic_setting, INVOICE_TAX
+from core.utils.purge import Purger, PurgeTable
+from core.utils.tenant_invoice import invalidate_tenant_invoice
+
+LOG = logging.getLogger("yuyu")
+
+# Running job is picked again by other worker when its progress is not updated within this time
+JOB_LEASE = timedelta(minutes=10)
+
+
+def enqueue_job(job_type):
+    """
+    Queue a job for job worker, pending job of the same type is reused so the action is never run twice
+    :param job_type: Job.JobType
+    :return: The queued job
+    """
+    with transaction.atomic():
+        job = Job.objects.select_for_update().filter(type=job_type, state=Job.JobState.QUEUED).first()
+        if job is None:
+            job = Job.objects.create(type=job_type)
+
+    return job
+
+
+def has_pending_job():
+    return Job.objects.filter(state__in=[Job.JobState.QUEUED, Job.JobState.RUNNING]).exists()
+
+
+def claim_job():
+    """
+    Claim the oldest queued job, or running job whose worker is gone
+    :return: The claimed job, None if there is nothing to do
+    """
+    now = timezone.now()
+    job = Job.objects.filter(
+        Q(state=Job.JobState.QUEUED) | Q(state=Job.JobState.RUNNING, lease_until__lt=now)
+    ).order_by('id').first()
+    if job is None:
+        return None
+
+    # Only one worker can win the claim, the lease is compared like a version
+    claimed = Job.objects.filter(id=job.id, state=job.state, lease_until=job.lease_until).update(
+        state=Job.JobState.RUNNING,
+        start_date=job.start_date or now,
+        lease_until=now + JOB_LEASE,
+        updated_at=now,
+    )
+    if not claimed:
+        return None
+
+    job.refresh_from_db()
+    return job
+
+
+def set_job_total(job, total):
+    job.total = total
+    Job.objects.filter(id=job.id).update(total=total, lease_until=timezone.now() + JOB_LEASE,
+                                         updated_at=timezone.now())
+
+
+def advance_job(job, count=1):
+    """
+    Add progress of the job and extend its lease
+    """
+    job.progress += count
+    Job.objects.filter(id=job.id).update(progress=F('progress') + count, lease_until=timezone.now() + JOB_LEASE,
+                                         updated_at=timezone.now())
+
+
+def run_job(job):
+    """
+    Run the claimed job and record its final state
+    """
+    LOG.info(f"Running job #{job.id} {job.type}")
+    try:
+        JOB_HANDLER[job.type](job)
+    except Exception:
+        LOG.exception(f"Job #{job.id} {job.type} failed")
+        Job.objects.filter(id=job.id).update(state=Job.JobState.FAILED, error=traceback.format_exc(),
+                                             finish_date=timezone.now(), lease_until=None, updated_at=timezone.now())
+        return
+
+    Job.objects.filter(id=job.id).update(state=Job.JobState.FINISHED, finish_date=timezone.now(), lease_until=None,
+                                         updated_at=timezone.now())
+    LOG.info(f"Job #{job.id} {job.type} finished")
+
+
+def run_queued_jobs():
+    """
+    Run every claimable job
+    :return: Number of job run
+    """
+    count = 0
+    while True:
+        job = claim_job()
+        if job is None:
+            return count
+
+        run_job(job)
+        count += 1
+
+
+def close_active_invoice(invoice_id, close_date, tax_percentage):
+    with transaction.atomic():
+        active_invoice = Invoice.objects.select_for_update().get(id=invoice_id)
+        if active_invoice.state != Invoice.InvoiceState.IN_PROGRESS:
+            return
+
+        # Close Invoice Component
+        for label in labels.INVOICE_COMPONENT_LABELS:
+            component.INVOICE_HANDLER[label].bulk_close(active_invoice, close_date)
+
+        # Finish current invoice
+        active_invoice.close(close_date, tax_percentage)
+
+
+def disable_billing(job):
+    """
+    Close every in progress invoice, the invoice is closed on the time the job is queued.
+    Every invoice is closed in its own transaction, so resumed job continue from the remaining invoice.
+    """
+    tax_percentage = get_dynamic_setting(INVOICE_TAX)
+    invoice_ids = list(
+        Invoice.objects.filter(state=Invoice.InvoiceState.IN_PROGRESS).order_by('id').values_list('id', flat=True)
+    )
+    set_job_total(job, job.progress + len(invoice_ids))
+
+    for invoice_id in invoice_ids:
+        close_active_invoice(invoice_id, job.created_at, tax_percentage)
+        advance_job(job)
+
+    invalidate_tenant_invoice()
+
+
+def get_billing_purge_tables():
+    """
+    Tables deleted by reset billing, the same rows that deleting every project and price cascade to
+    """
+    return [
+        *[PurgeTable(model) for model in INVOICE_COMPONENT_MODEL.values()],
+        PurgeTable(BalanceTransaction, not_null_field='balance'),
+        PurgeTable(Balance),
+        PurgeTable(Notification, not_null_field='project'),
+        PurgeTable(BillingRunProject),
+        PurgeTable(Invoice),
+        PurgeTable(BillingProject),
+        *[PurgeTable(model) for model in component.PRICE_MODEL.values()],
+    ]
+
+
+def reset_billing(job):
+    """
+    Delete every project, invoice and price.
+    Progress is the number of deleted row, resumed job count the remaining row again.
+    """
+    purger = Purger(get_billing_purge_tables(), on_progress=lambda deleted: advance_job(job, deleted))
+    set_job_total(job, job.progress + purger.count())
+    purger.run()
+
+    invalidate_tenant_invoice()
+
+
+JOB_HANDLER = {
+    Job.JobType.DISABLE_BILLING: disable_billing,
+    Job.JobType.RESET_BILLING: reset_billing,
+}
@@ -0,0 +1,239 @@
+import logging
+import math
+import random
+import re
+import statistics
+import time
+
+from django.core.management import BaseCommand, CommandError
+from django.db import connection
+from django.test import Client
+from django.test.utils import setup_test_environment, teardown_test_environment
+from django.utils import timezone
+from djmoney.money import Money
+
+from api.urls import router
+from core.component import labels
+from core.models import Notification, BalanceTransaction, Balance
+from core.utils.benchmark import QueryCounter, throwaway_transaction, write_result, prepare_prices, seed_cloud
+from yuyu import settings
+
+"""
+Named group inside url path of extra action, filled from the sample
+"""
+URL_PATH_ARGUMENT = re.compile(r'\(\?P<(\w+)>[^)]*\)')
+
+"""
+GET action that change data, benchmarking them would change the dataset between repeat
+"""
+SKIPPED_ACTIONS = ['finish', 'rollback_to_unpaid', 'resend', 'set_read', 'set_unread']
+
+
+def get_routes(sample):
+    """
+    Build every GET route of the api router and the metrics page
+    :param sample: Dict of router prefix and primary key used for detail route, and argument of url path
+    :return: Dict of route name and url
+    """
+    query = f"?tenant_id={sample['tenant_id']}"
+    routes = {}
+    for prefix, viewset, basename in router.registry:
+        pk = sample.get(prefix)
+        if hasattr(viewset, 'list'):
+            routes[f"{basename}-list"] = f"/api/{prefix}/{query}"
+        if hasattr(viewset, 'retrieve') and pk is not None:
+            routes[f"{basename}-detail"] = f"/api/{prefix}/{pk}/{query}"
+
+        for extra_action in viewset.get_extra_actions():
+            if 'get' not in extra_action.mapping or extra_action.__name__ in SKIPPED_ACTIONS:
+                continue
+
+            url_path = URL_PATH_ARGUMENT.sub(lambda match: str(sample[match.group(1)]), extra_action.url_path)
+            if extra_action.detail:
+                if pk is None:
+                    continue
+                routes[f"{basename}-{extra_action.url_name}"] = f"/api/{prefix}/{pk}/{url_path}/{query}"
+            else:
+                routes[f"{basename}-{extra_action.url_name}"] = f"/api/{prefix}/{url_path}/{query}"
+
+    routes["metrics"] = "/metrics"
+    return routes
+
+
+def seed_api_data(invoices):
+    """
+    Seed notification and balance transaction of every project, so the list routes grow with the dataset
+    :param invoices: In progress invoice from seed_cloud()
+    """
+    notifications = []
+    transactions = []
+    for invoice in invoices:
+        notifications.append(Notification(
+            project_id=invoice.project_id, title='Bench notification', short_description='Bench notification',
+            content='Bench notification', sent_status=True, is_read=random.random() < 0.5,
+        ))
+        balance = Balance.objects.filter(project_id=invoice.project_id).first()
+        for action in [BalanceTransaction.ActionType.TOP_UP, BalanceTransaction.ActionType.TOP_DOWN]:
+            transactions.append(BalanceTransaction(
+                balance=balance, amount=Money(amount=random.randint(1, 1000), currency=settings.DEFAULT_CURRENCY),
+                action=action, description='Bench transaction',
+            ))
+
+    Notification.objects.bulk_create(notifications, batch_size=1000)
+    BalanceTransaction.objects.bulk_create(transactions, batch_size=1000)
+
+
+def read_content(response):
+    """
+    Read the whole body, streamed response is only produced while it is read
+    """
+    if response.streaming:
+        return b''.join(response.streaming_content)
+
+    return response.content
+
+
+def get_growth(previous, current, previous_size, current_size):
+    """
+    Growth exponent of a value between two dataset size, 1 is linear growth
+    :return: The exponent, None if it can not be computed
+    """
+    if previous <= 0 or current <= 0 or previous_size == current_size:
+        return None
+
+    return round(math.log(current / previous) / math.log(current_size / previous_size), 2)
+
+
+class Command(BaseCommand):
+    help = 'Benchmark latency, query count and response size of every API route on several dataset size'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--sizes', default='10,50,100', help='Comma separated number of project of every dataset')
+        parser.add_argument('--resources', type=int, default=20, help='Number of component for every project')
+        parser.add_argument('--repeat', type=int, default=5, help='Number of request for every route')
+        parser.add_argument('--threshold', type=float, default=1.2,
+                            help='Growth exponent flagged as superlinear, 1 is linear growth')
+        parser.add_argument('--min-ms', type=float, default=1,
+                            help='Latency below this is too noisy to be flagged')
+        parser.add_argument('--seed', type=int, default=0, help='Random seed of the generated dataset')
+        parser.add_argument('--output', help='Write JSON result to this file')
+
+    def handle(self, *args, **options):
+        sizes = sorted({int(size) for size in options['sizes'].split(',')})
+        if not sizes or sizes[0] <= 0:
+            raise CommandError("Sizes must be positive number")
+
+        random.seed(options['seed'])
+        start_date = timezone.now().replace(day=1, hour=0, minute=0, second=0, microsecond=0)
+
+        # Allow the test server host and keep the exception inside the response, the status is reported instead
+        setup_test_environment()
+        client = Client(raise_request_exception=False)
+        request_log = logging.getLogger('django.request')
+        request_log_level = request_log.level
+        request_log.setLevel(logging.CRITICAL)
+        results = {}
+        try:
+            for size in sizes:
+                with throwaway_transaction():
+                    prepare_prices()
+                    invoices = seed_cloud(size, options['resources'], start_date, timezone.now())
+                    seed_api_data(invoices)
+
+                    invoice = invoices[0]
+                    sample = {
+                        "tenant_id": invoice.project.tenant_id,
+                        "invoice": invoice.id,
+                        "project_overview": invoice.project.tenant_id,
+                        "balance": invoice.project.tenant_id,
+                        "notification": Notification.objects.filter(project_id=invoice.project_id).first().id,
+                        "settings": "billing_enabled",
+                        "label": labels.LABEL_INSTANCES,
+                    }
+                    results[size] = self.run_routes(client, get_routes(sample), options['repeat'])
+        finally:
+            request_log.setLevel(request_log_level)
+            teardown_test_environment()
+
+        flagged = self.find_superlinear(sizes, results, options['threshold'], options['min_ms'])
+        self.print_result(sizes, results, flagged)
+
+        if options['output']:
+            write_result({
+                "vendor": connection.vendor,
+                "resources": options['resources'],
+                "repeat": options['repeat'],
+                "sizes": {str(size): results[size] for size in sizes},
+                "superlinear": flagged,
+            }, options['output'])
+
+    def run_routes(self, client, routes, repeat):
+        """
+        Request every route, the first request is a warm up that count the queries
+        :return: Dict of route name and its measurement
+        """
+        result = {}
+        for name, url in routes.items():
+            query_counter = QueryCounter()
+            with query_counter.count_queries():
+                response = client.get(url)
+                content = read_content(response)
+
+            latencies = []
+            for _ in range(repeat):
+                request_start = time.perf_counter()
+                read_content(client.get(url))
+                latencies.append(time.perf_counter() - request_start)
+
+            result[name] = {
+                "url": url,
+                "status": response.status_code,
+                "ms": round(statistics.median(latencies) * 1000, 3) if latencies else 0,
+                "queries": query_counter.count,
+                "bytes": len(content),
+            }
+
+        return result
+
+    def find_superlinear(self, sizes, results, threshold, min_ms):
+        """
+        Find route whose latency or query count grow faster than the dataset between consecutive sizes
+        :return: List of flagged growth
+        """
+        flagged = []
+        for previous_size, current_size in zip(sizes, sizes[1:]):
+            for name, current in results[current_size].items():
+                previous = results[previous_size].get(name)
+                if previous is None:
+                    continue
+
+                for metric in ['ms', 'queries']:
+                    if metric == 'ms' and previous['ms'] < min_ms:
+                        continue
+
+                    growth = get_growth(previous[metric], current[metric], previous_size, current_size)
+                    if growth is not None and growth > threshold:
+                        flagged.append({
+                            "route": name, "metric": metric, "from_size": previous_size, "to_size": current_size,
+                            "from": previous[metric], "to": current[metric], "growth": growth,
+                        })
+
+        return flagged
+
+    def print_result(self, sizes, results, flagged):
+        self.stdout.write(f"{'route':<45}" + ''.join(f"{f'{size} ms/q/KB':>24}" for size in sizes))
+        for name in results[sizes[0]]:
+            line = f"{name:<45}"
+            for size in sizes:
+                route = results[size][name]
+                cell = f"{route['ms']:.1f}/{route['queries']}/{route['bytes'] / 1024:.1f}"
+                if route['status'] >= 400:
+                    cell = f"[{route['status']}] " + cell
+                line += f"{cell:>24}"
+            self.stdout.write(line)
+
+        for growth in flagged:
+            self.stdout.write(self.style.WARNING(
+                f"SUPERLINEAR {growth['route']} {growth['metric']}: {growth['from']} -> {growth['to']} "
+                f"from {growth['from_size']} to {growth['to_size']} projects (exponent {growth['growth']})"
+            ))
@@ -0,0 +1,232 @@
+import random
+import time
+
+from django.core.management import BaseCommand
+from django.db import connection
+
+from core.event_endpoint import EventEndpoint, BatchEventEndpoint
+from core.utils.benchmark import QueryCounter, throwaway_transaction, summarize_latency, write_result, \
+    prepare_prices, new_id, BENCH_FLAVORS, BENCH_VOLUME_TYPE
+from core.utils.dynamic_setting import set_dynamic_setting, BILLING_ENABLED, DYNAMIC_SETTING_CACHE
+from core.utils.price_catalog import PRICE_CATALOG_CACHE
+from core.utils.tenant_invoice import TENANT_INVOICE_CACHE
+
+
+def instance_event(tenant_id, instance_id, flavor_id, state):
+    return 'compute.instance.update', {
+        "tenant_id": tenant_id,
+        "user_id": new_id(),
+        "instance_id": instance_id,
+        "instance_flavor_id": flavor_id,
+        "display_name": f"vm-{instance_id[:8]}",
+        "state": state,
+        "old_state": state,
+        "host": "compute-1",
+    }
+
+
+def volume_event(event_type, tenant_id, volume_id, size):
+    return event_type, {
+        "tenant_id": tenant_id,
+        "volume_id": volume_id,
+        "volume_type": BENCH_VOLUME_TYPE,
+        "display_name": f"volume-{volume_id[:8]}",
+        "size": size,
+        "status": "available",
+    }
+
+
+def floating_ip_event(event_type, tenant_id, fip_id):
+    return event_type, {
+        "floatingip": {
+            "id": fip_id,
+            "tenant_id": tenant_id,
+            "floating_ip_address": f"10.0.{random.randint(0, 255)}.{random.randint(1, 254)}",
+        }
+    }
+
+
+def router_event(event_type, tenant_id, router_id, gateway):
+    return event_type, {
+        "router": {
+            "id": router_id,
+            "tenant_id": tenant_id,
+            "name": f"router-{router_id[:8]}",
+            "external_gateway_info": {"network_id": "public"} if gateway else None,
+        }
+    }
+
+
+def snapshot_event(event_type, tenant_id, snapshot_id):
+    return event_type, {
+        "tenant_id": tenant_id,
+        "snapshot_id": snapshot_id,
+        "volume_size": 10,
+        "display_name": f"snapshot-{snapshot_id[:8]}",
+    }
+
+
+def image_event(event_type, tenant_id, image_id):
+    return event_type, {
+        "id": image_id,
+        "owner": tenant_id,
+        "name": f"image-{image_id[:8]}",
+        "size": 2 * 1024 * 1024 * 1024,
+    }
+
+
+def generate_resource_streams(tenant_id):
+    """
+    Generate event stream of every resource of a tenant, events inside a stream must be kept in order
+    """
+    streams = [[('identity.project.created', {"target": {"id": tenant_id}})]]
+
+    # Instance boot storm, resize and delete
+    for _ in range(random.randint(5, 20)):
+        instance_id = new_id()
+        flavor_id = random.choice(BENCH_FLAVORS)
+        stream = [instance_event(tenant_id, instance_id, flavor_id, 'building') for _ in range(random.randint(3, 8))]
+        stream += [instance_event(tenant_id, instance_id, flavor_id, 'active') for _ in range(2)]
+        if random.random() < 0.3:
+            stream.append(instance_event(tenant_id, instance_id, random.choice(BENCH_FLAVORS), 'active'))
+        if random.random() < 0.3:
+            stream.append(instance_event(tenant_id, instance_id, flavor_id, 'deleted'))
+        stream.append(('compute.instance.exists', {"tenant_id": tenant_id, "instance_id": instance_id}))
+        streams.append(stream)
+
+    # Volume create, resize and delete
+    for _ in range(random.randint(1, 5)):
+        volume_id = new_id()
+        size = random.choice([10, 20, 50])
+        stream = [volume_event('volume.create.end', tenant_id, volume_id, size)]
+        for _ in range(random.randint(0, 2)):
+            size += 10
+            stream.append(volume_event('volume.resize.end', tenant_id, volume_id, size))
+        if random.random() < 0.3:
+            stream.append(volume_event('volume.delete.end', tenant_id, volume_id, size))
+        streams.append(stream)
+
+    # Floating ip create and delete
+    for _ in range(random.randint(1, 3)):
+        fip_id = new_id()
+        stream = [floating_ip_event('floatingip.create.end', tenant_id, fip_id)]
+        stream.append(('port.update.end', {"port": {"id": new_id(), "tenant_id": tenant_id}}))
+        if random.random() < 0.5:
+            stream.append(floating_ip_event('floatingip.delete.end', tenant_id, fip_id))
+        streams.append(stream)
+
+    # Router gateway toggle
+    router_id = new_id()
+    stream = [router_event('router.create.end', tenant_id, router_id, True)]
+    for index in range(random.randint(1, 4)):
+        stream.append(router_event('router.update.end', tenant_id, router_id, index % 2 == 1))
+    streams.append(stream)
+
+    # Snapshot and image
+    snapshot_id = new_id()
+    streams.append([snapshot_event('snapshot.create.end', tenant_id, snapshot_id),
+                    snapshot_event('snapshot.delete.end', tenant_id, snapshot_id)])
+    image_id = new_id()
+    streams.append([image_event('image.activate', tenant_id, image_id),
+                    image_event('image.update', tenant_id, image_id)])
+
+    return streams
+
+
+def generate_events(tenants):
+    """
+    Generate realistic event sequence, streams of every resource are interleaved randomly
+    :param tenants: Number of tenant
+    :return: List of (event_type, payload)
+    """
+    streams = []
+    for _ in range(tenants):
+        streams += generate_resource_streams(new_id())
+
+    events = []
+    # Project creation come first, like in OpenStack
+    events += [stream.pop(0) for stream in streams if stream[0][0] == 'identity.project.created']
+    streams = [stream for stream in streams if stream]
+    while streams:
+        stream = random.choice(streams)
+        events.append(stream.pop(0))
+        if not stream:
+            streams.remove(stream)
+
+    return events
+
+
+class Command(BaseCommand):
+    help = 'Benchmark event handling throughput with synthetic OpenStack notification'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--tenants', type=int, default=20, help='Number of synthetic tenant')
+        parser.add_argument('--batch-size', type=int, default=0,
+                            help='Feed events in batch to BatchEventEndpoint, 0 to feed one by one to EventEndpoint')
+        parser.add_argument('--seed', type=int, default=0, help='Random seed of the generated events')
+        parser.add_argument('--keep', action='store_true',
+                            help='Commit generated data instead of rolling back, only use it on throwaway database')
+        parser.add_argument('--output', help='Write JSON result to this file')
+
+    def handle(self, *args, **options):
+        random.seed(options['seed'])
+        events = generate_events(options['tenants'])
+        batch_size = options['batch_size']
+
+        latencies = []
+        query_counter = QueryCounter()
+        with throwaway_transaction(keep=options['keep']):
+            prepare_prices()
+            set_dynamic_setting(BILLING_ENABLED, True)
+            # Cache invalidation only happen on commit
+            DYNAMIC_SETTING_CACHE.clear()
+            PRICE_CATALOG_CACHE.clear()
+            TENANT_INVOICE_CACHE.clear()
+            # The throwaway transaction is never committed, so the invoice is cached right away like in production
+            TENANT_INVOICE_CACHE.store_on_commit = False
+
+            if batch_size:
+                endpoint = BatchEventEndpoint()
+                calls = [
+                    [
+                        {"ctxt": {}, "publisher_id": "bench", "event_type": event_type, "payload": payload,
+                         "metadata": {}}
+                        for event_type, payload in events[index:index + batch_size]
+                    ]
+                    for index in range(0, len(events), batch_size)
+                ]
+            else:
+                endpoint = EventEndpoint()
+                calls = [({}, "bench", event_type, payload, {}) for event_type, payload in events]
+
+            with query_counter.count_queries():
+                bench_start = time.perf_counter()
+                for call in calls:
+                    call_start = time.perf_counter()
+                    if batch_size:
+                        endpoint.info(call)
+                    else:
+                        endpoint.info(*call)
+                    latencies.append(time.perf_counter() - call_start)
+                elapsed = time.perf_counter() - bench_start
+
+        result = {
+            "vendor": connection.vendor,
+            "tenants": options['tenants'],
+            "events": len(events),
+            "batch_size": batch_size,
+            "elapsed_s": round(elapsed, 3),
+            "events_per_s": round(len(events) / elapsed, 1),
+            "queries": query_counter.count,
+            "queries_per_event": round(query_counter.count / len(events), 2),
+            # Latency of every info() call, a whole batch when batch size is set
+            "latency": summarize_latency(latencies),
+        }
+
+        self.stdout.write(
+            f"{result['events']} events in {result['elapsed_s']}s, {result['events_per_s']} events/s, "
+            f"p50 {result['latency']['p50_ms']}ms, p99 {result['latency']['p99_ms']}ms, "
+            f"{result['queries_per_event']} queries/event"
+        )
+        if options['output']:
+            write_result(result, options['output'])
@@ -0,0 +1,109 @@
+import random
+import time
+from datetime import timedelta
+
+from django.core.management import BaseCommand
+from django.db import connection
+from django.utils import timezone
+
+import core.management.commands.process_invoice as process_invoice
+from core.component import component
+from core.models import Invoice, Balance, BillingRun
+from core.utils.benchmark import QueryCounter, PhaseTimer, throwaway_transaction, summarize_latency, write_result, \
+    prepare_prices, seed_cloud
+from core.utils.dynamic_setting import get_dynamic_setting, INVOICE_TAX, DYNAMIC_SETTING_CACHE
+from core.utils.price_catalog import PRICE_CATALOG_CACHE
+
+
+class Command(BaseCommand):
+    help = 'Benchmark month end invoice closing with synthetic cloud'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--projects', type=int, default=100, help='Number of synthetic project')
+        parser.add_argument('--resources', type=int, default=20, help='Number of component for every project')
+        parser.add_argument('--seed', type=int, default=0, help='Random seed of the synthetic cloud')
+        parser.add_argument('--keep', action='store_true',
+                            help='Commit generated data instead of rolling back, only use it on throwaway database')
+        parser.add_argument('--output', help='Write JSON result to this file')
+
+    def get_phase_targets(self):
+        """
+        Functions that is measured as a phase of closing invoice
+        """
+        targets = []
+        for handler in component.INVOICE_HANDLER.values():
+            targets += [
+                ("component_close", handler, "bulk_close"),
+                ("roll", handler, "bulk_roll"),
+            ]
+
+        targets += [
+            ("invoice_close", Invoice, "close"),
+            ("balance_deduction", Balance, "bulk_top_down_if_amount_is_good"),
+            ("balance_deduction", Invoice, "bulk_finish"),
+            ("notification", process_invoice, "send_notification_from_template"),
+        ]
+        return targets
+
+    def handle(self, *args, **options):
+        random.seed(options['seed'])
+
+        # Closed like the cron, at 00:01 on the first day of the month
+        close_date = timezone.now().replace(day=1, hour=0, minute=1, second=0, microsecond=0)
+        start_date = (close_date - timedelta(days=1)).replace(day=1, minute=0)
+
+        latencies = []
+        query_counter = QueryCounter()
+        phase_timer = PhaseTimer(query_counter)
+        with throwaway_transaction(keep=options['keep']):
+            prepare_prices()
+            DYNAMIC_SETTING_CACHE.clear()
+            PRICE_CATALOG_CACHE.clear()
+
+            seed_start = time.perf_counter()
+            invoices = seed_cloud(options['projects'], options['resources'], start_date, close_date)
+            seed_elapsed = time.perf_counter() - seed_start
+
+            command = process_invoice.Command()
+            # Period is not at midnight, so it never collide with the real billing run
+            command.billing_run = BillingRun.objects.create(period=close_date, close_date=close_date,
+                                                            tax_percentage=get_dynamic_setting(INVOICE_TAX),
+                                                            state=BillingRun.RunState.RUNNING)
+            command.close_date = close_date
+            command.tax_pertentage = command.billing_run.tax_percentage
+
+            with query_counter.count_queries(), phase_timer.instrument(self.get_phase_targets()):
+                bench_start = time.perf_counter()
+                for invoice in invoices:
+                    invoice_start = time.perf_counter()
+                    command.close_active_invoice(invoice)
+                    latencies.append(time.perf_counter() - invoice_start)
+                command.settle_closed_invoices()
+                elapsed = time.perf_counter() - bench_start
+
+        result = {
+            "benchmark": "process_invoice",
+            "date": timezone.now().isoformat(),
+            "vendor": connection.vendor,
+            "projects": options['projects'],
+            "resources_per_project": options['resources'],
+            "seed_s": round(seed_elapsed, 3),
+            "elapsed_s": round(elapsed, 3),
+            "projects_per_s": round(len(invoices) / elapsed, 1),
+            "queries": query_counter.count,
+            "queries_per_project": round(query_counter.count / len(invoices), 2),
+            # Latency of close_active_invoice for every project
+            "latency": summarize_latency(latencies),
+            "phases": phase_timer.summary(elapsed),
+        }
+
+        self.stdout.write(
+            f"{result['projects']} projects closed in {result['elapsed_s']}s, "
+            f"{result['projects_per_s']} projects/s, p50 {result['latency']['p50_ms']}ms, "
+            f"p99 {result['latency']['p99_ms']}ms, {result['queries_per_project']} queries/project"
+        )
+        for name, phase in result['phases'].items():
+            self.stdout.write(f"  {name}: {phase['seconds']}s ({phase['share']:.0%}), {phase['queries']} queries")
+
+        if options['output']:
+            write_result(result, options['output'])
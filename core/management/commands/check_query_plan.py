@@ -0,0 +1,73 @@
+import logging
+import re
+
+from django.core.management import BaseCommand, CommandError
+from django.db import connection, transaction
+from django.utils import timezone
+
+from core.component import component
+from core.models import Invoice
+
+LOG = logging.getLogger("yuyu")
+
+"""
+Pattern of full table scan in query plan, the captured group is the table name
+"""
+TABLE_SCAN_PATTERN = {
+    'sqlite': re.compile(r'\bSCAN (?:TABLE )?(\w+)'),
+    'postgresql': re.compile(r'\bSeq Scan on (\w+)'),
+}
+
+
+def get_hot_queries():
+    """
+    Queries that run for every event, scrape or invoice and must be served by index
+    :return: Dict of query name and queryset
+    """
+    in_progress = Invoice.InvoiceState.IN_PROGRESS
+    queries = {
+        "tenant in progress invoice": Invoice.objects.filter(project__tenant_id='tenant', state=in_progress),
+        "invoice to close": Invoice.objects.filter(state=in_progress, start_date__lt=timezone.now()),
+    }
+
+    for label, handler in component.INVOICE_HANDLER.items():
+        model = handler.INVOICE_CLASS
+        queries[f"{label} active instance"] = model.objects.filter(
+            invoice_id=0, end_date=None, **{handler.KEY_FIELD: 'key'}
+        )
+        queries[f"{label} active of invoice"] = model.objects.filter(invoice_id=0, end_date=None)
+        queries[f"{label} of in progress invoice"] = model.objects.filter(invoice__state=in_progress)
+        queries[f"{label} active of project"] = model.objects.filter(
+            invoice__project_id=0, invoice__state=in_progress, end_date=None
+        )
+
+    return queries
+
+
+class Command(BaseCommand):
+    help = 'Check that hot queries use index instead of full table scan'
+
+    def handle(self, *args, **options):
+        pattern = TABLE_SCAN_PATTERN.get(connection.vendor)
+        if pattern is None:
+            raise CommandError(f"Query plan check is not supported for {connection.vendor}")
+
+        failed = []
+        with transaction.atomic():
+            if connection.vendor == 'postgresql':
+                # Small table is always scanned by planner, only use scan when there is no usable index
+                with connection.cursor() as cursor:
+                    cursor.execute('SET LOCAL enable_seqscan = off')
+
+            for name, queryset in get_hot_queries().items():
+                plan = queryset.explain()
+                scanned_tables = pattern.findall(plan)
+                if scanned_tables:
+                    failed.append(name)
+                    self.stdout.write(self.style.ERROR(f"FAIL {name}: scan on {', '.join(scanned_tables)}"))
+                    self.stdout.write(plan)
+                else:
+                    self.stdout.write(f"OK   {name}")
+
+        if failed:
+            raise CommandError(f"{len(failed)} queries use full table scan")
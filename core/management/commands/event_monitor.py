@@ -6,11 +6,13 @@ import time
 
 from oslo_config import cfg
 import oslo_messaging as messaging
+import prometheus_client
 from oslo_messaging import notify  # noqa
 
-from django.core.management.base import BaseCommand
+from django.core.management.base import BaseCommand, CommandError
 
-from core.event_endpoint import EventEndpoint
+from core.event_dispatcher import KeyedEventDispatcher
+from core.event_endpoint import EventEndpoint, BatchEventEndpoint
 
 LOG = logging.getLogger("yuyu")
 
@@ -42,17 +44,47 @@ class Command(BaseCommand):
             transport.cleanup()
 
     def notify_server(self, transport, topics):
-        endpoints = [EventEndpoint()]
         targets = list(map(lambda t: messaging.Target(topic=t, fanout=True), topics))
-        server = notify.get_notification_listener(
-            transport,
-            targets,
-            endpoints,
-            executor='threading'
-        )
+
+        dispatcher = None
+        if settings.YUYU_EVENT_WORKERS:
+            LOG.info(f'Handling event with {settings.YUYU_EVENT_WORKERS} workers')
+            dispatcher = KeyedEventDispatcher(settings.YUYU_EVENT_WORKERS, settings.YUYU_EVENT_QUEUE_SIZE)
+            dispatcher.start()
+
+        if settings.YUYU_EVENT_BATCH_SIZE:
+            LOG.info(f'Handling event in batch of {settings.YUYU_EVENT_BATCH_SIZE}')
+            server = notify.get_batch_notification_listener(
+                transport,
+                targets,
+                [BatchEventEndpoint(dispatcher)],
+                executor='threading',
+                batch_size=settings.YUYU_EVENT_BATCH_SIZE,
+                batch_timeout=settings.YUYU_EVENT_BATCH_TIMEOUT,
+            )
+        else:
+            server = notify.get_notification_listener(
+                transport,
+                targets,
+                [EventEndpoint(dispatcher)],
+                executor='threading'
+            )
+
+        if dispatcher:
+            # Message is queued to the workers in the order it is received
+            cfg.CONF.set_override('executor_thread_pool_size', 1)
+
         self.run_server(transport, server)
 
+        if dispatcher:
+            LOG.info('Stopping event workers')
+            dispatcher.stop()
+
     def handle(self, *args, **options):
+        if settings.YUYU_EVENT_WORKERS and not settings.YUYU_EVENT_BATCH_SIZE:
+            # Notification is acknowledged after it is handled, so only events of a batch can be handled in parallel
+            raise CommandError("YUYU_EVENT_WORKERS require YUYU_EVENT_BATCH_SIZE to be set")
+
         url = settings.YUYU_NOTIFICATION_URL
 
         # oslo.config defaults
@@ -63,6 +95,10 @@ class Command(BaseCommand):
         transport = messaging.get_notification_transport(cfg.CONF,
                                                          url=url)
 
+        if settings.YUYU_EVENT_MONITOR_METRICS_PORT:
+            # Expose event monitor metric, e.g. dropped_event_total
+            prometheus_client.start_http_server(settings.YUYU_EVENT_MONITOR_METRICS_PORT)
+
         signal.signal(signal.SIGTERM, self.signal_handler)
         signal.signal(signal.SIGINT, self.signal_handler)
 
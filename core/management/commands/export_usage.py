@@ -0,0 +1,32 @@
+import sys
+
+from django.core.management import BaseCommand, CommandError
+
+from core.usage_export import iter_usage, iter_export, get_date_range, EXPORT_CSV, EXPORT_FORMATS
+
+
+class Command(BaseCommand):
+    help = 'Export every invoice component used within a date range as CSV or NDJSON'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--start',
+                            help='Start of the date range in ISO 8601, default to the first day of current month')
+        parser.add_argument('--end', help='End of the date range in ISO 8601, exclusive, default to current time')
+        parser.add_argument('--tenant-id', help='Only export component of this tenant')
+        parser.add_argument('--format', choices=EXPORT_FORMATS, default=EXPORT_CSV, help='Export format')
+        parser.add_argument('--output', help='Write the export to this file instead of stdout')
+
+    def handle(self, *args, **options):
+        try:
+            start, end = get_date_range(options['start'], options['end'])
+        except ValueError as e:
+            raise CommandError(f"Invalid date range: {e}")
+
+        usages = iter_usage(start, end, tenant_id=options['tenant_id'])
+        output = open(options['output'], 'w', newline='') if options['output'] else sys.stdout
+        try:
+            for line in iter_export(usages, options['format']):
+                output.write(line)
+        finally:
+            if options['output']:
+                output.close()
@@ -0,0 +1,23 @@
+import logging
+
+from django.core.management import BaseCommand
+
+from core.models import Invoice
+
+LOG = logging.getLogger("yuyu")
+
+
+class Command(BaseCommand):
+    help = 'Freeze document of closed invoice that does not have one, e.g. invoice closed before updating Yuyu'
+
+    def handle(self, *args, **options):
+        invoices = Invoice.objects.filter(document__isnull=True) \
+            .exclude(state=Invoice.InvoiceState.IN_PROGRESS) \
+            .order_by('id')
+
+        frozen = 0
+        for invoice in invoices.iterator():
+            invoice.freeze()
+            frozen += 1
+
+        LOG.info(f"Document of {frozen} closed invoice is frozen")
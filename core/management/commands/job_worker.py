@@ -0,0 +1,32 @@
+import logging
+import time
+
+from django.core.management import BaseCommand
+
+from core.job import run_queued_jobs
+from yuyu import settings
+
+LOG = logging.getLogger("yuyu")
+
+
+class Command(BaseCommand):
+    help = 'Yuyu Job Worker'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--interval', type=int, default=settings.YUYU_JOB_WORKER_INTERVAL,
+                            help='Seconds between checking queued job')
+        parser.add_argument('--once', action='store_true', help='Run queued job once and exit')
+
+    def handle(self, *args, **options):
+        while True:
+            try:
+                ran = run_queued_jobs()
+                if ran:
+                    LOG.info(f"{ran} queued job handled")
+            except Exception:
+                LOG.exception("Error running queued job")
+
+            if options['once']:
+                return
+
+            time.sleep(options['interval'])
@@ -0,0 +1,40 @@
+import logging
+import time
+
+from django.core.management import BaseCommand
+
+import core.metric as metric
+from yuyu import settings
+
+LOG = logging.getLogger("yuyu")
+
+
+class Command(BaseCommand):
+    help = 'Yuyu Metrics Snapshot Builder'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--interval', type=int, default=settings.YUYU_METRICS_SNAPSHOT_INTERVAL,
+                            help='Seconds between snapshot build')
+        parser.add_argument('--once', action='store_true', help='Build snapshot once and exit')
+
+    def handle(self, *args, **options):
+        path = settings.YUYU_METRICS_SNAPSHOT_FILE
+        if not path:
+            LOG.info("YUYU_METRICS_SNAPSHOT_FILE is not configured")
+            return
+
+        interval = options['interval']
+        while True:
+            build_start = time.monotonic()
+            try:
+                build_duration = metric.build_snapshot(path)
+                LOG.info(f"Metrics snapshot built in {build_duration:.2f}s")
+                if build_duration > interval:
+                    LOG.warning(f"Metrics snapshot build is slower than the interval of {interval}s")
+            except Exception:
+                LOG.exception("Error building metrics snapshot")
+
+            if options['once']:
+                return
+
+            time.sleep(max(0, interval - (time.monotonic() - build_start)))
@@ -0,0 +1,40 @@
+import logging
+import time
+
+from django.core.management import BaseCommand
+
+from core.notification import send_queued_notifications
+from yuyu import settings
+
+LOG = logging.getLogger("yuyu")
+
+
+class Command(BaseCommand):
+    help = 'Yuyu Notification Sender'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--interval', type=int, default=settings.YUYU_NOTIFICATION_SEND_INTERVAL,
+                            help='Seconds between checking queued notification')
+        parser.add_argument('--batch-size', type=int, default=settings.YUYU_NOTIFICATION_SEND_BATCH_SIZE,
+                            help='Maximum notification sent through one email connection')
+        parser.add_argument('--max-attempt', type=int, default=settings.YUYU_NOTIFICATION_SEND_MAX_ATTEMPT,
+                            help='Maximum send attempt of a notification')
+        parser.add_argument('--once', action='store_true', help='Send queued notification once and exit')
+
+    def handle(self, *args, **options):
+        while True:
+            try:
+                # Keep sending while the batch is full, there may be more queued notification
+                while True:
+                    sent = send_queued_notifications(options['batch_size'], options['max_attempt'])
+                    if sent:
+                        LOG.info(f"{sent} queued notification handled")
+                    if sent < options['batch_size']:
+                        break
+            except Exception:
+                LOG.exception("Error sending queued notification")
+
+            if options['once']:
+                return
+
+            time.sleep(options['interval'])
@@ -1,23 +1,58 @@
 import logging
+import multiprocessing
 import traceback
+from concurrent.futures import ProcessPoolExecutor
 from typing import Dict, Iterable
 
 from django.core.management import BaseCommand
+from django.db import connection, connections, transaction
 from django.utils import timezone
 
 from core.component import component, labels
-from core.models import Invoice, InvoiceComponentMixin, Balance
+from core.models import Invoice, InvoiceComponentMixin, Balance, BillingRun, BillingRunProject
 from core.notification import send_notification_from_template, send_notification
 from core.utils.dynamic_setting import get_dynamic_setting, BILLING_ENABLED, INVOICE_TAX, COMPANY_NAME, \
     COMPANY_ADDRESS, INVOICE_AUTO_DEDUCT_BALANCE
+from core.utils.tenant_invoice import invalidate_tenant_invoice
 from yuyu import settings
 
 LOG = logging.getLogger("yuyu")
 
+# Closed invoice deducted and notified at once
+SETTLE_BATCH_SIZE = 500
+
+
+def close_project_invoices(project_ids, billing_run_id, tax_percentage):
+    """
+    Close in progress invoice of the projects, run inside worker process
+    :param project_ids: Billing project id that handled by this worker
+    :param billing_run_id: Id of current billing run
+    :param tax_percentage: Invoice tax percentage
+    """
+    # Connection inherited from parent process must not be shared
+    connections.close_all()
+
+    command = Command()
+    command.billing_run = BillingRun.objects.get(id=billing_run_id)
+    command.close_date = command.billing_run.close_date
+    command.tax_pertentage = tax_percentage
+
+    active_invoices = command.get_active_invoices().filter(project_id__in=project_ids)
+    for active_invoice in active_invoices:
+        command.close_active_invoice(active_invoice)
+
+    connections.close_all()
+
 
 class Command(BaseCommand):
     help = 'Yuyu New Invoice'
 
+    def add_arguments(self, parser):
+        parser.add_argument('--workers', type=int, default=1,
+                            help='Number of worker process, projects are partitioned between the workers')
+        parser.add_argument('--resume', action='store_true',
+                            help='Continue unfinished run, projects that already closed will be skipped')
+
     def handle(self, *args, **options):
         LOG.info("Processing Invoice")
         try:
@@ -25,81 +60,197 @@ class Command(BaseCommand):
                 LOG.info("Billing not activated")
                 return
 
-            self.close_date = timezone.now()
-            self.tax_pertentage = get_dynamic_setting(INVOICE_TAX)
+            if options['resume']:
+                self.billing_run = BillingRun.objects.filter(state=BillingRun.RunState.RUNNING) \
+                    .order_by('-period').first()
+                if not self.billing_run:
+                    LOG.info("No unfinished billing run to resume")
+                    return
+
+                LOG.info(f"Resuming billing run for period {self.billing_run.period}")
+            else:
+                close_date = timezone.now()
+                period = close_date.replace(day=1, hour=0, minute=0, second=0, microsecond=0)
+                self.billing_run, created = BillingRun.objects.get_or_create(period=period, defaults={
+                    "close_date": close_date,
+                    "tax_percentage": get_dynamic_setting(INVOICE_TAX),
+                    "state": BillingRun.RunState.RUNNING,
+                })
+                if not created:
+                    LOG.warning(f"Billing run for period {period} already exists, "
+                                f"use --resume to continue unfinished run")
+                    return
 
-            active_invoices = Invoice.objects.filter(state=Invoice.InvoiceState.IN_PROGRESS).all()
-            for active_invoice in active_invoices:
-                self.close_active_invoice(active_invoice)
+            if self.billing_run.tax_percentage is None:
+                self.billing_run.tax_percentage = get_dynamic_setting(INVOICE_TAX)
+                self.billing_run.save(update_fields=['tax_percentage', 'updated_at'])
+
+            # Resumed run keep using the close date and tax percentage of the first run
+            self.close_date = self.billing_run.close_date
+            self.tax_pertentage = self.billing_run.tax_percentage
+
+            workers = options['workers']
+            if workers > 1 and connection.vendor == 'sqlite':
+                LOG.warning("SQLite does not support concurrent write, processing invoice with single worker")
+                workers = 1
+
+            if workers > 1:
+                self.close_active_invoices_parallel(workers)
+            else:
+                for active_invoice in self.get_active_invoices():
+                    self.close_active_invoice(active_invoice)
+
+            # Event handler check the cached invoice before writing into it, so it is invalidated once after the run
+            invalidate_tenant_invoice()
+
+            self.settle_closed_invoices()
+            self.billing_run.finish()
         except Exception:
             LOG.exception("Error Processing Invoice")
             send_notification(
                 project=None,
                 title='[Error] Error when processing Invoice',
                 short_description=f'There is an error when Processing Invoice',
-                content=f'There is an error when handling Processing Invoice \n {traceback.format_exc()}',
+                content=f'There is an error when handling Processing Invoice \n {traceback.format_exc()} \n'
+                        f'Closed projects are recorded, run process_invoice with --resume to continue.',
             )
         
         LOG.info("Processing Invoice Done")
 
+    def get_active_invoices(self):
+        """
+        In progress invoice that is not closed yet by current billing run
+        """
+        closed_project_ids = self.billing_run.closed_projects.values('project_id')
+        return Invoice.objects.filter(state=Invoice.InvoiceState.IN_PROGRESS, start_date__lt=self.close_date) \
+            .exclude(project_id__in=closed_project_ids)
+
+    def close_active_invoices_parallel(self, workers):
+        project_ids = list(
+            self.get_active_invoices()
+            .order_by('project_id')
+            .values_list('project_id', flat=True)
+            .distinct()
+        )
+        partitions = [project_ids[i::workers] for i in range(workers)]
+
+        # Close connection before fork, every worker open its own connection
+        connections.close_all()
+        with ProcessPoolExecutor(max_workers=workers, mp_context=multiprocessing.get_context('fork')) as executor:
+            futures = [
+                executor.submit(close_project_invoices, partition, self.billing_run.id, self.tax_pertentage)
+                for partition in partitions if partition
+            ]
+
+            # Raise error from the worker
+            for future in futures:
+                future.result()
+
     def close_active_invoice(self, active_invoice: Invoice):
-        active_components_map: Dict[str, Iterable[InvoiceComponentMixin]] = {}
+        # Close and roll of a project is done at once, so the project will never be closed twice
+        with transaction.atomic():
+            active_invoice = Invoice.objects.select_for_update().get(id=active_invoice.id)
+            already_closed = BillingRunProject.objects.filter(billing_run=self.billing_run,
+                                                              project_id=active_invoice.project_id).exists()
+            if active_invoice.state != Invoice.InvoiceState.IN_PROGRESS or already_closed:
+                LOG.info(f"Invoice #{active_invoice.id} already closed, skipping")
+                return
 
-        for label in labels.INVOICE_COMPONENT_LABELS:
-            active_components_map[label] = getattr(active_invoice, label).filter(end_date=None).all()
+            active_components_map: Dict[str, Iterable[InvoiceComponentMixin]] = {}
 
             # Close Invoice Component
-            for active_component in active_components_map[label]:
-                active_component.close(self.close_date)
+            for label in labels.INVOICE_COMPONENT_LABELS:
+                handler = component.INVOICE_HANDLER[label]
+                active_components_map[label] = handler.bulk_close(active_invoice, self.close_date)
 
-        # Finish current invoice
-        active_invoice.close(self.close_date, self.tax_pertentage)
+            # Finish current invoice
+            active_invoice.close(self.close_date, self.tax_pertentage)
 
-        # Creating new Invoice
-        new_invoice = Invoice.objects.create(
-            project=active_invoice.project,
-            start_date=self.close_date,
-            state=Invoice.InvoiceState.IN_PROGRESS
-        )
-        new_invoice.save()
+            # Creating new Invoice
+            new_invoice = Invoice.objects.create(
+                project=active_invoice.project,
+                start_date=self.close_date,
+                state=Invoice.InvoiceState.IN_PROGRESS
+            )
+            new_invoice.save()
 
-        # Cloning active component to continue in next invoice
-        for label, active_components in active_components_map.items():
-            handler = component.INVOICE_HANDLER[label]
-            for active_component in active_components:
-                handler.roll(active_component, self.close_date, update_payload={
+            # Cloning active component to continue in next invoice
+            for label, active_components in active_components_map.items():
+                handler = component.INVOICE_HANDLER[label]
+                handler.bulk_roll(active_components, update_payload={
                     "invoice": new_invoice
                 }, fallback_price=True)
 
-        # Auto Finish Deduct Balance
-        if get_dynamic_setting(INVOICE_AUTO_DEDUCT_BALANCE):
-            balance = Balance.get_balance_for_project(active_invoice.project)
-
-            deduct_transaction = f"Automatic balance deduction for invoice #{active_invoice.id}"
-            if balance.top_down_if_amount_is_good(active_invoice.total, deduct_transaction):
-                # Auto finish invoice
-                active_invoice.finish()
-                send_notification_from_template(
-                    project=active_invoice.project,
-                    title=settings.EMAIL_TAG + f' Invoice #{active_invoice.id} has been Paid from Balance',
-                    short_description=f'Invoice is paid with total of {active_invoice.total}',
-                    template='invoice.html',
-                    context={
-                        'invoice': active_invoice,
-                        'company_name': get_dynamic_setting(COMPANY_NAME),
-                        'address': get_dynamic_setting(COMPANY_ADDRESS),
-                    }
-                )
+            BillingRunProject.objects.create(
+                billing_run=self.billing_run,
+                project=active_invoice.project,
+                closed_invoice=active_invoice,
+                new_invoice=new_invoice,
+            )
+
+    def settle_closed_invoices(self):
+        """
+        Deduct balance and notify the invoices closed by this run, in batch.
+        Settled project is recorded, so resumed run never deduct or notify twice.
+        """
+        auto_deduct_balance = get_dynamic_setting(INVOICE_AUTO_DEDUCT_BALANCE)
+        while True:
+            closed_projects = list(
+                self.billing_run.closed_projects.filter(settled=False)
+                .select_related('closed_invoice__project')
+                .order_by('id')[:SETTLE_BATCH_SIZE]
+            )
+            if not closed_projects:
                 return
 
+            with transaction.atomic():
+                paid_project_ids = set()
+                # Auto Finish Deduct Balance
+                if auto_deduct_balance:
+                    paid_project_ids = Balance.bulk_top_down_if_amount_is_good([
+                        (
+                            closed_project.project_id,
+                            closed_project.closed_invoice.total,
+                            f"Automatic balance deduction for invoice #{closed_project.closed_invoice_id}",
+                        )
+                        for closed_project in closed_projects
+                    ])
+                    # Auto finish invoice
+                    Invoice.bulk_finish([
+                        closed_project.closed_invoice for closed_project in closed_projects
+                        if closed_project.project_id in paid_project_ids
+                    ])
+
+                for closed_project in closed_projects:
+                    self.notify_closed_invoice(closed_project.closed_invoice,
+                                               closed_project.project_id in paid_project_ids)
+
+                BillingRunProject.objects.filter(id__in=[closed_project.id for closed_project in closed_projects]) \
+                    .update(settled=True)
+
+    def notify_closed_invoice(self, invoice: Invoice, paid):
+        if paid:
+            send_notification_from_template(
+                project=invoice.project,
+                title=settings.EMAIL_TAG + f' Invoice #{invoice.id} has been Paid from Balance',
+                short_description=f'Invoice is paid with total of {invoice.total}',
+                template='invoice.html',
+                context={
+                    'invoice': invoice,
+                    'company_name': get_dynamic_setting(COMPANY_NAME),
+                    'address': get_dynamic_setting(COMPANY_ADDRESS),
+                }
+            )
+            return
+
         # Not Auto Finish
         send_notification_from_template(
-            project=active_invoice.project,
-            title=settings.EMAIL_TAG + f' Your Invoice #{active_invoice.id} is Ready',
-            short_description=f'Invoice is ready with total of {active_invoice.total}',
+            project=invoice.project,
+            title=settings.EMAIL_TAG + f' Your Invoice #{invoice.id} is Ready',
+            short_description=f'Invoice is ready with total of {invoice.total}',
             template='invoice.html',
             context={
-                'invoice': active_invoice,
+                'invoice': invoice,
                 'company_name': get_dynamic_setting(COMPANY_NAME),
                 'address': get_dynamic_setting(COMPANY_ADDRESS),
             }
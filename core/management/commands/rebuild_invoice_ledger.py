@@ -0,0 +1,36 @@
+import logging
+
+from django.core.management import BaseCommand
+
+from core.models import Invoice
+from core.utils.dynamic_setting import get_dynamic_setting, INVOICE_TAX
+
+LOG = logging.getLogger("yuyu")
+
+
+class Command(BaseCommand):
+    help = 'Rebuild closed subtotal ledger of invoice from its component, e.g. after component is edited in database.' \
+           ' Closed invoice with changed ledger get new tax, total and frozen document'
+
+    def add_arguments(self, parser):
+        parser.add_argument('invoice_id', nargs='*', type=int, help='Invoice to rebuild, default to every invoice')
+
+    def handle(self, *args, **options):
+        invoices = Invoice.objects.order_by('id')
+        if options['invoice_id']:
+            invoices = invoices.filter(id__in=options['invoice_id'])
+
+        tax_percentage = get_dynamic_setting(INVOICE_TAX)
+        rebuilt = 0
+        changed = 0
+        for invoice in invoices.iterator():
+            closed_subtotal = invoice.closed_subtotal
+            invoice.rebuild_closed_subtotal()
+            rebuilt += 1
+            if invoice.closed_subtotal != closed_subtotal:
+                changed += 1
+                if invoice.state != Invoice.InvoiceState.IN_PROGRESS:
+                    invoice.recalculate(tax_percentage)
+                LOG.info(f"Ledger of invoice #{invoice.id} changed from {closed_subtotal} to {invoice.closed_subtotal}")
+
+        LOG.info(f"Ledger of {rebuilt} invoice is rebuilt, {changed} changed")
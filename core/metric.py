@@ -1,30 +1,179 @@
+import os
+import time
+
 import prometheus_client
+from djmoney.money import Money
+from prometheus_client.core import GaugeMetricFamily
 
+from core.component import labels
 from core.component.component import INVOICE_COMPONENT_MODEL
-from core.component.labels import INVOICE_COMPONENT_LABELS
+from core.models import Invoice
+from yuyu import settings
+
+"""
+Define detailed cost and usage metric for every invoice component.
+label_names is the label after 'job', label_values extract the value from the component row.
+"""
+COMPONENT_METRIC = {
+    labels.LABEL_INSTANCES: {
+        "cost": ('instance_cost', 'Cost of instance usage'),
+        "usage": ('instance_usage', 'Usage time of instance'),
+        "label_names": ['flavor', 'name', 'project_id'],
+        "label_values": lambda i: [i.flavor_id, i.name, i.invoice.project.tenant_id],
+    },
+    labels.LABEL_VOLUMES: {
+        "cost": ('volume_cost', 'Cost of volume usage'),
+        "usage": ('volume_usage', 'Usage time of volume'),
+        "label_names": ['type', 'name', 'project_id'],
+        "label_values": lambda i: [i.volume_type_id, i.volume_name, i.invoice.project.tenant_id],
+    },
+    labels.LABEL_FLOATING_IPS: {
+        "cost": ('floatingip_cost', 'Cost of floatingip usage'),
+        "usage": ('floatingip_usage', 'Usage time of floatingip'),
+        "label_names": ['name', 'project_id'],
+        "label_values": lambda i: [i.ip, i.invoice.project.tenant_id],
+    },
+    labels.LABEL_ROUTERS: {
+        "cost": ('router_cost', 'Cost of router usage'),
+        "usage": ('router_usage', 'Usage time of router'),
+        "label_names": ['name', 'project_id'],
+        "label_values": lambda i: [i.name, i.invoice.project.tenant_id],
+    },
+    labels.LABEL_SNAPSHOTS: {
+        "cost": ('snapshot_cost', 'Cost of snapshot usage'),
+        "usage": ('snapshot_usage', 'Usage time of snapshot'),
+        "label_names": ['name', 'project_id'],
+        "label_values": lambda i: [i.name, i.invoice.project.tenant_id],
+    },
+    labels.LABEL_IMAGES: {
+        "cost": ('image_cost', 'Cost of image usage'),
+        "usage": ('image_usage', 'Usage time of image'),
+        "label_names": ['name', 'project_id'],
+        "label_values": lambda i: [i.name, i.invoice.project.tenant_id],
+    },
+}
+
+
+class CostCollector(object):
+    """
+    Collect cost explorer metric from in progress invoice on every scrape.
+    Every component row is streamed once, so deleted resource will not be exported anymore.
+    """
+
+    def describe(self):
+        # Describe without touching database, registry will not call collect() on register
+        yield GaugeMetricFamily('total_cost', 'Total Cost of resource for current invoice period',
+                                labels=['job', 'resources'])
+        yield GaugeMetricFamily('total_resource', 'Total Active Resource', labels=['job', 'resources'])
+        for metric in COMPONENT_METRIC.values():
+            label_names = ['job'] + metric['label_names']
+            yield GaugeMetricFamily(*metric['cost'], labels=label_names)
+            yield GaugeMetricFamily(*metric['usage'], labels=label_names)
+
+    def collect(self):
+        total_cost = GaugeMetricFamily('total_cost', 'Total Cost of resource for current invoice period',
+                                       labels=['job', 'resources'])
+        total_resource = GaugeMetricFamily('total_resource', 'Total Active Resource', labels=['job', 'resources'])
+        detail_metrics = []
+
+        for k, v in INVOICE_COMPONENT_MODEL.items():
+            metric = COMPONENT_METRIC[k]
+            cost_name, cost_description = metric['cost']
+            usage_name, usage_description = metric['usage']
+
+            # Keyed by label values, the same series will keep the last value like Gauge.set()
+            cost_samples = {}
+            usage_samples = {}
+            sum_of_price = 0
+            total_active_resource = 0
+
+            items = v.objects.filter(invoice__state=Invoice.InvoiceState.IN_PROGRESS) \
+                .select_related('invoice__project') \
+                .iterator()
+            for i in items:
+                price_charged = i.price_charged
+                sum_of_price += price_charged
+                if i.end_date is None:
+                    total_active_resource += 1
+
+                label_values = tuple([cost_name] + metric['label_values'](i))
+                cost_samples[label_values] = price_charged.amount
+                usage_samples[(usage_name,) + label_values[1:]] = i.usage_time
+
+            sum_of_price = sum_of_price or Money(amount=0, currency=settings.DEFAULT_CURRENCY)
+            total_cost.add_metric(['total_cost', k], sum_of_price.amount)
+            total_resource.add_metric(['total_resource', k], total_active_resource)
+
+            label_names = ['job'] + metric['label_names']
+            cost_metric = GaugeMetricFamily(cost_name, cost_description, labels=label_names)
+            for label_values, value in cost_samples.items():
+                cost_metric.add_metric(label_values, value)
+
+            usage_metric = GaugeMetricFamily(usage_name, usage_description, labels=label_names)
+            for label_values, value in usage_samples.items():
+                usage_metric.add_metric(label_values, value)
+
+            detail_metrics += [cost_metric, usage_metric]
+
+        yield total_cost
+        yield from detail_metrics
+        yield total_resource
+
+
+# Separate registry, so the cost metric can be served live or from snapshot
+COST_REGISTRY = prometheus_client.CollectorRegistry(auto_describe=True)
+COST_REGISTRY.register(CostCollector())
+
+
+def generate_cost_metric():
+    """
+    Build cost explorer exposition page from database
+    :return: Exposition page in bytes
+    """
+    return prometheus_client.generate_latest(COST_REGISTRY)
 
-# Cost Explorer (Summary)
-TOTAL_COST_METRIC = prometheus_client.Gauge('total_cost', 'Total Cost of resource for current invoice period', labelnames=['job', 'resources'])
 
-# Detailed Cost
-INSTANCE_COST_METRIC = prometheus_client.Gauge('instance_cost', 'Cost of instance usage', labelnames=['job', 'flavor', 'name', 'project_id'])
-INSTANCE_USAGE_METRIC = prometheus_client.Gauge('instance_usage', 'Usage time of instance', labelnames=['job', 'flavor', 'name', 'project_id'])
+def build_snapshot(path):
+    """
+    Build cost explorer exposition and save it atomically to the snapshot file
+    :param path: Snapshot file path
+    :return: Build duration in seconds
+    """
+    build_start = time.monotonic()
+    metrics_page = generate_cost_metric()
+    build_duration = time.monotonic() - build_start
 
-VOLUME_COST_METRIC = prometheus_client.Gauge('volume_cost', 'Cost of volume usage', labelnames=['job', 'type', 'name', 'project_id'])
-VOLUME_USAGE_METRIC = prometheus_client.Gauge('volume_usage', 'Usage time of volume', labelnames=['job', 'type', 'name', 'project_id'])
+    registry = prometheus_client.CollectorRegistry()
+    prometheus_client.Gauge('metrics_snapshot_build_duration_seconds', 'Duration of the last metrics snapshot build',
+                            registry=registry).set(build_duration)
+    metrics_page += prometheus_client.generate_latest(registry)
 
-FLOATINGIP_COST_METRIC = prometheus_client.Gauge('floatingip_cost', 'Cost of floatingip usage', labelnames=['job', 'name', 'project_id'])
-FLOATINGIP_USAGE_METRIC = prometheus_client.Gauge('floatingip_usage', 'Usage time of floatingip', labelnames=['job', 'name', 'project_id'])
+    # Write to temporary file first, so scrape will never read half written snapshot
+    temp_path = f'{path}.{os.getpid()}.tmp'
+    with open(temp_path, 'wb') as snapshot_file:
+        snapshot_file.write(metrics_page)
+    os.replace(temp_path, path)
 
-ROUTER_COST_METRIC = prometheus_client.Gauge('router_cost', 'Cost of router usage', labelnames=['job', 'name', 'project_id'])
-ROUTER_USAGE_METRIC = prometheus_client.Gauge('router_usage', 'Usage time of router', labelnames=['job', 'name', 'project_id'])
+    return build_duration
 
-SNAPSHOT_COST_METRIC = prometheus_client.Gauge('snapshot_cost', 'Cost of snapshot usage', labelnames=['job', 'name', 'project_id'])
-SNAPSHOT_USAGE_METRIC = prometheus_client.Gauge('snapshot_usage', 'Usage time of snapshot', labelnames=['job', 'name', 'project_id'])
 
-IMAGE_COST_METRIC = prometheus_client.Gauge('image_cost', 'Cost of image usage', labelnames=['job', 'name', 'project_id'])
-IMAGE_USAGE_METRIC = prometheus_client.Gauge('image_usage', 'Usage time of image', labelnames=['job', 'name', 'project_id'])
+def read_snapshot(path):
+    """
+    Read cost explorer exposition from the snapshot file, with the age of the snapshot.
+    Age will be +Inf if the snapshot is not built yet.
+    :param path: Snapshot file path
+    :return: Exposition page in bytes
+    """
+    try:
+        with open(path, 'rb') as snapshot_file:
+            metrics_page = snapshot_file.read()
+        snapshot_age = time.time() - os.path.getmtime(path)
+    except FileNotFoundError:
+        metrics_page = b''
+        snapshot_age = float('inf')
 
-# Resource growth
-TOTAL_RESOURCE_METRIC = prometheus_client.Gauge('total_resource', 'Total Active Resource', labelnames=['job', 'resources'])
+    registry = prometheus_client.CollectorRegistry()
+    prometheus_client.Gauge('metrics_snapshot_age_seconds', 'Age of the metrics snapshot that is served',
+                            registry=registry).set(snapshot_age)
 
+    return metrics_page + prometheus_client.generate_latest(registry)
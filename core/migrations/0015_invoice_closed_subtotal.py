@@ -0,0 +1,61 @@
+# Generated by Django 3.2.6 on 2026-10-18 02:22
+
+import math
+from decimal import Decimal
+from django.db import migrations
+import djmoney.models.fields
+
+COMPONENT_MODELS = ['InvoiceInstance', 'InvoiceVolume', 'InvoiceFloatingIp', 'InvoiceRouter', 'InvoiceSnapshot',
+                    'InvoiceImage']
+
+
+def closed_price_charged(component):
+    # Same calculation as InvoiceComponentMixin.price_charged, historical model does not have the property
+    start_date = component.start_date
+    end_date = component.end_date
+    if start_date.date().day == 1 and end_date.date().day == 1 \
+            and start_date.date().month != end_date.date().month \
+            and component.monthly_price:
+        price = component.monthly_price.amount
+    else:
+        hour_passes = math.ceil((end_date - start_date).total_seconds() / 3600)
+        price = component.hourly_price.amount * hour_passes
+
+    if hasattr(component, 'space_allocation_gb'):
+        price = price * math.ceil(component.space_allocation_gb)
+
+    return price
+
+
+def backfill_closed_subtotal(apps, schema_editor):
+    Invoice = apps.get_model('core', 'Invoice')
+    closed_subtotal = {}
+    for model_name in COMPONENT_MODELS:
+        model = apps.get_model('core', model_name)
+        for component in model.objects.exclude(end_date=None).iterator():
+            closed_subtotal[component.invoice_id] = closed_subtotal.get(component.invoice_id, 0) + \
+                                                    closed_price_charged(component)
+
+    for invoice_id, amount in closed_subtotal.items():
+        Invoice.objects.filter(id=invoice_id).update(closed_subtotal=amount)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0014_auto_20230926_1515'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='invoice',
+            name='closed_subtotal',
+            field=djmoney.models.fields.MoneyField(decimal_places=2, default=Decimal('0'), max_digits=256),
+        ),
+        migrations.AddField(
+            model_name='invoice',
+            name='closed_subtotal_currency',
+            field=djmoney.models.fields.CurrencyField(choices=[('IDR', 'Indonesian Rupiah')], default='IDR', editable=False, max_length=3),
+        ),
+        migrations.RunPython(backfill_closed_subtotal, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,44 @@
+# Generated by Django 3.2.6 on 2026-10-18 02:30
+
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0016_cacheversion'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='BillingRun',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('created_at', models.DateTimeField(auto_now_add=True)),
+                ('updated_at', models.DateTimeField(auto_now=True)),
+                ('period', models.DateTimeField(unique=True)),
+                ('close_date', models.DateTimeField()),
+                ('state', models.IntegerField(choices=[(1, 'Running'), (100, 'Finished')])),
+                ('finish_date', models.DateTimeField(blank=True, default=None, null=True)),
+            ],
+            options={
+                'abstract': False,
+            },
+        ),
+        migrations.CreateModel(
+            name='BillingRunProject',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('created_at', models.DateTimeField(auto_now_add=True)),
+                ('updated_at', models.DateTimeField(auto_now=True)),
+                ('billing_run', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='closed_projects', to='core.billingrun')),
+                ('closed_invoice', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='+', to='core.invoice')),
+                ('new_invoice', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='+', to='core.invoice')),
+                ('project', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, to='core.billingproject')),
+            ],
+            options={
+                'unique_together': {('billing_run', 'project')},
+            },
+        ),
+    ]
@@ -0,0 +1,23 @@
+# Generated by Django 3.2.6 on 2026-10-18 02:32
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0017_billingrun'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='notification',
+            name='next_send_at',
+            field=models.DateTimeField(blank=True, db_index=True, default=None, null=True),
+        ),
+        migrations.AddField(
+            model_name='notification',
+            name='send_attempt',
+            field=models.IntegerField(default=0),
+        ),
+    ]
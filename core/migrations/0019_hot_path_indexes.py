@@ -0,0 +1,74 @@
+# Generated by Django 3.2.6 on 2026-10-18 02:38
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0018_notification_outbox'),
+    ]
+
+    operations = [
+        migrations.AlterField(
+            model_name='billingproject',
+            name='tenant_id',
+            field=models.CharField(db_index=True, max_length=256),
+        ),
+        migrations.AddIndex(
+            model_name='invoice',
+            index=models.Index(fields=['project', 'state'], name='invoice_project_state_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='invoice',
+            index=models.Index(fields=['state', 'start_date'], name='invoice_state_start_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='invoicefloatingip',
+            index=models.Index(condition=models.Q(('end_date', None)), fields=['invoice', 'fip_id'], name='fip_active_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='invoicefloatingip',
+            index=models.Index(fields=['invoice', 'end_date'], name='fip_invoice_end_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='invoiceimage',
+            index=models.Index(condition=models.Q(('end_date', None)), fields=['invoice', 'image_id'], name='image_active_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='invoiceimage',
+            index=models.Index(fields=['invoice', 'end_date'], name='image_invoice_end_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='invoiceinstance',
+            index=models.Index(condition=models.Q(('end_date', None)), fields=['invoice', 'instance_id'], name='instance_active_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='invoiceinstance',
+            index=models.Index(fields=['invoice', 'end_date'], name='instance_invoice_end_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='invoicerouter',
+            index=models.Index(condition=models.Q(('end_date', None)), fields=['invoice', 'router_id'], name='router_active_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='invoicerouter',
+            index=models.Index(fields=['invoice', 'end_date'], name='router_invoice_end_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='invoicesnapshot',
+            index=models.Index(condition=models.Q(('end_date', None)), fields=['invoice', 'snapshot_id'], name='snapshot_active_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='invoicesnapshot',
+            index=models.Index(fields=['invoice', 'end_date'], name='snapshot_invoice_end_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='invoicevolume',
+            index=models.Index(condition=models.Q(('end_date', None)), fields=['invoice', 'volume_id'], name='volume_active_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='invoicevolume',
+            index=models.Index(fields=['invoice', 'end_date'], name='volume_invoice_end_idx'),
+        ),
+    ]
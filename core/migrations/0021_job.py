@@ -0,0 +1,32 @@
+# Generated by Django 3.2.6 on 2026-10-18 03:05
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0020_invoice_document'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='Job',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('created_at', models.DateTimeField(auto_now_add=True)),
+                ('updated_at', models.DateTimeField(auto_now=True)),
+                ('type', models.CharField(choices=[('disable_billing', 'Disable Billing'), ('reset_billing', 'Reset Billing')], max_length=256)),
+                ('state', models.IntegerField(choices=[(1, 'Queued'), (2, 'Running'), (100, 'Finished'), (101, 'Failed')], db_index=True, default=1)),
+                ('progress', models.IntegerField(default=0)),
+                ('total', models.IntegerField(default=0)),
+                ('error', models.TextField(blank=True, default=None, null=True)),
+                ('start_date', models.DateTimeField(blank=True, default=None, null=True)),
+                ('finish_date', models.DateTimeField(blank=True, default=None, null=True)),
+                ('lease_until', models.DateTimeField(blank=True, default=None, null=True)),
+            ],
+            options={
+                'abstract': False,
+            },
+        ),
+    ]
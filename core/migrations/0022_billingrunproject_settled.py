@@ -0,0 +1,24 @@
+# Generated by Django 3.2.6 on 2026-10-18 03:10
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0021_job'),
+    ]
+
+    operations = [
+        # Project closed before this migration is already deducted and notified
+        migrations.AddField(
+            model_name='billingrunproject',
+            name='settled',
+            field=models.BooleanField(default=True),
+        ),
+        migrations.AlterField(
+            model_name='billingrunproject',
+            name='settled',
+            field=models.BooleanField(default=False),
+        ),
+    ]
@@ -0,0 +1,18 @@
+# Generated by Django 3.2.6 on 2026-10-18 03:26
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0022_billingrunproject_settled'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='invoice',
+            name='tax_percentage',
+            field=models.IntegerField(blank=True, default=None, null=True),
+        ),
+    ]
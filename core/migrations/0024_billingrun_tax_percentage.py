@@ -0,0 +1,18 @@
+# Generated by Django 3.2.6 on 2026-10-18 03:42
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0023_invoice_tax_percentage'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='billingrun',
+            name='tax_percentage',
+            field=models.IntegerField(blank=True, default=None, null=True),
+        ),
+    ]
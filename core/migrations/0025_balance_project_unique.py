@@ -0,0 +1,37 @@
+# Generated by Django 3.2.6 on 2026-10-18 03:43
+
+from django.db import migrations, models
+from django.db.models import Count
+
+
+def merge_duplicate_balances(apps, schema_editor):
+    # Duplicate balance of a project is merged into the oldest one, with its amount and transactions
+    Balance = apps.get_model('core', 'Balance')
+    BalanceTransaction = apps.get_model('core', 'BalanceTransaction')
+    duplicate_project_ids = Balance.objects.values('project_id').annotate(count=Count('id')) \
+        .filter(count__gt=1).values_list('project_id', flat=True)
+    for project_id in list(duplicate_project_ids):
+        balances = list(Balance.objects.filter(project_id=project_id).order_by('id'))
+        kept, duplicates = balances[0], balances[1:]
+        duplicate_ids = [balance.id for balance in duplicates]
+
+        BalanceTransaction.objects.filter(balance_id__in=duplicate_ids).update(balance_id=kept.id)
+        Balance.objects.filter(id=kept.id).update(
+            amount=kept.amount.amount + sum(balance.amount.amount for balance in duplicates)
+        )
+        Balance.objects.filter(id__in=duplicate_ids).delete()
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0024_billingrun_tax_percentage'),
+    ]
+
+    operations = [
+        migrations.RunPython(merge_duplicate_balances, migrations.RunPython.noop),
+        migrations.AddConstraint(
+            model_name='balance',
+            constraint=models.UniqueConstraint(fields=('project',), name='balance_project_unique'),
+        ),
+    ]
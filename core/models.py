@@ -5,6 +5,7 @@ import re
 from django.conf import settings
 from django.core.mail import send_mail
 from django.db import models, transaction
+from django.db.models import F, Q, Case, When, Value, DecimalField, prefetch_related_objects
 from django.utils import timezone
 from django.utils.html import strip_tags
 from djmoney.models.fields import MoneyField
@@ -14,6 +15,8 @@ from core.component import labels
 from core.component.labels import LABEL_INSTANCES, LABEL_IMAGES, LABEL_SNAPSHOTS, LABEL_ROUTERS, LABEL_FLOATING_IPS, \
     LABEL_VOLUMES
 from core.utils.model_utils import BaseModel, TimestampMixin, PriceMixin, InvoiceComponentMixin
+from core.utils.price_aggregation import get_component_annotation, get_component_prefetches, COMPONENT_COUNT, \
+    COMPONENT_PRICE, COMPONENT_ACTIVE_PRICE
 
 LOG = logging.getLogger("yuyu")
 
@@ -31,6 +34,18 @@ class DynamicSetting(BaseModel):
     type = models.IntegerField(choices=DataType.choices)
 
 
+#endregion
+
+#region Cache
+class CacheVersion(BaseModel):
+    """
+    Version stamp of process local cache, bumped when the cached data is changed.
+    Other process will reload their cache when the version is different.
+    """
+    key = models.CharField(max_length=256, unique=True, db_index=True)
+    version = models.BigIntegerField(default=0)
+
+
 #endregion
 
 #region Pricing
@@ -66,7 +81,7 @@ class ImagePrice(BaseModel, TimestampMixin, PriceMixin):
 
 #region Invoicing
 class BillingProject(BaseModel, TimestampMixin):
-    tenant_id = models.CharField(max_length=256)
+    tenant_id = models.CharField(max_length=256, db_index=True)
     email_notification = models.CharField(max_length=512, blank=True, null=True)
 
     def __str__(self):
@@ -86,28 +101,101 @@ class Invoice(BaseModel, TimestampMixin):
     state = models.IntegerField(choices=InvoiceState.choices)
     tax = MoneyField(max_digits=256, default=None, blank=True, null=True)
     total = MoneyField(max_digits=256, default=None, blank=True, null=True)
+    # Tax percentage used when the invoice is closed, None for invoice closed before it is recorded
+    tax_percentage = models.IntegerField(default=None, blank=True, null=True)
+
+    # Sum of price_charged of every closed component, maintained by InvoiceComponentMixin.close()
+    closed_subtotal = MoneyField(max_digits=256, default=0)
+
+    # Serialized invoice frozen when the invoice is closed, served instead of reading the components
+    document = models.JSONField(default=None, blank=True, null=True)
+    document_version = models.IntegerField(default=0)
+
+    class Meta:
+        indexes = [
+            # In progress invoice of a project
+            models.Index(fields=['project', 'state'], name='invoice_project_state_idx'),
+            # In progress invoice that will be closed by process_invoice
+            models.Index(fields=['state', 'start_date'], name='invoice_state_start_idx'),
+        ]
 
     @property
     def subtotal(self):
-        # Need to optimize?
-        # currently price is calculated on the fly, maybe need to save to db to make performance faster?
-        # or using cache?
+        """
+        Closed components are read from the persisted ledger.
+        Only active components of an in progress invoice are calculated on the fly.
+        """
+        price = self.closed_subtotal
+        if self.state == Invoice.InvoiceState.IN_PROGRESS:
+            for component_relation_label in labels.INVOICE_COMPONENT_LABELS:
+                active_price = self.get_component_aggregate(component_relation_label, COMPONENT_ACTIVE_PRICE)
+                if active_price is None:
+                    relation_active_row = getattr(self, component_relation_label).filter(end_date=None).all()
+                    active_price = sum(map(lambda x: x.price_charged, relation_active_row))
+                price += active_price
 
-        price = 0
-        for component_relation_label in labels.INVOICE_COMPONENT_LABELS:
-            relation_all_row = getattr(self, component_relation_label).all()
-            price += sum(map(lambda x: x.price_charged, relation_all_row))
+        return price
 
-        if price == 0:
-            return Money(amount=price, currency=settings.DEFAULT_CURRENCY)
+    def get_component_aggregate(self, label, aggregate):
+        """
+        Get component aggregate annotated by annotate_invoice_components(),
+        or calculated from the components prefetched by prefetch_invoice_components()
+        :param label: Invoice component label
+        :param aggregate: COMPONENT_COUNT, COMPONENT_PRICE or COMPONENT_ACTIVE_PRICE
+        :return: Count or price, None if the invoice is not annotated nor prefetched
+        """
+        annotation = get_component_annotation(label, aggregate)
+        if hasattr(self, annotation):
+            value = getattr(self, annotation)
+            if aggregate == COMPONENT_COUNT:
+                return value
+            return Money(amount=value, currency=settings.DEFAULT_CURRENCY)
+
+        prefetched_rows = getattr(self, '_prefetched_objects_cache', {}).get(label)
+        if prefetched_rows is None:
+            return None
+
+        if aggregate == COMPONENT_ACTIVE_PRICE:
+            prefetched_rows = [row for row in prefetched_rows if row.end_date is None]
+        if aggregate == COMPONENT_COUNT:
+            return len(prefetched_rows)
+        return sum(map(lambda x: x.annotated_price_charged, prefetched_rows))
 
-        return price
+    @classmethod
+    def add_closed_subtotal(cls, invoice_id, amount):
+        """
+        Add price of a closed component into the invoice ledger.
+        Using F() expression so concurrent component close will not overwrite each other.
+        :param invoice_id: Invoice id of the closed component
+        :param amount: Price charged of the closed component
+        """
+        cls.objects.filter(id=invoice_id).update(closed_subtotal=F('closed_subtotal') + amount)
+
+    def rebuild_closed_subtotal(self):
+        """
+        Recalculate the ledger from the component rows.
+        Use it after component rows are modified outside of the invoice handler (e.g. from admin).
+        """
+        with transaction.atomic():
+            # Component closed by event handler in the meantime must not be lost, they lock the invoice too
+            Invoice.objects.select_for_update().filter(id=self.id).values_list('id', flat=True).first()
+
+            price = Money(amount=0, currency=settings.DEFAULT_CURRENCY)
+            for component_relation_label in labels.INVOICE_COMPONENT_LABELS:
+                relation_closed_row = getattr(self, component_relation_label).exclude(end_date=None).all()
+                price += sum(map(lambda x: x.price_charged, relation_closed_row))
+
+            self.closed_subtotal = price
+            self.save(update_fields=['closed_subtotal', 'closed_subtotal_currency', 'updated_at'])
 
     @property
     def total_resource(self):
         total = 0
         for component_relation_label in labels.INVOICE_COMPONENT_LABELS:
-            total += getattr(self, component_relation_label).count()
+            count = self.get_component_aggregate(component_relation_label, COMPONENT_COUNT)
+            if count is None:
+                count = getattr(self, component_relation_label).count()
+            total += count
 
         return total
 
@@ -123,11 +211,55 @@ class Invoice(BaseModel, TimestampMixin):
             return 'Finished'
 
     def close(self, date, tax_percentage):
+        # Ledger is updated in database by the closed components, reload it first
+        self.refresh_from_db(fields=['closed_subtotal_currency', 'closed_subtotal'])
         self.state = Invoice.InvoiceState.UNPAID
         self.end_date = date
-        self.tax = tax_percentage * self.subtotal / 100
-        self.total = self.tax + self.subtotal
+        self.tax_percentage = tax_percentage
         # TODO: Deduct balance
+        self.recalculate(tax_percentage)
+
+    def recalculate(self, default_tax_percentage):
+        """
+        Calculate tax and total of closed invoice from its subtotal, then freeze it again
+        :param default_tax_percentage: Used when the tax percentage of the invoice is not recorded
+        """
+        if self.tax_percentage is None:
+            self.tax_percentage = default_tax_percentage
+
+        self.tax = self.tax_percentage * self.subtotal / 100
+        self.total = self.tax + self.subtotal
+        self.freeze()
+
+    def correct(self, default_tax_percentage):
+        """
+        Recalculate the invoice after it or its components are corrected from admin.
+        The ledger is rebuilt, closed invoice also get new tax, total and frozen document.
+        :param default_tax_percentage: Used when the tax percentage of the invoice is not recorded
+        """
+        self.rebuild_closed_subtotal()
+        if self.state != Invoice.InvoiceState.IN_PROGRESS:
+            self.recalculate(default_tax_percentage)
+        elif self.document is not None:
+            # Reopened invoice is no longer frozen
+            self.document = None
+            self.save(update_fields=['document', 'updated_at'])
+
+    def freeze(self):
+        """
+        Save the invoice with a new version of its frozen document.
+        Closed invoice never change, only call it again when a closed invoice is corrected by admin.
+        """
+        from api.serializers import InvoiceSerializer
+        from core.component.component import INVOICE_COMPONENT_MODEL
+
+        # Components are serialized in the same order and price as the in progress invoice,
+        # previously prefetched components may be stale after correction
+        self._prefetched_objects_cache = {}
+        prefetch_related_objects([self], *get_component_prefetches(INVOICE_COMPONENT_MODEL))
+        self.document = None
+        self.document_version += 1
+        self.document = InvoiceSerializer(self).data
         self.save()
 
     def finish(self):
@@ -135,41 +267,126 @@ class Invoice(BaseModel, TimestampMixin):
         self.finish_date = timezone.now()
         self.save()
 
+    @classmethod
+    def bulk_finish(cls, invoices):
+        """
+        Finish many invoices with single update query
+        :param invoices: List of invoice, updated in place
+        """
+        finish_date = timezone.now()
+        cls.objects.filter(id__in=[invoice.id for invoice in invoices]) \
+            .update(state=Invoice.InvoiceState.FINISHED, finish_date=finish_date, updated_at=finish_date)
+        for invoice in invoices:
+            invoice.state = Invoice.InvoiceState.FINISHED
+            invoice.finish_date = finish_date
+
     def rollback_to_unpaid(self):
         self.state = Invoice.InvoiceState.UNPAID
         self.finish_date = None
         self.save()
 
     # Price for individual key
+    def get_component_price(self, label):
+        price = self.get_component_aggregate(label, COMPONENT_PRICE)
+        if price is None:
+            relation_all_row = getattr(self, label).all()
+            price = sum(map(lambda x: x.price_charged, relation_all_row))
+
+        return price
+
     @property
     def instance_price(self):
-        relation_all_row = getattr(self, LABEL_INSTANCES).all()
-        return sum(map(lambda x: x.price_charged, relation_all_row))
+        return self.get_component_price(LABEL_INSTANCES)
 
     @property
     def volume_price(self):
-        relation_all_row = getattr(self, LABEL_VOLUMES).all()
-        return sum(map(lambda x: x.price_charged, relation_all_row))
+        return self.get_component_price(LABEL_VOLUMES)
 
     @property
     def fip_price(self):
-        relation_all_row = getattr(self, LABEL_FLOATING_IPS).all()
-        return sum(map(lambda x: x.price_charged, relation_all_row))
+        return self.get_component_price(LABEL_FLOATING_IPS)
 
     @property
     def router_price(self):
-        relation_all_row = getattr(self, LABEL_ROUTERS).all()
-        return sum(map(lambda x: x.price_charged, relation_all_row))
+        return self.get_component_price(LABEL_ROUTERS)
 
     @property
     def snapshot_price(self):
-        relation_all_row = getattr(self, LABEL_SNAPSHOTS).all()
-        return sum(map(lambda x: x.price_charged, relation_all_row))
+        return self.get_component_price(LABEL_SNAPSHOTS)
 
     @property
     def images_price(self):
-        relation_all_row = getattr(self, LABEL_IMAGES).all()
-        return sum(map(lambda x: x.price_charged, relation_all_row))
+        return self.get_component_price(LABEL_IMAGES)
+
+
+#endregion
+
+#region Billing Run
+class BillingRun(BaseModel, TimestampMixin):
+    """
+    Record of month end invoice processing for a period.
+    Projects that already closed is recorded in BillingRunProject, so unfinished run can be resumed.
+    """
+    class RunState(models.IntegerChoices):
+        RUNNING = 1
+        FINISHED = 100
+
+    # First day of the new invoice period, only one run is allowed for each period
+    period = models.DateTimeField(unique=True)
+    close_date = models.DateTimeField()
+    # Every invoice of the period is taxed with the percentage the run started with, None for run started before it
+    # is recorded
+    tax_percentage = models.IntegerField(default=None, blank=True, null=True)
+    state = models.IntegerField(choices=RunState.choices)
+    finish_date = models.DateTimeField(default=None, blank=True, null=True)
+
+    def finish(self):
+        self.state = BillingRun.RunState.FINISHED
+        self.finish_date = timezone.now()
+        self.save()
+
+
+class BillingRunProject(BaseModel, TimestampMixin):
+    billing_run = models.ForeignKey('BillingRun', on_delete=models.CASCADE, related_name='closed_projects')
+    project = models.ForeignKey('BillingProject', on_delete=models.CASCADE)
+    closed_invoice = models.ForeignKey('Invoice', on_delete=models.CASCADE, related_name='+')
+    new_invoice = models.ForeignKey('Invoice', on_delete=models.CASCADE, related_name='+')
+    # Balance is deducted and the invoice is notified
+    settled = models.BooleanField(default=False)
+
+    class Meta:
+        unique_together = [('billing_run', 'project')]
+
+
+#endregion
+
+#region Job
+class Job(BaseModel, TimestampMixin):
+    """
+    Long running admin action that is run by job worker instead of the API request
+    """
+    class JobType(models.TextChoices):
+        DISABLE_BILLING = "disable_billing"
+        RESET_BILLING = "reset_billing"
+
+    class JobState(models.IntegerChoices):
+        QUEUED = 1
+        RUNNING = 2
+        FINISHED = 100
+        FAILED = 101
+
+    type = models.CharField(choices=JobType.choices, max_length=256)
+    state = models.IntegerField(choices=JobState.choices, default=JobState.QUEUED, db_index=True)
+    progress = models.IntegerField(default=0)
+    total = models.IntegerField(default=0)
+    error = models.TextField(default=None, blank=True, null=True)
+    start_date = models.DateTimeField(default=None, blank=True, null=True)
+    finish_date = models.DateTimeField(default=None, blank=True, null=True)
+    # Running job is picked again by other worker after this time, e.g. when the worker is killed
+    lease_until = models.DateTimeField(default=None, blank=True, null=True)
+
+    def is_pending(self):
+        return self.state in [Job.JobState.QUEUED, Job.JobState.RUNNING]
 
 
 #endregion
@@ -186,6 +403,13 @@ class InvoiceInstance(BaseModel, InvoiceComponentMixin):
     # Informative
     name = models.CharField(max_length=256)
 
+    class Meta:
+        indexes = [
+            # Active component lookup by key
+            models.Index(fields=['invoice', 'instance_id'], condition=Q(end_date=None), name='instance_active_idx'),
+            models.Index(fields=['invoice', 'end_date'], name='instance_invoice_end_idx'),
+        ]
+
 
 class InvoiceFloatingIp(BaseModel, InvoiceComponentMixin):
     invoice = models.ForeignKey('Invoice', on_delete=models.CASCADE, related_name=labels.LABEL_FLOATING_IPS)
@@ -195,6 +419,13 @@ class InvoiceFloatingIp(BaseModel, InvoiceComponentMixin):
     # Informative
     ip = models.CharField(max_length=256)
 
+    class Meta:
+        indexes = [
+            # Active component lookup by key
+            models.Index(fields=['invoice', 'fip_id'], condition=Q(end_date=None), name='fip_active_idx'),
+            models.Index(fields=['invoice', 'end_date'], name='fip_invoice_end_idx'),
+        ]
+
 
 class InvoiceVolume(BaseModel, InvoiceComponentMixin):
     invoice = models.ForeignKey('Invoice', on_delete=models.CASCADE, related_name=labels.LABEL_VOLUMES)
@@ -208,6 +439,13 @@ class InvoiceVolume(BaseModel, InvoiceComponentMixin):
     # Informative
     volume_name = models.CharField(max_length=256)
 
+    class Meta:
+        indexes = [
+            # Active component lookup by key
+            models.Index(fields=['invoice', 'volume_id'], condition=Q(end_date=None), name='volume_active_idx'),
+            models.Index(fields=['invoice', 'end_date'], name='volume_invoice_end_idx'),
+        ]
+
     @property
     def price_charged(self):
         price_without_allocation = super().price_charged
@@ -222,6 +460,13 @@ class InvoiceRouter(BaseModel, InvoiceComponentMixin):
     # Informative
     name = models.CharField(max_length=256)
 
+    class Meta:
+        indexes = [
+            # Active component lookup by key
+            models.Index(fields=['invoice', 'router_id'], condition=Q(end_date=None), name='router_active_idx'),
+            models.Index(fields=['invoice', 'end_date'], name='router_invoice_end_idx'),
+        ]
+
 
 class InvoiceSnapshot(BaseModel, InvoiceComponentMixin):
     invoice = models.ForeignKey('Invoice', on_delete=models.CASCADE, related_name=labels.LABEL_SNAPSHOTS)
@@ -234,6 +479,13 @@ class InvoiceSnapshot(BaseModel, InvoiceComponentMixin):
     # Informative
     name = models.CharField(max_length=256)
 
+    class Meta:
+        indexes = [
+            # Active component lookup by key
+            models.Index(fields=['invoice', 'snapshot_id'], condition=Q(end_date=None), name='snapshot_active_idx'),
+            models.Index(fields=['invoice', 'end_date'], name='snapshot_invoice_end_idx'),
+        ]
+
     @property
     def price_charged(self):
         price_without_allocation = super().price_charged
@@ -251,6 +503,13 @@ class InvoiceImage(BaseModel, InvoiceComponentMixin):
     # Informative
     name = models.CharField(max_length=256)
 
+    class Meta:
+        indexes = [
+            # Active component lookup by key
+            models.Index(fields=['invoice', 'image_id'], condition=Q(end_date=None), name='image_active_idx'),
+            models.Index(fields=['invoice', 'end_date'], name='image_invoice_end_idx'),
+        ]
+
     @property
     def price_charged(self):
         price_without_allocation = super().price_charged
@@ -266,13 +525,30 @@ class Notification(BaseModel, TimestampMixin):
     content = models.TextField()
     sent_status = models.BooleanField()
     is_read = models.BooleanField()
+    send_attempt = models.IntegerField(default=0)
+    # Queued notification will be sent by notification sender after this time, None when it is not queued
+    next_send_at = models.DateTimeField(default=None, blank=True, null=True, db_index=True)
 
     def recipient(self):
         if self.project and self.project.email_notification:
             return self.project.email_notification
         return 'Admin'
 
-    def send(self):
+    def queue(self):
+        """
+        Queue notification to be sent by notification sender
+        """
+        self.sent_status = False
+        self.send_attempt = 0
+        self.next_send_at = timezone.now()
+        self.save()
+
+    def send(self, connection=None) -> bool:
+        """
+        Send notification email
+        :param connection: Email connection to reuse, will open new connection if None
+        :return: Whether the email is sent
+        """
         from core.utils.dynamic_setting import get_dynamic_setting, EMAIL_ADMIN
         try:
             def textify(html):
@@ -291,13 +567,18 @@ class Notification(BaseModel, TimestampMixin):
                 from_email=settings.DEFAULT_FROM_EMAIL,
                 recipient_list=recipient,
                 html_message=self.content,
+                connection=connection,
             )
             self.sent_status = True
+            self.next_send_at = None
             self.save()
+            return True
         except Exception as e:
             LOG.exception('Error sending notification')
             self.sent_status = False
+            self.send_attempt += 1
             self.save()
+            return False
 
 
 #region balance
@@ -305,6 +586,12 @@ class Balance(BaseModel, TimestampMixin):
     project = models.ForeignKey('BillingProject', on_delete=models.CASCADE)
     amount = MoneyField(max_digits=256, default=0)
 
+    class Meta:
+        constraints = [
+            # Balance created concurrently is never duplicated, so deduction is never split between two balances
+            models.UniqueConstraint(fields=['project'], name='balance_project_unique'),
+        ]
+
     @classmethod
     def get_balance_for_project(cls, project):
         balance, created = Balance.objects.get_or_create(project=project, defaults={
@@ -313,34 +600,117 @@ class Balance(BaseModel, TimestampMixin):
 
         return balance
 
+    @classmethod
+    def get_balances_for_projects(cls, project_ids):
+        """
+        Get balance of many projects at once, like get_balance_for_project()
+        :param project_ids: List of billing project id
+        :return: Dict of project id and its balance
+        """
+        balances = {balance.project_id: balance for balance in Balance.objects.filter(project_id__in=project_ids)}
+
+        missing_project_ids = [project_id for project_id in project_ids if project_id not in balances]
+        if missing_project_ids:
+            # Balance created by other process in the meantime is kept, and every balance is loaded again
+            # because ignored row does not return id
+            Balance.objects.bulk_create([Balance(project_id=project_id) for project_id in missing_project_ids],
+                                        ignore_conflicts=True)
+            for balance in Balance.objects.filter(project_id__in=missing_project_ids):
+                balances[balance.project_id] = balance
+
+        return balances
+
+    def check_currency(self, amount):
+        if amount.currency != self.amount.currency:
+            raise TypeError(f"Cannot add or subtract {amount.currency} to balance in {self.amount.currency}")
+
+    def add_amount(self, amount):
+        """
+        Add amount to the balance in database with F() expression, so concurrent change will not overwrite each other
+        """
+        Balance.objects.filter(id=self.id).update(amount=F('amount') + amount.amount, updated_at=timezone.now())
+        self.refresh_from_db(fields=['amount_currency', 'amount'])
+
     @transaction.atomic
     def top_up(self, amount, description):
+        self.check_currency(amount)
         balance_transaction = BalanceTransaction(balance=self, action=BalanceTransaction.ActionType.TOP_UP,
                                                  amount=amount, description=description)
         balance_transaction.save()
 
-        self.amount += amount
-        self.save()
+        self.add_amount(amount)
 
         return balance_transaction
 
     @transaction.atomic
     def top_down(self, amount, description):
+        self.check_currency(amount)
         balance_transaction = BalanceTransaction(balance=self, action=BalanceTransaction.ActionType.TOP_DOWN,
                                                  amount=amount, description=description)
         balance_transaction.save()
 
-        self.amount -= amount
-        self.save()
+        self.add_amount(-amount)
 
         return balance_transaction
 
+    @transaction.atomic
     def top_down_if_amount_is_good(self, amount, description) -> bool:
-        if self.amount >= amount:
-            self.top_down(amount, description)
-            return True
+        self.check_currency(amount)
+        # Checked and deducted in one statement, so concurrent top down can not take the same amount twice
+        deducted = Balance.objects.filter(id=self.id, amount__gte=amount.amount) \
+            .update(amount=F('amount') - amount.amount, updated_at=timezone.now())
+        self.refresh_from_db(fields=['amount_currency', 'amount'])
+        if not deducted:
+            return False
+
+        BalanceTransaction.objects.create(balance=self, action=BalanceTransaction.ActionType.TOP_DOWN,
+                                          amount=amount, description=description)
+        return True
+
+    @classmethod
+    def bulk_top_down_if_amount_is_good(cls, deductions):
+        """
+        Top down many balances in a few statements, balance that is not enough is skipped.
+        Same as calling top_down_if_amount_is_good() for every deduction, one transaction is written for each deduction.
+        Balance rows of the deductions are locked only while the deduction is written.
+        :param deductions: List of (project id, amount, description), one deduction for each project
+        :return: Set of project id whose balance is deducted
+        """
+        if not deductions:
+            return set()
+
+        project_ids = [project_id for project_id, amount, description in deductions]
+        balances = cls.get_balances_for_projects(project_ids)
+        balance_ids = {project_id: balance.id for project_id, balance in balances.items()}
+
+        with transaction.atomic():
+            locked_balances = Balance.objects.select_for_update().in_bulk(list(balance_ids.values()))
+
+            deducted = []
+            for project_id, amount, description in deductions:
+                balance = locked_balances[balance_ids[project_id]]
+                balance.check_currency(amount)
+                if balance.amount >= amount:
+                    deducted.append((balance, amount, description))
+
+            if not deducted:
+                return set()
+
+            Balance.objects.filter(id__in=[balance.id for balance, amount, description in deducted]).update(
+                amount=Case(
+                    *[When(id=balance.id, then=F('amount') - Value(amount.amount))
+                      for balance, amount, description in deducted],
+                    output_field=DecimalField(),
+                ),
+                updated_at=timezone.now(),
+            )
+            BalanceTransaction.objects.bulk_create([
+                BalanceTransaction(balance=balance, action=BalanceTransaction.ActionType.TOP_DOWN, amount=amount,
+                                   description=description)
+                for balance, amount, description in deducted
+            ])
 
-        return False
+        return {balance.project_id for balance, amount, description in deducted}
 
 
 class BalanceTransaction(BaseModel, TimestampMixin):
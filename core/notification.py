@@ -1,9 +1,25 @@
+import logging
+from datetime import timedelta
+
+from django.core.mail import get_connection
+from django.db import transaction
 from django.template.loader import render_to_string
+from django.utils import timezone
 
 from core.models import BillingProject, Notification
 
+LOG = logging.getLogger("yuyu")
+
+# Claimed notification will not be picked by other sender until the lease expired
+SEND_LEASE = timedelta(minutes=10)
+RETRY_BACKOFF_SECONDS = 60
+RETRY_BACKOFF_MAX_SECONDS = 3600
+
 
 def send_notification(project, title: str, short_description: str, content: str):
+    """
+    Queue notification, the email will be sent by notification sender
+    """
     notification = Notification(
         project=project,
         title=title,
@@ -11,10 +27,10 @@ def send_notification(project, title: str, short_description: str, content: str)
         content=content,
         sent_status=False,
         is_read=False,
+        next_send_at=timezone.now(),
     )
 
     notification.save()
-    notification.send()
 
 
 def send_notification_from_template(project: BillingProject, title: str, short_description: str, template: str,
@@ -22,3 +38,58 @@ def send_notification_from_template(project: BillingProject, title: str, short_d
     msg_html = render_to_string(template, context=context)
 
     send_notification(project=project, title=title, short_description=short_description, content=msg_html)
+
+
+def get_retry_date(send_attempt):
+    backoff = min(RETRY_BACKOFF_SECONDS * 2 ** (send_attempt - 1), RETRY_BACKOFF_MAX_SECONDS)
+    return timezone.now() + timedelta(seconds=backoff)
+
+
+def send_queued_notifications(batch_size, max_attempt):
+    """
+    Send a batch of queued notification through a single email connection.
+    Failed notification is retried with exponential backoff until it reach max attempt.
+    :param batch_size: Maximum notification sent in this batch
+    :param max_attempt: Maximum send attempt before notification is not queued anymore
+    :return: Number of notification handled in this batch
+    """
+    now = timezone.now()
+    with transaction.atomic():
+        notifications = list(
+            Notification.objects.select_for_update(skip_locked=True)
+            .select_related('project')
+            .filter(next_send_at__lte=now)
+            .order_by('next_send_at')[:batch_size]
+        )
+        Notification.objects.filter(id__in=[n.id for n in notifications]).update(next_send_at=now + SEND_LEASE)
+
+    if not notifications:
+        return 0
+
+    connection = get_connection()
+    try:
+        connection.open()
+    except Exception:
+        LOG.exception("Error opening email connection")
+        connection = None
+
+    try:
+        for notification in notifications:
+            if connection is not None and notification.send(connection=connection):
+                continue
+
+            if connection is None:
+                notification.send_attempt += 1
+
+            if notification.send_attempt >= max_attempt:
+                LOG.error(f"Notification #{notification.id} failed after {notification.send_attempt} attempt")
+                notification.next_send_at = None
+            else:
+                notification.next_send_at = get_retry_date(notification.send_attempt)
+
+            notification.save()
+    finally:
+        if connection is not None:
+            connection.close()
+
+    return len(notifications)
@@ -0,0 +1,56 @@
+from unittest import mock
+
+from django.db import IntegrityError, transaction
+from django.test import TestCase
+from djmoney.money import Money
+
+from core.models import Balance, BillingProject
+
+
+class BalanceForProjectsTest(TestCase):
+    def setUp(self):
+        self.projects = [BillingProject.objects.create(tenant_id=f"tenant-{index}") for index in range(3)]
+        self.project_ids = [project.id for project in self.projects]
+
+    def test_missing_balance_is_created_once(self):
+        balances = Balance.get_balances_for_projects(self.project_ids)
+        balances_again = Balance.get_balances_for_projects(self.project_ids)
+
+        self.assertEqual(Balance.objects.count(), len(self.projects))
+        for project in self.projects:
+            self.assertEqual(balances[project.id].id, balances_again[project.id].id)
+            self.assertEqual(balances[project.id].id, Balance.get_balance_for_project(project).id)
+
+    def test_balance_created_concurrently_is_kept(self):
+        bulk_create = Balance.objects.bulk_create
+        created_by_other = {}
+
+        def create_by_other_process_first(objs, **kwargs):
+            created_by_other['balance'] = Balance.objects.create(project=self.projects[0],
+                                                                 amount=Money(amount=100, currency='IDR'))
+            return bulk_create(objs, **kwargs)
+
+        with mock.patch.object(Balance.objects, 'bulk_create', side_effect=create_by_other_process_first):
+            balances = Balance.get_balances_for_projects(self.project_ids)
+
+        self.assertEqual(Balance.objects.filter(project=self.projects[0]).count(), 1)
+        self.assertEqual(balances[self.projects[0].id].id, created_by_other['balance'].id)
+
+    def test_duplicate_balance_is_rejected(self):
+        Balance.objects.create(project=self.projects[0])
+        with self.assertRaises(IntegrityError), transaction.atomic():
+            Balance.objects.create(project=self.projects[0])
+
+    def test_bulk_top_down_use_the_project_balance(self):
+        balance = Balance.get_balance_for_project(self.projects[0])
+        balance.top_up(Money(amount=100, currency='IDR'), "Top up")
+
+        paid = Balance.bulk_top_down_if_amount_is_good([
+            (self.projects[0].id, Money(amount=60, currency='IDR'), "Invoice"),
+            (self.projects[1].id, Money(amount=60, currency='IDR'), "Invoice"),
+        ])
+
+        balance.refresh_from_db()
+        self.assertEqual(paid, {self.projects[0].id})
+        self.assertEqual(balance.amount, Money(amount=40, currency='IDR'))
+        self.assertEqual(Balance.objects.count(), 2)
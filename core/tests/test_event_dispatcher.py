@@ -0,0 +1,88 @@
+import threading
+from unittest import mock
+
+from django.core.management import call_command, CommandError
+from django.test import SimpleTestCase, override_settings
+from oslo_messaging import NotificationResult
+
+from core.event_dispatcher import KeyedEventDispatcher
+from core.event_endpoint import BatchEventEndpoint
+
+
+def volume_message(tenant_id, volume_id):
+    return {
+        "ctxt": {},
+        "publisher_id": "test",
+        "event_type": "volume.create.end",
+        "payload": {
+            "tenant_id": tenant_id,
+            "volume_id": volume_id,
+            "volume_type": "volume-type",
+            "display_name": volume_id,
+            "size": 1,
+        },
+        "metadata": {},
+    }
+
+
+@mock.patch('core.event_endpoint.get_dynamic_setting', return_value=True)
+class BatchEventDispatcherTest(SimpleTestCase):
+    def setUp(self):
+        self.dispatcher = KeyedEventDispatcher(workers=4, queue_size=10)
+        self.dispatcher.start()
+        self.endpoint = BatchEventEndpoint(self.dispatcher)
+
+    def tearDown(self):
+        self.dispatcher.stop()
+
+    def test_tenants_handled_in_parallel(self, get_dynamic_setting):
+        # Tenant is hashed to its worker, look for tenants that spread over every worker
+        tenants = []
+        index = 0
+        while len(tenants) < 4:
+            tenant_id = f"tenant-{index}"
+            if hash(tenant_id) % 4 not in [hash(tenant) % 4 for tenant in tenants]:
+                tenants.append(tenant_id)
+            index += 1
+
+        # Every tenant wait for the others, so it only pass when all tenants are handled at the same time
+        barrier = threading.Barrier(len(tenants), timeout=5)
+        handled = []
+
+        def handle_events(handler, event_key, events):
+            barrier.wait()
+            handled.append(event_key[0])
+
+        with mock.patch.object(self.endpoint, 'handle_events', side_effect=handle_events):
+            result = self.endpoint.info([volume_message(tenant_id, f"volume-{tenant_id}") for tenant_id in tenants])
+
+        self.assertEqual(result, NotificationResult.HANDLED)
+        self.assertFalse(barrier.broken)
+        self.assertCountEqual(handled, tenants)
+
+    def test_acknowledged_after_handled(self, get_dynamic_setting):
+        release = threading.Event()
+        handled = []
+
+        def handle_events(handler, event_key, events):
+            release.wait(timeout=5)
+            handled.append(event_key)
+
+        with mock.patch.object(self.endpoint, 'handle_events', side_effect=handle_events):
+            listener = threading.Thread(target=self.endpoint.info, args=([volume_message("tenant", "volume")],))
+            listener.start()
+            listener.join(timeout=0.2)
+            self.assertTrue(listener.is_alive())
+
+            release.set()
+            listener.join(timeout=5)
+
+        self.assertFalse(listener.is_alive())
+        self.assertEqual(handled, [("tenant", "volume")])
+
+
+class EventMonitorSettingTest(SimpleTestCase):
+    @override_settings(YUYU_EVENT_WORKERS=4, YUYU_EVENT_BATCH_SIZE=None)
+    def test_workers_require_batch(self):
+        with self.assertRaises(CommandError):
+            call_command('event_monitor')
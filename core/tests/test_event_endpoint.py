@@ -0,0 +1,89 @@
+from django.core.management import call_command
+from django.test import TestCase
+
+from core.event_endpoint import EventEndpoint
+from core.models import BillingProject, Invoice, DynamicSetting, InvoiceVolume
+from core.utils.dynamic_setting import set_dynamic_setting, get_dynamic_setting, BILLING_ENABLED, \
+    DYNAMIC_SETTING_CACHE
+from core.utils.tenant_invoice import TENANT_INVOICE_CACHE
+
+
+def volume_payload(tenant_id, volume_id):
+    return {
+        "tenant_id": tenant_id,
+        "volume_id": volume_id,
+        "volume_type": "volume-type",
+        "display_name": volume_id,
+        "size": 1,
+    }
+
+
+class BillingDisabledEventTest(TestCase):
+    def setUp(self):
+        DYNAMIC_SETTING_CACHE.clear()
+        TENANT_INVOICE_CACHE.clear()
+        set_dynamic_setting(BILLING_ENABLED, True)
+        self.endpoint = EventEndpoint()
+
+    def disable_billing_on_other_process(self):
+        # Cache of this process is only refreshed after the cache check interval
+        get_dynamic_setting(BILLING_ENABLED)
+        DynamicSetting.objects.filter(key=BILLING_ENABLED).update(value="0")
+
+    def test_event_creates_invoice_when_enabled(self):
+        self.endpoint.info({}, "test", "volume.create.end", volume_payload("tenant", "volume"), {})
+
+        invoice = Invoice.objects.get(project__tenant_id="tenant")
+        self.assertEqual(invoice.state, Invoice.InvoiceState.IN_PROGRESS)
+        self.assertTrue(InvoiceVolume.objects.filter(invoice=invoice, volume_id="volume").exists())
+
+    def test_event_after_disable_does_not_create_invoice(self):
+        self.disable_billing_on_other_process()
+
+        self.endpoint.info({}, "test", "volume.create.end", volume_payload("tenant", "volume"), {})
+
+        self.assertFalse(BillingProject.objects.filter(tenant_id="tenant").exists())
+        self.assertFalse(Invoice.objects.exists())
+        self.assertFalse(InvoiceVolume.objects.exists())
+
+    def test_project_created_after_disable_does_not_create_invoice(self):
+        self.disable_billing_on_other_process()
+
+        self.endpoint.info({}, "test", "identity.project.created", {"target": {"id": "tenant"}}, {})
+
+        self.assertFalse(BillingProject.objects.filter(tenant_id="tenant").exists())
+        self.assertFalse(Invoice.objects.exists())
+
+
+class StaleTenantInvoiceTest(TestCase):
+    def setUp(self):
+        DYNAMIC_SETTING_CACHE.clear()
+        TENANT_INVOICE_CACHE.clear()
+        # Test transaction is never committed, cache the invoice right away like a committed event
+        TENANT_INVOICE_CACHE.store_on_commit = False
+        self.addCleanup(setattr, TENANT_INVOICE_CACHE, 'store_on_commit', True)
+        self.addCleanup(TENANT_INVOICE_CACHE.clear)
+        set_dynamic_setting(BILLING_ENABLED, True)
+        self.endpoint = EventEndpoint()
+
+        self.endpoint.info({}, "test", "volume.create.end", volume_payload("tenant", "volume"), {})
+        self.closed_invoice = Invoice.objects.get(project__tenant_id="tenant")
+
+        # Cache invalidation of process_invoice is only done on commit, so the cached invoice is stale
+        call_command('process_invoice')
+        self.closed_invoice.refresh_from_db()
+        self.new_invoice = Invoice.objects.get(project__tenant_id="tenant", state=Invoice.InvoiceState.IN_PROGRESS)
+
+    def test_delete_event_closes_component_of_new_invoice(self):
+        self.assertNotEqual(self.closed_invoice.state, Invoice.InvoiceState.IN_PROGRESS)
+
+        self.endpoint.info({}, "test", "volume.delete.end", volume_payload("tenant", "volume"), {})
+
+        volume = InvoiceVolume.objects.get(invoice=self.new_invoice, volume_id="volume")
+        self.assertIsNotNone(volume.end_date)
+
+    def test_create_event_is_added_to_new_invoice(self):
+        self.endpoint.info({}, "test", "volume.create.end", volume_payload("tenant", "other-volume"), {})
+
+        self.assertTrue(InvoiceVolume.objects.filter(invoice=self.new_invoice, volume_id="other-volume").exists())
+        self.assertFalse(InvoiceVolume.objects.filter(invoice=self.closed_invoice, volume_id="other-volume").exists())
@@ -0,0 +1,38 @@
+from datetime import timedelta
+
+from django.core.management import call_command
+from django.test import TestCase
+from django.utils import timezone
+
+from core.models import BillingProject, BillingRun, Invoice
+from core.utils.dynamic_setting import set_dynamic_setting, BILLING_ENABLED, INVOICE_TAX, DYNAMIC_SETTING_CACHE
+
+
+class ResumeBillingRunTest(TestCase):
+    def setUp(self):
+        DYNAMIC_SETTING_CACHE.clear()
+        set_dynamic_setting(BILLING_ENABLED, True)
+
+        close_date = timezone.now() - timedelta(hours=1)
+        self.billing_run = BillingRun.objects.create(
+            period=close_date.replace(day=1, hour=0, minute=0, second=0, microsecond=0),
+            close_date=close_date,
+            tax_percentage=10,
+            state=BillingRun.RunState.RUNNING,
+        )
+        project = BillingProject.objects.create(tenant_id="tenant")
+        self.invoice = Invoice.objects.create(project=project, start_date=close_date - timedelta(days=1),
+                                              state=Invoice.InvoiceState.IN_PROGRESS)
+
+    def test_resumed_run_keeps_tax_percentage(self):
+        # Tax changed after the run is interrupted
+        set_dynamic_setting(INVOICE_TAX, 20)
+
+        call_command('process_invoice', resume=True)
+
+        self.invoice.refresh_from_db()
+        self.billing_run.refresh_from_db()
+        self.assertNotEqual(self.invoice.state, Invoice.InvoiceState.IN_PROGRESS)
+        self.assertEqual(self.invoice.tax_percentage, 10)
+        self.assertEqual(self.billing_run.tax_percentage, 10)
+        self.assertEqual(self.billing_run.state, BillingRun.RunState.FINISHED)
@@ -0,0 +1,136 @@
+import csv
+import json
+
+import dateutil.parser
+import pytz
+from django.db.models import F, Q, Value, DateTimeField
+from django.db.models.functions import Coalesce
+from django.utils import timezone
+
+from core.component import component
+from core.component.component import INVOICE_COMPONENT_MODEL
+from core.utils.price_aggregation import annotate_price_charged, HoursBetween, PRICE_CHARGED_FIELD
+
+EXPORT_CSV = "csv"
+EXPORT_NDJSON = "ndjson"
+EXPORT_FORMATS = [EXPORT_CSV, EXPORT_NDJSON]
+
+# Rows fetched from database at once
+EXPORT_CHUNK_SIZE = 2000
+
+"""
+Price dependency field of every component, empty when the component does not depend on it
+"""
+PRICE_DEPENDENCY_FIELDS = list(dict.fromkeys(
+    field for handler in component.INVOICE_HANDLER.values() for field in handler.PRICE_DEPENDENCY_FIELDS
+))
+
+USAGE_FIELDS = [
+    'id', 'resource_id', 'tenant_id', 'invoice_id', 'start_date', 'end_date', 'usage_hours',
+    'hourly_price', 'monthly_price', 'price_charged', 'currency',
+]
+
+EXPORT_FIELDS = ['label'] + USAGE_FIELDS + PRICE_DEPENDENCY_FIELDS
+
+
+def parse_time(time):
+    dt = dateutil.parser.isoparse(time)
+    if not dt.tzinfo:
+        return pytz.UTC.localize(dt=dt)
+
+    return dt
+
+
+def get_date_range(start=None, end=None):
+    """
+    Parse the export date range, default to the current invoice period
+    :param start: Start date in ISO 8601, default to the first day of current month
+    :param end: End date in ISO 8601, default to current time
+    :return: Tuple of start and end datetime
+    """
+    now = timezone.now()
+    start = parse_time(start) if start else now.replace(day=1, hour=0, minute=0, second=0, microsecond=0)
+    end = parse_time(end) if end else now
+    if start >= end:
+        raise ValueError("start must be before end")
+
+    return start, end
+
+
+class Echo(object):
+    """
+    File like object that return the written value, so csv.writer can be used to build streamed line
+    """
+
+    def write(self, value):
+        return value
+
+
+def iter_usage(start, end, tenant_id=None, now=None):
+    """
+    Iterate every invoice component used within the date range, with price calculated by database.
+    Rows are read in chunk, so the memory stays constant whatever the number of row.
+    :param start: Start of the date range
+    :param end: End of the date range, exclusive
+    :param tenant_id: Only export component of this tenant
+    :param now: Date used as end date for active component, default to current time
+    :return: Generator of dict with EXPORT_FIELDS
+    """
+    if now is None:
+        now = timezone.now()
+
+    for label, model in INVOICE_COMPONENT_MODEL.items():
+        handler = component.INVOICE_HANDLER[label]
+        queryset = model.objects.filter(Q(end_date=None) | Q(end_date__gt=start), start_date__lt=end)
+        if tenant_id:
+            queryset = queryset.filter(invoice__project__tenant_id=tenant_id)
+
+        dependency_fields = handler.PRICE_DEPENDENCY_FIELDS
+        adjusted_end_date = Coalesce(F('end_date'), Value(now, output_field=DateTimeField()))
+        rows = annotate_price_charged(queryset, now).annotate(
+            _usage_hours=HoursBetween(F('start_date'), adjusted_end_date),
+        ).order_by('id').values_list(
+            'id', handler.KEY_FIELD, 'invoice__project__tenant_id', 'invoice_id', 'start_date', 'end_date',
+            '_usage_hours', 'hourly_price', 'monthly_price', PRICE_CHARGED_FIELD, 'hourly_price_currency',
+            *dependency_fields
+        )
+
+        for row in rows.iterator(chunk_size=EXPORT_CHUNK_SIZE):
+            usage = dict.fromkeys(PRICE_DEPENDENCY_FIELDS)
+            usage.update(zip(USAGE_FIELDS + dependency_fields, row))
+            usage['label'] = label
+            yield usage
+
+
+def format_value(value):
+    if value is None:
+        return ''
+    if hasattr(value, 'isoformat'):
+        return value.isoformat()
+
+    return str(value)
+
+
+def iter_csv(usages):
+    writer = csv.writer(Echo())
+    yield writer.writerow(EXPORT_FIELDS)
+    for usage in usages:
+        yield writer.writerow([format_value(usage[field]) for field in EXPORT_FIELDS])
+
+
+def iter_ndjson(usages):
+    for usage in usages:
+        yield json.dumps({field: usage[field] for field in EXPORT_FIELDS}, default=format_value) + '\n'
+
+
+def iter_export(usages, export_format):
+    """
+    Serialize usages line by line
+    :param usages: Iterable from iter_usage()
+    :param export_format: EXPORT_CSV or EXPORT_NDJSON
+    :return: Generator of line
+    """
+    if export_format == EXPORT_NDJSON:
+        return iter_ndjson(usages)
+
+    return iter_csv(usages)
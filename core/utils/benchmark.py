@@ -0,0 +1,265 @@
+import functools
+import json
+import math
+import random
+import time
+import uuid
+from contextlib import contextmanager
+from datetime import timedelta
+
+from django.db import connection, transaction
+from djmoney.money import Money
+
+from core.component import component, labels
+from core.component.component import INVOICE_COMPONENT_MODEL
+from core.models import FlavorPrice, VolumePrice, FloatingIpsPrice, RouterPrice, SnapshotPrice, ImagePrice, \
+    BillingProject, Invoice, Balance
+from yuyu import settings
+
+BENCH_FLAVORS = ['bench.small', 'bench.large']
+BENCH_VOLUME_TYPE = 'bench-ssd'
+
+
+class QueryCounter(object):
+    """
+    Count executed query on default connection, work without DEBUG
+    """
+
+    def __init__(self):
+        self.count = 0
+
+    def __call__(self, execute, sql, params, many, context):
+        self.count += 1
+        return execute(sql, params, many, context)
+
+    @contextmanager
+    def count_queries(self):
+        with connection.execute_wrapper(self):
+            yield self
+
+
+class PhaseTimer(object):
+    """
+    Measure time and query count of benchmark phases
+    """
+
+    def __init__(self, query_counter):
+        self.query_counter = query_counter
+        self.phases = {}
+
+    @contextmanager
+    def phase(self, name):
+        phase_start = time.perf_counter()
+        queries = self.query_counter.count
+        try:
+            yield
+        finally:
+            phase = self.phases.setdefault(name, {"calls": 0, "seconds": 0, "queries": 0})
+            phase["calls"] += 1
+            phase["seconds"] += time.perf_counter() - phase_start
+            phase["queries"] += self.query_counter.count - queries
+
+    @contextmanager
+    def instrument(self, targets):
+        """
+        Temporarily wrap functions so every call is measured in its phase
+        :param targets: List of (phase name, object, attribute name)
+        """
+        originals = []
+        for name, obj, attribute in targets:
+            originals.append((obj, attribute, vars(obj).get(attribute)))
+            setattr(obj, attribute, self._wrap(name, getattr(obj, attribute)))
+
+        try:
+            yield self
+        finally:
+            for obj, attribute, original in reversed(originals):
+                if original is None:
+                    delattr(obj, attribute)
+                else:
+                    setattr(obj, attribute, original)
+
+    def _wrap(self, name, func):
+        @functools.wraps(func)
+        def wrapper(*args, **kwargs):
+            with self.phase(name):
+                return func(*args, **kwargs)
+
+        return wrapper
+
+    def summary(self, total_seconds):
+        return {
+            name: {
+                "calls": phase["calls"],
+                "seconds": round(phase["seconds"], 3),
+                "queries": phase["queries"],
+                "share": round(phase["seconds"] / total_seconds, 3) if total_seconds else 0,
+            }
+            for name, phase in self.phases.items()
+        }
+
+
+class Rollback(Exception):
+    pass
+
+
+@contextmanager
+def throwaway_transaction(keep=False):
+    """
+    Run benchmark inside transaction that is rolled back at the end, so the database is left untouched
+    :param keep: Commit the data instead, only use it on throwaway database
+    """
+    try:
+        with transaction.atomic():
+            yield
+            if not keep:
+                raise Rollback()
+    except Rollback:
+        pass
+
+
+def percentile(values, percent):
+    """
+    Nearest rank percentile
+    :param values: List of number
+    :param percent: Percentile between 0 and 100
+    :return: The percentile value, 0 if values is empty
+    """
+    if not values:
+        return 0
+
+    values = sorted(values)
+    rank = max(math.ceil(percent / 100 * len(values)), 1)
+    return values[rank - 1]
+
+
+def summarize_latency(latencies):
+    """
+    Summarize latency in seconds into milliseconds
+    :param latencies: List of latency in seconds
+    :return: Dict of p50, p99 and max in milliseconds
+    """
+    return {
+        "p50_ms": round(percentile(latencies, 50) * 1000, 3),
+        "p99_ms": round(percentile(latencies, 99) * 1000, 3),
+        "max_ms": round(max(latencies, default=0) * 1000, 3),
+    }
+
+
+def write_result(result, path):
+    """
+    Write machine readable benchmark result as JSON
+    :param result: Result dict
+    :param path: File path
+    """
+    with open(path, 'w') as result_file:
+        json.dump(result, result_file, indent=2, default=str)
+
+
+def prepare_prices():
+    """
+    Create price used by benchmark data if not exist
+    """
+    for flavor_id in BENCH_FLAVORS:
+        FlavorPrice.objects.get_or_create(flavor_id=flavor_id, defaults={
+            "hourly_price": Money(amount=100, currency=settings.DEFAULT_CURRENCY),
+            "monthly_price": Money(amount=50000, currency=settings.DEFAULT_CURRENCY),
+        })
+    VolumePrice.objects.get_or_create(volume_type_id=BENCH_VOLUME_TYPE, defaults={
+        "hourly_price": Money(amount=5, currency=settings.DEFAULT_CURRENCY),
+    })
+    for price_model in [FloatingIpsPrice, RouterPrice, SnapshotPrice, ImagePrice]:
+        if not price_model.objects.exists():
+            price_model.objects.create(
+                hourly_price=Money(amount=10, currency=settings.DEFAULT_CURRENCY),
+                monthly_price=Money(amount=5000, currency=settings.DEFAULT_CURRENCY),
+            )
+
+
+def new_id():
+    return str(uuid.uuid4())
+
+
+"""
+Synthetic component field for every invoice component label
+"""
+COMPONENT_FACTORY = {
+    labels.LABEL_INSTANCES: lambda: {
+        "instance_id": new_id(), "flavor_id": random.choice(BENCH_FLAVORS), "name": "bench-instance",
+    },
+    labels.LABEL_VOLUMES: lambda: {
+        "volume_id": new_id(), "volume_type_id": BENCH_VOLUME_TYPE, "volume_name": "bench-volume",
+        "space_allocation_gb": random.choice([10, 20, 50, 100]),
+    },
+    labels.LABEL_FLOATING_IPS: lambda: {
+        "fip_id": new_id(), "ip": f"10.0.{random.randint(0, 255)}.{random.randint(1, 254)}",
+    },
+    labels.LABEL_ROUTERS: lambda: {
+        "router_id": new_id(), "name": "bench-router",
+    },
+    labels.LABEL_SNAPSHOTS: lambda: {
+        "snapshot_id": new_id(), "name": "bench-snapshot", "space_allocation_gb": random.choice([10, 20]),
+    },
+    labels.LABEL_IMAGES: lambda: {
+        "image_id": new_id(), "name": "bench-image", "space_allocation_gb": random.choice([1, 2.5]),
+    },
+}
+
+
+def seed_cloud(projects, resources, start_date, end_date):
+    """
+    Seed synthetic cloud with in progress invoice, prepare_prices() must be called first.
+    Every project has mixed component type, some of them is already closed, and a balance.
+    :param projects: Number of project
+    :param resources: Number of component for every project
+    :param start_date: Start date of the invoice
+    :param end_date: Latest start and end date of the component
+    :return: List of in progress invoice
+    """
+    prices = {
+        label: handler.get_price(COMPONENT_FACTORY[label]())
+        for label, handler in component.INVOICE_HANDLER.items()
+    }
+    period_hours = int((end_date - start_date).total_seconds() // 3600)
+
+    invoices = []
+    component_rows = {label: [] for label in INVOICE_COMPONENT_MODEL}
+    for _ in range(projects):
+        # Created one by one, bulk_create does not return id on every database
+        project = BillingProject.objects.create(tenant_id=f'bench-{new_id()}')
+        Balance.objects.create(project=project, amount=Money(amount=random.choice([0, 10 ** 9]),
+                                                             currency=settings.DEFAULT_CURRENCY))
+        invoice = Invoice.objects.create(project=project, start_date=start_date,
+                                         state=Invoice.InvoiceState.IN_PROGRESS)
+        invoices.append(invoice)
+
+        closed_subtotal = 0
+        for _ in range(resources):
+            label = random.choice(labels.INVOICE_COMPONENT_LABELS)
+            price = prices[label]
+
+            # Half of the resources run the whole month, so they use monthly price
+            row_start = start_date
+            if random.random() < 0.5:
+                row_start += timedelta(hours=random.randint(0, period_hours - 1), minutes=random.randint(0, 59))
+            row_end = None
+            if random.random() < 0.2:
+                row_end = row_start + timedelta(hours=random.randint(1, 48))
+                row_end = min(row_end, end_date)
+
+            row = INVOICE_COMPONENT_MODEL[label](
+                invoice=invoice, start_date=row_start, end_date=row_end,
+                hourly_price=price.hourly_price, monthly_price=price.monthly_price,
+                **COMPONENT_FACTORY[label]()
+            )
+            if row_end:
+                closed_subtotal += row.price_charged
+            component_rows[label].append(row)
+
+        if closed_subtotal:
+            Invoice.add_closed_subtotal(invoice.id, closed_subtotal)
+
+    for label, rows in component_rows.items():
+        INVOICE_COMPONENT_MODEL[label].objects.bulk_create(rows, batch_size=1000)
+
+    return list(Invoice.objects.filter(id__in=[invoice.id for invoice in invoices]).order_by('id'))
@@ -1,6 +1,9 @@
 import json
 
+from django.db.models.signals import post_save, post_delete
+
 from core.models import DynamicSetting
+from core.utils.version_cache import VersionCache
 
 BILLING_ENABLED = "billing_enabled"
 INVOICE_TAX = "invoice_tax"
@@ -22,6 +25,8 @@ DEFAULTS = {
     HOW_TO_TOP_UP: 'Please Contact Administrator'
 }
 
+DYNAMIC_SETTING_CACHE = VersionCache("dynamic_setting")
+
 
 def _get_casted_value(setting: DynamicSetting):
     if setting.type == DynamicSetting.DataType.JSON:
@@ -36,9 +41,18 @@ def _get_casted_value(setting: DynamicSetting):
         raise ValueError("Type not supported")
 
 
+def _get_cached_settings():
+    """
+    All setting row keyed by setting key, cached until any setting is changed
+    """
+    return DYNAMIC_SETTING_CACHE.get(
+        "all", lambda: {setting.key: setting for setting in DynamicSetting.objects.all()}
+    )
+
+
 def get_dynamic_settings():
     result = DEFAULTS.copy()
-    settings = DynamicSetting.objects.all()
+    settings = _get_cached_settings().values()
     for setting in settings:
         result[setting.key] = _get_casted_value(setting)
 
@@ -46,13 +60,25 @@ def get_dynamic_settings():
 
 
 def get_dynamic_setting(key):
-    setting: DynamicSetting = DynamicSetting.objects.filter(key=key).first()
+    setting: DynamicSetting = _get_cached_settings().get(key)
     if not setting:
         return DEFAULTS[key]
 
     return setting.value
 
 
+def get_fresh_dynamic_setting(key):
+    """
+    Read casted setting from database without the cache,
+    for decision that must not use value changed by other process within the cache check interval
+    """
+    setting: DynamicSetting = DynamicSetting.objects.filter(key=key).first()
+    if not setting:
+        return DEFAULTS[key]
+
+    return _get_casted_value(setting)
+
+
 def set_dynamic_setting(key, value):
     if type(value) is dict:
         inserted_value = json.dumps(value)
@@ -70,7 +96,20 @@ def set_dynamic_setting(key, value):
         print("SETTING TAB = ", type(value))
         raise ValueError("Type not supported")
 
+    # Cache is invalidated by post_save signal
     DynamicSetting.objects.update_or_create(key=key, defaults={
         "value": inserted_value,
         "type": data_type
     })
+
+
+def invalidate_dynamic_setting(sender, **kwargs):
+    DYNAMIC_SETTING_CACHE.invalidate()
+
+
+def connect_dynamic_setting_signals():
+    """
+    Invalidate dynamic setting cache whenever setting is saved or deleted
+    """
+    post_save.connect(invalidate_dynamic_setting, sender=DynamicSetting, dispatch_uid='dynamic_setting_save')
+    post_delete.connect(invalidate_dynamic_setting, sender=DynamicSetting, dispatch_uid='dynamic_setting_delete')
@@ -1,10 +1,13 @@
 import math
 
-from django.db import models
+from django.db import models, transaction
 from django.utils import timezone
 from djmoney.models.fields import MoneyField
+from djmoney.money import Money
 from django.utils.timesince import timesince
 
+from core.utils.price_aggregation import PRICE_CHARGED_FIELD
+
 
 class BaseModel(models.Model):
     class Meta:
@@ -71,6 +74,17 @@ class InvoiceComponentMixin(TimestampMixin, PriceMixin):
 
         return self.hourly_price * hour_passes
 
+    @property
+    def annotated_price_charged(self):
+        """
+        Price charged annotated by annotate_price_charged(), calculated on the fly when the row is not annotated
+        """
+        amount = getattr(self, PRICE_CHARGED_FIELD, None)
+        if amount is None:
+            return self.price_charged
+
+        return Money(amount=amount, currency=self.hourly_price_currency)
+
     @property
     def usage_time(self):
         usage = self.adjusted_end_date - self.start_date
@@ -84,10 +98,14 @@ class InvoiceComponentMixin(TimestampMixin, PriceMixin):
 
     def close(self, date):
         """
-        Close component the component
+        Close component the component and add its price to the invoice ledger
         """
-        self.end_date = date
-        self.save()
+        with transaction.atomic():
+            self.end_date = date
+            self.save()
+
+            invoice_model = self._meta.get_field('invoice').related_model
+            invoice_model.add_closed_subtotal(self.invoice_id, self.price_charged)
 
     class Meta:
         abstract = True
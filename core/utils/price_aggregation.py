@@ -0,0 +1,194 @@
+from django.conf import settings
+from django.db.models import Case, When, F, Q, Sum, Value, Func, DateTimeField, DecimalField, IntegerField, \
+    ExpressionWrapper, Count, OuterRef, Subquery, Prefetch
+from django.db.models.functions import Coalesce, ExtractDay, ExtractMonth, Ceil, Cast
+from django.utils import timezone
+from djmoney.money import Money
+
+PRICE_CHARGED_FIELD = "price_charged_amount"
+
+"""
+Aggregate of every component label annotated on invoice by annotate_invoice_components()
+"""
+COMPONENT_COUNT = "count"
+COMPONENT_PRICE = "price"
+COMPONENT_ACTIVE_PRICE = "active_price"
+
+
+def get_component_annotation(label, aggregate):
+    """
+    Get annotation name of a component label aggregate, prefixed so it does not clash with invoice property
+    :param label: Invoice component label
+    :param aggregate: COMPONENT_COUNT, COMPONENT_PRICE or COMPONENT_ACTIVE_PRICE
+    :return: Annotation name
+    """
+    return f"_{label}_{aggregate}"
+
+
+class HoursBetween(Func):
+    """
+    Hour passes between two datetime expression, rounded up.
+    Same as math.ceil((end - start).total_seconds() / 3600) in InvoiceComponentMixin.price_charged
+    """
+    output_field = IntegerField()
+
+    def as_sql(self, compiler, connection, **extra_context):
+        start, end = self.get_source_expressions()
+        diff_sql, diff_params = connection.ops.subtract_temporals(
+            'DateTimeField', compiler.compile(end), compiler.compile(start)
+        )
+        if connection.features.has_native_duration_field:
+            # Subtraction result is an interval, convert it to microseconds like the other backend
+            diff_sql = 'EXTRACT(EPOCH FROM %s) * 1000000' % diff_sql
+
+        return 'CEILING(%s / 3600000000.0)' % diff_sql, diff_params
+
+
+def has_space_allocation(model):
+    return any(field.name == 'space_allocation_gb' for field in model._meta.get_fields())
+
+
+def annotate_price_charged(queryset, now=None):
+    """
+    Annotate invoice component queryset with price charged calculated by database.
+    The result is on PRICE_CHARGED_FIELD and equal to InvoiceComponentMixin.price_charged amount.
+    :param queryset: Queryset of invoice component model
+    :param now: Date used as end date for active component, default to current time
+    :return: Annotated queryset
+    """
+    if now is None:
+        now = timezone.now()
+
+    adjusted_end_date = Coalesce(F('end_date'), Value(now, output_field=DateTimeField()))
+    queryset = queryset.annotate(
+        _start_day=ExtractDay('start_date'),
+        _start_month=ExtractMonth('start_date'),
+        _end_day=ExtractDay(adjusted_end_date),
+        _end_month=ExtractMonth(adjusted_end_date),
+    )
+
+    # Using monthly price when component is used for a full month
+    use_monthly_price = Q(_start_day=1, _end_day=1, monthly_price__isnull=False) \
+        & ~Q(_start_month=F('_end_month')) & ~Q(monthly_price=0)
+
+    price = Case(
+        When(use_monthly_price, then=F('monthly_price')),
+        default=ExpressionWrapper(
+            F('hourly_price') * HoursBetween(F('start_date'), adjusted_end_date),
+            output_field=DecimalField()
+        ),
+        output_field=DecimalField(),
+    )
+
+    if has_space_allocation(queryset.model):
+        price = ExpressionWrapper(
+            price * Cast(Ceil(F('space_allocation_gb')), IntegerField()),
+            output_field=DecimalField()
+        )
+
+    return queryset.annotate(**{PRICE_CHARGED_FIELD: price})
+
+
+def sum_price_charged(queryset, now=None):
+    """
+    Sum price charged of invoice component queryset in a single grouped query
+    :param queryset: Queryset of invoice component model
+    :param now: Date used as end date for active component, default to current time
+    :return: Total price as Money
+    """
+    rows = annotate_price_charged(queryset, now) \
+        .order_by() \
+        .values('hourly_price_currency') \
+        .annotate(total=Sum(PRICE_CHARGED_FIELD))
+
+    sum_of_price = sum([
+        Money(amount=row['total'], currency=row['hourly_price_currency']) for row in rows if row['total'] is not None
+    ])
+
+    return sum_of_price or Money(amount=0, currency=settings.DEFAULT_CURRENCY)
+
+
+def sum_price_charged_by_label(component_models, now=None, **filters):
+    """
+    Sum price charged for every invoice component model
+    :param component_models: Dict of label and invoice component model, e.g. INVOICE_COMPONENT_MODEL
+    :param now: Date used as end date for active component, default to current time
+    :param filters: Filter applied to every component queryset
+    :return: Dict of label and total price as Money
+    """
+    if now is None:
+        now = timezone.now()
+
+    return {
+        label: sum_price_charged(model.objects.filter(**filters), now)
+        for label, model in component_models.items()
+    }
+
+
+def annotate_invoice_components(queryset, component_models, aggregates=None, now=None):
+    """
+    Annotate invoice queryset with aggregates of every component label in one query,
+    so they are read by Invoice.subtotal, Invoice.total_resource and the price properties without query.
+    Price is in default currency.
+    :param queryset: Queryset of invoice
+    :param component_models: Dict of label and invoice component model, e.g. INVOICE_COMPONENT_MODEL
+    :param aggregates: List of COMPONENT_COUNT, COMPONENT_PRICE and COMPONENT_ACTIVE_PRICE, default to all of them
+    :param now: Date used as end date for active component, default to current time
+    :return: Annotated queryset
+    """
+    if aggregates is None:
+        aggregates = [COMPONENT_COUNT, COMPONENT_PRICE, COMPONENT_ACTIVE_PRICE]
+    if now is None:
+        now = timezone.now()
+
+    annotations = {}
+    for label, model in component_models.items():
+        components = model.objects.filter(invoice=OuterRef('pk'))
+        for aggregate in aggregates:
+            if aggregate == COMPONENT_COUNT:
+                count = components.order_by().values('invoice').annotate(total=Count('pk')).values('total')
+                annotations[get_component_annotation(label, aggregate)] = Coalesce(Subquery(count), 0)
+                continue
+
+            aggregated_components = components.filter(end_date=None) \
+                if aggregate == COMPONENT_ACTIVE_PRICE else components
+            price = annotate_price_charged(aggregated_components, now) \
+                .order_by() \
+                .values('invoice') \
+                .annotate(total=Sum(PRICE_CHARGED_FIELD)) \
+                .values('total')
+            annotations[get_component_annotation(label, aggregate)] = Coalesce(
+                Subquery(price, output_field=DecimalField()), Value(0), output_field=DecimalField()
+            )
+
+    return queryset.annotate(**annotations)
+
+
+def get_component_prefetches(component_models, now=None, **filters):
+    """
+    Prefetch of every invoice component relation with annotated price charged, ordered by id
+    :param component_models: Dict of label and invoice component model, e.g. INVOICE_COMPONENT_MODEL
+    :param now: Date used as end date for active component, default to current time
+    :param filters: Filter applied to every component queryset
+    :return: List of Prefetch
+    """
+    if now is None:
+        now = timezone.now()
+
+    return [
+        Prefetch(label, queryset=annotate_price_charged(model.objects.filter(**filters).order_by('id'), now))
+        for label, model in component_models.items()
+    ]
+
+
+def prefetch_invoice_components(queryset, component_models, now=None, **filters):
+    """
+    Prefetch every component of invoice queryset with annotated price charged, one query for every label.
+    Invoice aggregates are calculated from the prefetched components.
+    :param queryset: Queryset of invoice
+    :param component_models: Dict of label and invoice component model, e.g. INVOICE_COMPONENT_MODEL
+    :param now: Date used as end date for active component, default to current time
+    :param filters: Filter applied to every component queryset
+    :return: Queryset with prefetch
+    """
+    return queryset.prefetch_related(*get_component_prefetches(component_models, now, **filters))
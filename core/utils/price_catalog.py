@@ -0,0 +1,49 @@
+from django.db.models.signals import post_save, post_delete
+
+from core.utils.version_cache import VersionCache
+
+PRICE_CATALOG_CACHE = VersionCache("price_catalog")
+
+
+def get_price(price_model, **filters):
+    """
+    Get first price that match the filter, cached until any price is changed.
+    :param price_model: Price model, e.g. FlavorPrice
+    :param filters: Price dependency filter, e.g. flavor_id
+    :return: Price instance or None if not found
+    """
+    return PRICE_CATALOG_CACHE.get(get_cache_key(price_model, filters),
+                                   lambda: price_model.objects.filter(**filters).first())
+
+
+def preload_prices(price_model, *fields):
+    """
+    Load every price of the price model into the catalog with a single query,
+    so get_price() filtered by the fields is served without query
+    :param price_model: Price model, e.g. FlavorPrice
+    :param fields: Price dependency field used as filter of get_price(), e.g. flavor_id
+    """
+    # Ordered like first() so the same price is picked when there is duplicate
+    for price in price_model.objects.order_by('pk'):
+        filters = {field: getattr(price, field) for field in fields}
+        PRICE_CATALOG_CACHE.get(get_cache_key(price_model, filters), lambda: price)
+
+
+def get_cache_key(price_model, filters):
+    return price_model.__name__, tuple(sorted(filters.items()))
+
+
+def invalidate_price_catalog(sender, **kwargs):
+    PRICE_CATALOG_CACHE.invalidate()
+
+
+def connect_price_signals(price_models):
+    """
+    Invalidate price catalog whenever price is saved or deleted
+    :param price_models: List of price model
+    """
+    for price_model in price_models:
+        post_save.connect(invalidate_price_catalog, sender=price_model,
+                          dispatch_uid=f'price_catalog_save_{price_model.__name__}')
+        post_delete.connect(invalidate_price_catalog, sender=price_model,
+                            dispatch_uid=f'price_catalog_delete_{price_model.__name__}')
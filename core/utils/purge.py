@@ -0,0 +1,138 @@
+import logging
+
+from django.db import connection, transaction
+
+LOG = logging.getLogger("yuyu")
+
+# Maximum row deleted by one DELETE statement
+PURGE_CHUNK_SIZE = 10000
+
+
+class PurgeTable(object):
+    """
+    Table deleted by the purge
+    :param model: Model of the table
+    :param not_null_field: Only delete row where this foreign key is set, None to delete every row
+    """
+
+    def __init__(self, model, not_null_field=None):
+        self.model = model
+        self.not_null_field = not_null_field
+
+    @property
+    def is_whole_table(self):
+        return self.not_null_field is None
+
+    def get_queryset(self):
+        queryset = self.model.objects.all()
+        if self.not_null_field:
+            queryset = queryset.filter(**{f"{self.not_null_field}__isnull": False})
+
+        return queryset
+
+    def get_delete_sql(self, upper_bound):
+        quote_name = connection.ops.quote_name
+        pk = quote_name(self.model._meta.pk.column)
+        sql = f"DELETE FROM {quote_name(self.model._meta.db_table)} WHERE {pk} >= %s"
+        if upper_bound is not None:
+            sql += f" AND {pk} < %s"
+        if self.not_null_field:
+            sql += f" AND {quote_name(self.model._meta.get_field(self.not_null_field).column)} IS NOT NULL"
+
+        return sql
+
+
+def get_referencing_models(model):
+    """
+    Model that has foreign key to the model
+    """
+    return {
+        field.related_model for field in model._meta.get_fields(include_hidden=True)
+        if field.auto_created and not field.concrete and (field.one_to_many or field.one_to_one)
+    }
+
+
+class Purger(object):
+    """
+    Delete tables bottom-up without loading the rows.
+    Django's delete() collects every cascaded row in memory first, purge delete with set-based DELETE in bounded
+    primary key chunk instead, or TRUNCATE when the backend support it and the whole table family is purged.
+    Every chunk is committed on its own, so the purge can be run again after it stopped in the middle.
+    """
+
+    def __init__(self, tables, chunk_size=PURGE_CHUNK_SIZE, on_progress=None):
+        """
+        :param tables: List of PurgeTable, a row must be deleted before the row it refers to
+        :param chunk_size: Maximum row deleted by one statement
+        :param on_progress: Called with number of deleted row after every statement
+        """
+        self.tables = tables
+        self.chunk_size = chunk_size
+        self.on_progress = on_progress
+        self.whole_table_models = {table.model for table in tables if table.is_whole_table}
+
+    def count(self):
+        """
+        :return: Number of row that will be deleted
+        """
+        return sum(table.get_queryset().count() for table in self.tables)
+
+    def run(self):
+        for table in self.tables:
+            truncated_models = self.get_truncated_models(table)
+            if truncated_models:
+                self.truncate(table, truncated_models)
+            else:
+                self.delete_in_chunk(table)
+
+    def get_truncated_models(self, table):
+        """
+        TRUNCATE must include every table referencing the truncated table,
+        so it is only used when all of them is also purged as a whole
+        :return: Models truncated together with the table, None if it can not be truncated
+        """
+        if connection.vendor != 'postgresql' or not table.is_whole_table:
+            return None
+
+        models = [table.model]
+        for model in models:
+            for referencing_model in get_referencing_models(model):
+                if referencing_model not in self.whole_table_models:
+                    return None
+                if referencing_model not in models:
+                    models.append(referencing_model)
+
+        return models
+
+    def truncate(self, table, models):
+        quote_name = connection.ops.quote_name
+        with transaction.atomic():
+            deleted = table.get_queryset().count()
+            with connection.cursor() as cursor:
+                cursor.execute("TRUNCATE " + ", ".join(quote_name(model._meta.db_table) for model in models))
+
+        LOG.info(f"Purged {deleted} {table.model.__name__} with truncate")
+        self.report(deleted)
+
+    def delete_in_chunk(self, table):
+        pks = table.get_queryset().order_by('pk').values_list('pk', flat=True)
+        lower_bound = pks.first()
+        deleted = 0
+        while lower_bound is not None:
+            # Primary key of the first row of the next chunk, the index is walked instead of loading the rows
+            upper_bound = pks.filter(pk__gte=lower_bound)[self.chunk_size:self.chunk_size + 1].first()
+            params = [lower_bound] if upper_bound is None else [lower_bound, upper_bound]
+            with transaction.atomic():
+                with connection.cursor() as cursor:
+                    cursor.execute(table.get_delete_sql(upper_bound), params)
+                    chunk_deleted = cursor.rowcount
+
+            deleted += chunk_deleted
+            self.report(chunk_deleted)
+            lower_bound = upper_bound
+
+        LOG.info(f"Purged {deleted} {table.model.__name__}")
+
+    def report(self, deleted):
+        if self.on_progress and deleted:
+            self.on_progress(deleted)
@@ -0,0 +1,33 @@
+from django.conf import settings
+
+from core.utils.version_cache import VersionCache
+
+# Tenant id and the (project id, invoice id) of its in progress invoice
+# Invoice created by the loader is only cached after it is committed
+TENANT_INVOICE_CACHE = VersionCache("tenant_invoice", max_size=settings.YUYU_TENANT_INVOICE_CACHE_SIZE,
+                                    ttl=settings.YUYU_TENANT_INVOICE_CACHE_TTL, store_on_commit=True)
+
+
+def get_tenant_invoice(tenant_id, loader):
+    """
+    Get cached project id and in progress invoice id of the tenant
+    :param tenant_id: Tenant id
+    :param loader: Function that return (project id, invoice id) when not cached
+    :return: Tuple of project id and invoice id
+    """
+    return TENANT_INVOICE_CACHE.get(tenant_id, loader)
+
+
+def drop_tenant_invoice(tenant_id):
+    """
+    Drop stale cached invoice of the tenant on this process, the next read load it again
+    :param tenant_id: Tenant id
+    """
+    TENANT_INVOICE_CACHE.delete(tenant_id)
+
+
+def invalidate_tenant_invoice():
+    """
+    Invalidate tenant invoice on all process, must be called whenever in progress invoice is closed or deleted
+    """
+    TENANT_INVOICE_CACHE.invalidate()
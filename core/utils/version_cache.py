@@ -0,0 +1,123 @@
+import threading
+import time
+from collections import OrderedDict
+
+from django.conf import settings
+from django.db import transaction
+from django.db.models import F
+
+from core.models import CacheVersion
+
+
+class VersionCache(object):
+    """
+    Process local cache that is invalidated across process with version stamp.
+
+    The version is saved on CacheVersion table and bumped by invalidate().
+    Version is checked at most every YUYU_CACHE_CHECK_INTERVAL seconds, so cached read only cost
+    one small query per interval instead of one query per read.
+
+    Cache can be bounded with max_size, least recently used value is evicted first,
+    and every value can be expired after ttl seconds.
+    """
+
+    def __init__(self, key, max_size=None, ttl=None, store_on_commit=False):
+        """
+        :param key: Key of the version on CacheVersion table
+        :param max_size: Maximum cached value
+        :param ttl: Seconds before cached value expired
+        :param store_on_commit: Only store loaded value after current transaction committed,
+        use it when the loader can create the value, so rolled back value is never cached
+        """
+        self.key = key
+        self.max_size = max_size
+        self.ttl = ttl
+        self.store_on_commit = store_on_commit
+        self._lock = threading.Lock()
+        self._data = OrderedDict()
+        self._version = None
+        self._checked_at = 0
+
+    def _get_db_version(self):
+        return CacheVersion.objects.filter(key=self.key).values_list('version', flat=True).first() or 0
+
+    def _ensure_fresh(self):
+        now = time.monotonic()
+        if now - self._checked_at < settings.YUYU_CACHE_CHECK_INTERVAL:
+            return
+
+        version = self._get_db_version()
+        with self._lock:
+            if version != self._version:
+                self._data = OrderedDict()
+                self._version = version
+            self._checked_at = now
+
+    def get(self, cache_key, loader):
+        """
+        Get cached value, load and cache it if not cached yet
+        :param cache_key: Hashable key of the value
+        :param loader: Function that return the value when not cached, None result is cached too
+        :return: The cached value
+        """
+        self._ensure_fresh()
+
+        now = time.monotonic()
+        with self._lock:
+            data = self._data
+            entry = data.get(cache_key)
+            if entry is not None and (entry[1] is None or entry[1] > now):
+                if self.max_size:
+                    data.move_to_end(cache_key)
+                return entry[0]
+
+        value = loader()
+        expire_at = now + self.ttl if self.ttl else None
+        if self.store_on_commit:
+            # Run at once when not inside transaction
+            transaction.on_commit(lambda: self._store(data, cache_key, value, expire_at))
+        else:
+            self._store(data, cache_key, value, expire_at)
+
+        return value
+
+    def _store(self, data, cache_key, value, expire_at):
+        with self._lock:
+            # Value loaded before invalidation may be stale, so it's only stored if data is not replaced
+            if data is not self._data:
+                return
+
+            data[cache_key] = (value, expire_at)
+            if self.max_size:
+                data.move_to_end(cache_key)
+                while len(data) > self.max_size:
+                    data.popitem(last=False)
+
+    def delete(self, cache_key):
+        """
+        Remove cached value on this process only, e.g. when it is found to be stale
+        """
+        with self._lock:
+            self._data.pop(cache_key, None)
+
+    def clear(self):
+        """
+        Clear local cache, next read will check the version again
+        """
+        with self._lock:
+            self._data = OrderedDict()
+            self._version = None
+            self._checked_at = 0
+
+    def _bump(self):
+        if not CacheVersion.objects.filter(key=self.key).update(version=F('version') + 1):
+            CacheVersion.objects.get_or_create(key=self.key, defaults={"version": 1})
+
+        self.clear()
+
+    def invalidate(self):
+        """
+        Invalidate cache on all process by bumping the version.
+        Will be done after current transaction committed.
+        """
+        transaction.on_commit(self._bump)
@@ -175,6 +175,39 @@ LOGGING = {
     },
 }
 
+# Process Local Cache
+# Seconds between cache version check, cached data changed in other process is visible after this delay
+YUYU_CACHE_CHECK_INTERVAL = 5
+# Maximum tenant and seconds before the in progress invoice of a tenant is looked up again by event monitor
+YUYU_TENANT_INVOICE_CACHE_SIZE = 10000
+YUYU_TENANT_INVOICE_CACHE_TTL = 300
+
+# Metrics Snapshot
+# When snapshot file is set, /metrics serve cost metric built by `python manage.py metrics_snapshot`
+YUYU_METRICS_SNAPSHOT_FILE = None
+YUYU_METRICS_SNAPSHOT_INTERVAL = 60
+
+# Event Monitor
+# When batch size is set, event is received in batch of this size or after the timeout in seconds
+YUYU_EVENT_BATCH_SIZE = None
+YUYU_EVENT_BATCH_TIMEOUT = 1
+# When workers is set, events of a batch are handled by worker threads, events of the same tenant is handled in order
+# by one worker. Require batch size to be set. Dispatching the batch is paused when the queue of a worker is full.
+YUYU_EVENT_WORKERS = None
+YUYU_EVENT_QUEUE_SIZE = 100
+# When port is set, event monitor metric is served on this port
+YUYU_EVENT_MONITOR_METRICS_PORT = None
+
+# Notification Sender
+# Notification email is queued and sent by `python manage.py notification_sender`
+YUYU_NOTIFICATION_SEND_INTERVAL = 10
+YUYU_NOTIFICATION_SEND_BATCH_SIZE = 50
+YUYU_NOTIFICATION_SEND_MAX_ATTEMPT = 5
+
+# Job Worker
+# Disabling and resetting billing is queued and run by `python manage.py job_worker`
+YUYU_JOB_WORKER_INTERVAL = 5
+
 try:
     from .local_settings import *
 except ImportError: